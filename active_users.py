@@ -0,0 +1,142 @@
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from periodic_flusher import PeriodicFlusher
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+DAY_FORMAT = "%Y-%m-%d"
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix64(value: int) -> int:
+    """splitmix64 finaliser; spreads sequential user ids over all 64 bits."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class ActiveUserTracker:
+    """Daily, weekly and monthly active users from one HyperLogLog sketch per UTC day.
+
+    Recording an action updates one register of today's sketch in memory.
+    Counting over several days takes the register-wise max of their
+    sketches, so DAU/WAU/MAU are computed from window_days small arrays
+    rather than from the users table. Changed sketches are written to the
+    database every flush_interval seconds and at shutdown and kept there as
+    the history for per-day series. With the default precision of 14 a
+    sketch is 16 KB with a standard error of about 0.8%; small counts use
+    linear counting and are close to exact.
+    """
+
+    def __init__(self, storage: Storage, precision: int = 14, window_days: int = 30,
+                 flush_interval_seconds: float = 30.0):
+        self.storage = storage
+        self.precision = precision
+        self.registers = 1 << precision
+        self.window_days = window_days
+        self.flush_interval = flush_interval_seconds
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._days: Dict[str, np.ndarray] = {}
+        self._dirty: Set[str] = set()
+
+        today = datetime.utcnow().date()
+        first_day = (today - timedelta(days=window_days - 1)).strftime(DAY_FORMAT)
+        for day, data in self.storage.get_active_user_sketches(first_day).items():
+            self._days[day] = np.frombuffer(data, dtype=np.uint8).copy()
+        if today.strftime(DAY_FORMAT) not in self._days:
+            # First start today: seed from users already seen since midnight
+            for user_id in self.storage.user_ids_active_since(today.strftime(DAY_FORMAT) + " 00:00:00"):
+                self.record(user_id)
+
+        self._flusher = PeriodicFlusher(self.flush, flush_interval_seconds, "active-users")
+
+    def _position(self, user_id: int) -> Tuple[int, int]:
+        """Register index and rank for a user id."""
+        hashed = _mix64(user_id)
+        index = hashed & (self.registers - 1)
+        remaining = hashed >> self.precision
+        return index, (64 - self.precision) - remaining.bit_length() + 1
+
+    def record(self, user_id: int, when: Optional[datetime] = None) -> None:
+        """Count user_id as active on the day of when (default now)."""
+        day = (when or datetime.utcnow()).strftime(DAY_FORMAT)
+        index, rank = self._position(user_id)
+        with self._lock:
+            sketch = self._days.get(day)
+            if sketch is None:
+                sketch = self._days[day] = np.zeros(self.registers, dtype=np.uint8)
+                self._expire_days()
+            if rank > sketch[index]:
+                sketch[index] = rank
+                self._dirty.add(day)
+
+    def _expire_days(self) -> None:
+        """Drop in-memory sketches outside the window. Caller holds the lock."""
+        first_day = (datetime.utcnow().date() - timedelta(days=self.window_days - 1)).strftime(DAY_FORMAT)
+        for day in [day for day in self._days if day < first_day and day not in self._dirty]:
+            del self._days[day]
+
+    def _estimate(self, sketch: np.ndarray) -> int:
+        m = self.registers
+        zeros = int(np.count_nonzero(sketch == 0))
+        if zeros == m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -sketch.astype(np.int32))))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def count(self, days: int) -> int:
+        """Distinct active users over the last `days` days, today included."""
+        today = datetime.utcnow().date()
+        wanted = {(today - timedelta(days=offset)).strftime(DAY_FORMAT) for offset in range(days)}
+        with self._lock:
+            sketches = [sketch for day, sketch in self._days.items() if day in wanted]
+            merged = np.maximum.reduce(sketches) if sketches else None
+        return 0 if merged is None else self._estimate(merged)
+
+    def get_stats(self) -> Dict:
+        return {"dau": self.count(1), "wau": self.count(7), "mau": self.count(30)}
+
+    def daily_series(self, days: int) -> List[Tuple[str, int]]:
+        """(day, active users) for the last `days` days, oldest first."""
+        today = datetime.utcnow().date()
+        day_names = [(today - timedelta(days=offset)).strftime(DAY_FORMAT) for offset in range(days - 1, -1, -1)]
+        with self._lock:
+            sketches = {day: self._days[day] for day in day_names if day in self._days}
+        if len(sketches) < len(day_names):
+            # Days before the in-memory window come from the stored history
+            for day, data in self.storage.get_active_user_sketches(day_names[0]).items():
+                sketches.setdefault(day, np.frombuffer(data, dtype=np.uint8))
+        return [(day, self._estimate(sketches[day]) if day in sketches else 0) for day in day_names]
+
+    def flush(self) -> None:
+        """Write sketches changed since the last flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                days, self._dirty = self._dirty, set()
+                items = [(day, self._days[day].tobytes()) for day in days]
+            try:
+                self.storage.save_active_user_sketches(items)
+            except Exception as e:
+                logger.error(f"Error saving active user sketches: {str(e)}")
+                with self._lock:
+                    self._dirty |= days
+
+    def close(self) -> None:
+        """Stop the flusher and write what is pending."""
+        self._flusher.close()
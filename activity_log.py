@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from periodic_flusher import PeriodicFlusher
+from storage import Storage, TIMESTAMP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# (sequence, timestamp, user_id, username, action); user_id is None for anonymous actions
+ActivityRecord = Tuple[int, str, Optional[int], Optional[str], str]
+
+
+class ActivityLog:
+    """Append-only log of user actions, compacted into the database in batches.
+
+    Recording an action is an in-memory append with no I/O. A background
+    thread appends new records to the log file as tab-separated lines every
+    second and compacts the log into the users and statistics tables when
+    it reaches compact_threshold records or compact_interval seconds. Each
+    record carries a sequence number and the last compacted number is
+    committed with the batch, so replaying the log after a crash never
+    counts an action twice. Records not yet compacted are kept in memory
+    for admin views to overlay on the database snapshot.
+    """
+
+    def __init__(self, storage: Storage, log_file: str = os.path.join("bot_data", "activity.log"),
+                 compact_interval_seconds: float = 60.0, compact_threshold: int = 1000,
+                 flush_interval_seconds: float = 1.0):
+        self.storage = storage
+        self.log_file = log_file
+        self.compact_interval = compact_interval_seconds
+        self.compact_threshold = compact_threshold
+        self.flush_interval = flush_interval_seconds
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._tail: List[ActivityRecord] = []
+        self._written = 0  # tail records already appended to the file
+        self._seq = int(storage.get_statistics().get("activity_log_seq", 0) or 0)
+
+        if os.path.dirname(log_file):
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        self._recover()
+        self._file = open(self.log_file, 'a', buffering=64 * 1024)
+
+        self._last_compaction = datetime.utcnow()
+        self._flusher = PeriodicFlusher(self._tick, flush_interval_seconds, "activity-log")
+
+    def _recover(self) -> None:
+        """Apply records left by a previous run that were never compacted."""
+        records = []
+        for path in (f"{self.log_file}.compacting", self.log_file):
+            try:
+                with open(path, 'r') as f:
+                    for line in f:
+                        record = self._parse(line)
+                        if record is not None and record[0] > self._seq:
+                            records.append(record)
+            except FileNotFoundError:
+                continue
+        if records:
+            records.sort(key=lambda record: record[0])
+            self.storage.apply_activity(records)
+            self._seq = records[-1][0]
+            logger.info(f"Recovered {len(records)} activity records")
+        for path in (f"{self.log_file}.compacting", self.log_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _parse(line: str) -> Optional[ActivityRecord]:
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) != 5:
+            return None  # torn final line from a crash
+        try:
+            seq, timestamp, user_id, action, username = parts
+            return int(seq), timestamp, int(user_id) if user_id else None, username or None, action
+        except ValueError:
+            return None
+
+    def record(self, user_id: Optional[int], username: Optional[str], action: str) -> None:
+        """Add one action to the log; the file is written by the background thread."""
+        timestamp = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+        with self._lock:
+            self._seq += 1
+            self._tail.append((self._seq, timestamp, user_id, username or None, action))
+            if len(self._tail) >= self.compact_threshold:
+                self._flusher.wake()
+
+    def _write_pending(self) -> None:
+        """Append tail records not yet in the file. Caller holds the I/O lock."""
+        with self._lock:
+            pending = self._tail[self._written:]
+            self._written = len(self._tail)
+        for seq, timestamp, user_id, username, action in pending:
+            username = (username or "").replace("\t", " ").replace("\n", " ")
+            self._file.write(f"{seq}\t{timestamp}\t{'' if user_id is None else user_id}\t{action}\t{username}\n")
+        self._file.flush()
+
+    def compact(self) -> int:
+        """Fold all logged records into the database; return how many were applied."""
+        with self._io_lock:
+            compacting_file = f"{self.log_file}.compacting"
+            self._write_pending()
+            with self._lock:
+                batch = self._tail[:self._written]
+            if not batch:
+                return 0
+            self._file.close()
+            os.replace(self.log_file, compacting_file)
+            self._file = open(self.log_file, 'a', buffering=64 * 1024)
+
+            try:
+                self.storage.apply_activity(batch)
+            except Exception as e:
+                # The records stay in the tail and in the .compacting file for the next attempt
+                logger.error(f"Error compacting activity log: {str(e)}")
+                self._merge_back(compacting_file)
+                return 0
+
+            with self._lock:
+                del self._tail[:len(batch)]
+                self._written -= len(batch)
+            os.remove(compacting_file)
+            return len(batch)
+
+    def _merge_back(self, compacting_file: str) -> None:
+        """Put a failed batch's file back as the live log. Caller holds the I/O lock."""
+        self._file.close()
+        os.replace(compacting_file, self.log_file)
+        self._file = open(self.log_file, 'a', buffering=64 * 1024)
+
+    def _tick(self) -> None:
+        """Append new records to the file and compact when due."""
+        with self._io_lock:
+            try:
+                self._write_pending()
+            except Exception as e:
+                logger.error(f"Error writing activity log: {str(e)}")
+        due = (datetime.utcnow() - self._last_compaction).total_seconds() >= self.compact_interval
+        if due or len(self._tail) >= self.compact_threshold:
+            self.compact()
+            self._last_compaction = datetime.utcnow()
+
+    def close(self) -> None:
+        """Stop the background thread and compact everything logged so far."""
+        self._flusher.stop()
+        self.compact()
+        with self._io_lock:
+            self._file.close()
+
+    # Views over records that have not been compacted yet
+
+    def tail_users(self) -> Dict[int, Dict]:
+        """Per-user activity in the uncompacted tail."""
+        users: Dict[int, Dict] = {}
+        with self._lock:
+            tail = list(self._tail)
+        for _, timestamp, user_id, username, action in tail:
+            if user_id is None:
+                continue
+            user = users.setdefault(user_id, {
+                "username": username, "first_seen": timestamp, "last_active": timestamp,
+                "total_actions": 0, "actions": Counter()
+            })
+            user["username"] = username or user["username"]
+            user["last_active"] = timestamp
+            user["total_actions"] += 1
+            user["actions"][action] += 1
+        return users
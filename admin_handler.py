@@ -1,80 +1,114 @@
 import logging
-from datetime import datetime
-from typing import List, Dict, Optional
-import json
-import os
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
 from telegram.ext import CallbackContext
 from telegram.error import BadRequest
+from llm_scheduler import llm_scheduler
+from paper_comparison import comparison_cache
+from storage import get_storage, USER_ACTIONS, USER_SORT_KEYS
+from activity_log import ActivityLog
+from active_users import ActiveUserTracker
+from auth_index import AuthIndex
+from stat_counters import StatCounters
+from timeseries import timeseries, sparkline
 
 logger = logging.getLogger(__name__)
 
+
+def escape_markdown(text) -> str:
+    """Escape legacy Markdown special characters in user-supplied text."""
+    escape_chars = ['_', '*', '`', '[']
+    return ''.join(f'\\{c}' if c in escape_chars else c for c in str(text))
+
+
 class AdminManager:
     def __init__(self):
         # First, set the owner ID (your Telegram ID)
         self.owner_id = 6111380028  # Replace with your actual Telegram ID if different
 
-        # Then create necessary directories
-        self.data_dir = "bot_data"
-        self.admin_file = os.path.join(self.data_dir, "admins.json")
-        self.stats_file = os.path.join(self.data_dir, "statistics.json")
-        self.users_file = os.path.join(self.data_dir, "users.json")
-        self.restrictions_file = os.path.join(self.data_dir, "restrictions.json")
-
-        # Ensure directories exist
-        os.makedirs(self.data_dir, exist_ok=True)
-
-        # Initialize data files if they don't exist
-        self._initialize_files()
-
-    def _initialize_files(self):
-        """Initialize JSON files if they don't exist."""
-        default_files = {
-            self.admin_file: {
-                "admins": [self.owner_id],
-                "owner": self.owner_id
-            },
-            self.stats_file: {
-                "total_users": 0,
-                "total_searches": 0,
-                "total_downloads": 0,
-                "total_summaries": 0,
-                "active_users_today": 0,
-                "last_reset": datetime.utcnow().strftime("%Y-%m-%d")
-            },
-            self.users_file: {},
-            self.restrictions_file: {
-                "blocked": [],
-                "restricted": {}
-            }
-        }
-
-        for file_path, default_data in default_files.items():
-            if not os.path.exists(file_path):
-                with open(file_path, 'w') as f:
-                    json.dump(default_data, f, indent=4)
-
-    def _load_data(self, file_path: str) -> dict:
-        """Load data from JSON file."""
-        try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading {file_path}: {str(e)}")
-            return {}
-
-    def _save_data(self, file_path: str, data: dict) -> None:
-        """Save data to JSON file."""
-        try:
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            logger.error(f"Error saving to {file_path}: {str(e)}")
+        self.storage = get_storage()
+
+        # Initialize default rows if they don't exist
+        self._initialize_storage()
+
+        # User actions are appended here and compacted into the database in batches
+        self.activity_log = ActivityLog(self.storage)
+        self.counters = StatCounters(self.storage)
+        self.auth = AuthIndex(self.storage)
+        self.active_users = ActiveUserTracker(self.storage)
+        timeseries.attach(self.storage)
+
+    def _initialize_storage(self):
+        """Seed the owner and statistics counters."""
+        self.storage.add_admin(self.owner_id, is_owner=True)
+        self.storage.init_statistics({
+            "total_users": 0,
+            "total_searches": 0,
+            "total_downloads": 0,
+            "total_summaries": 0
+        })
+
+    def close(self) -> None:
+        """Flush counters and compact any logged activity before shutdown."""
+        self.counters.close()
+        self.active_users.close()
+        timeseries.close()
+        self.activity_log.close()
+
+    def _tail_users(self):
+        """Users active in the uncompacted log, and their database records."""
+        tail = self.activity_log.tail_users()
+        return tail, self.storage.get_users(list(tail))
+
+    def _get_statistics(self) -> Dict:
+        """Stored statistics plus unflushed counters and the users still in the log."""
+        stats = self.storage.get_statistics()
+        for name, amount in self.counters.pending().items():
+            stats[name] = stats.get(name, 0) + amount
+        tail, known = self._tail_users()
+        stats['total_users'] = stats.get('total_users', 0) + len(set(tail) - set(known))
+        return stats
+
+    def _count_users(self) -> int:
+        tail, known = self._tail_users()
+        return self.storage.count_users() + len(set(tail) - set(known))
+
+    def _user_page(self, context: CallbackContext, key: str, limit: int) -> Tuple[List[Dict], Dict]:
+        """The current page of a user list whose cursor state lives in user_data[key].
+
+        The state holds the sort column and a stack of page-start cursors, so
+        moving forward or back is one keyset query instead of an offset scan.
+        """
+        state = context.user_data.setdefault(key, {"sort_by": USER_SORT_KEYS[0], "cursors": [None], "next": None})
+        # Fold logged activity in first so the ordering includes it
+        self.activity_log.compact()
+        users = self.storage.page_users(state["sort_by"], state["cursors"][-1], limit + 1)
+        if len(users) > limit:
+            last = users[limit - 1]
+            state["next"] = (last[state["sort_by"]], last['user_id'])
+        else:
+            state["next"] = None
+        return users[:limit], state
+
+    @staticmethod
+    def _turn_user_page(context: CallbackContext, key: str, action: str) -> None:
+        """Move a user list to the next or previous page, or switch its sort order."""
+        state = context.user_data.get(key)
+        if state is None:
+            return
+        if action == 'next' and state["next"] is not None:
+            state["cursors"].append(state["next"])
+        elif action == 'prev' and len(state["cursors"]) > 1:
+            state["cursors"].pop()
+        elif action == 'sort':
+            index = USER_SORT_KEYS.index(state["sort_by"])
+            state["sort_by"] = USER_SORT_KEYS[(index + 1) % len(USER_SORT_KEYS)]
+            state["cursors"] = [None]
 
     def is_admin(self, user_id: int) -> bool:
         """Check if user is an admin."""
-        data = self._load_data(self.admin_file)
-        return user_id in data.get("admins", [])
+        return self.auth.is_admin(user_id)
 
     def is_owner(self, user_id: int) -> bool:
         """Check if user is the owner."""
@@ -89,7 +123,8 @@ class AdminManager:
             return
 
         keyboard = [
-            [InlineKeyboardButton("📊 Statistics", callback_data="admin_stats")],
+            [InlineKeyboardButton("📊 Statistics", callback_data="admin_stats"),
+             InlineKeyboardButton("📈 History", callback_data="admin_history_minute")],
             [InlineKeyboardButton("👥 Manage Users", callback_data="admin_users")],
             [InlineKeyboardButton("🚫 Manage Restrictions", callback_data="admin_restrictions")],
             [InlineKeyboardButton("👮‍♂️ Manage Admins", callback_data="admin_admins")]
@@ -100,7 +135,7 @@ class AdminManager:
 
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        stats = self._load_data(self.stats_file)
+        stats = self._get_statistics()
         message = f"""
 🛠 *Admin Control Panel*
 
@@ -109,7 +144,7 @@ Current Statistics:
 • 🔍 Total Searches: {stats.get('total_searches', 0)}
 • 📥 Total Downloads: {stats.get('total_downloads', 0)}
 • 🤖 Total Summaries: {stats.get('total_summaries', 0)}
-• 📊 Active Today: {stats.get('active_users_today', 0)}
+• 📊 Active Today: {self.active_users.count(1)}
 
 Select an option to manage:
 """
@@ -131,19 +166,29 @@ Select an option to manage:
     def handle_stats(self, update: Update, context: CallbackContext) -> None:
         """Show detailed statistics."""
         query = update.callback_query
-        stats = self._load_data(self.stats_file)
-        users = self._load_data(self.users_file)
-
-        active_today = len([u for u in users.values()
-                          if datetime.strptime(u['last_active'], "%Y-%m-%d %H:%M:%S").date()
-                          == datetime.utcnow().date()])
+        stats = self._get_statistics()
+        total_records = self._count_users()
+
+        active = self.active_users.get_stats()
+        daily_active = " ".join(str(count) for _, count in self.active_users.daily_series(7))
+        llm_stats = llm_scheduler.get_stats()
+        cache_stats = comparison_cache.get_stats()
+        chat_handler = context.bot_data.get('chat_handler')
+        topic_text = "• No chat queries yet"
+        if chat_handler is not None:
+            topic_stats = chat_handler.topic_classifier.get_stats()
+            topic_text = (f"• Decided Locally: {topic_stats['local']} ({topic_stats['local_share']:.0%})\n"
+                          f"• Sent to LLM: {topic_stats['llm']}")
 
         message = f"""
 📊 *Detailed Statistics*
 
 👥 *User Stats:*
 • Total Users: {stats.get('total_users', 0)}
-• Active Today: {active_today}
+• Active Today: {active['dau']}
+• Active This Week: {active['wau']}
+• Active This Month: {active['mau']}
+• Daily Active (last 7 days): {daily_active}
 
 🔍 *Activity Stats:*
 • Total Searches: {stats.get('total_searches', 0)}
@@ -151,8 +196,22 @@ Select an option to manage:
 • Total Summaries: {stats.get('total_summaries', 0)}
 
 📈 *System Stats:*
-• Last Reset: {stats.get('last_reset', 'Never')}
-• Data Points: {len(users)}
+• Data Points: {total_records}
+
+🤖 *LLM Queue:*
+• Active: {llm_stats['active']}/{llm_stats['max_concurrent']}
+• Waiting: {llm_stats['queue_depth']} (peak {llm_stats['max_depth_seen']})
+• Completed: {llm_stats['completed']} | Failed: {llm_stats['failed']}
+• Rejected (busy): {llm_stats['rejected'] + llm_stats['timed_out']}
+• Queue Wait: avg {llm_stats['avg_wait']:.2f}s, p95 {llm_stats['p95_wait']:.2f}s
+
+🧭 *Topic Checks:*
+{topic_text}
+
+🗂 *Comparison Cache:*
+• Entries: {cache_stats['entries']}/{cache_stats['max_entries']}
+• Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} ({cache_stats['hit_rate']:.0%} hit rate)
+• Evictions: {cache_stats['evictions']} | Expired: {cache_stats['expirations']}
 
 « Back to return to main menu
 """
@@ -165,65 +224,80 @@ Select an option to manage:
             parse_mode=ParseMode.MARKDOWN
         )
 
-    def update_stats(self, action: str) -> None:
-        """Update bot statistics."""
-        stats = self._load_data(self.stats_file)
-
-        if action in ["searches", "downloads", "summaries"]:
-            stats[f"total_{action}"] = stats.get(f"total_{action}", 0) + 1
-
-        self._save_data(self.stats_file, stats)
-
     def update_user_stats(self, user_id: int, username: str, action: str) -> None:
-        """Update user statistics."""
-        stats = self._load_data(self.stats_file)
-        users = self._load_data(self.users_file)
-
-        if str(user_id) not in users:
-            users[str(user_id)] = {
-                "username": username,
-                "first_seen": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                "last_active": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                "total_actions": 0,
-                "actions": {
-                    "searches": 0,
-                    "downloads": 0,
-                    "summaries": 0
-                }
-            }
-            stats["total_users"] += 1
-        else:
-            users[str(user_id)]["last_active"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-            users[str(user_id)]["username"] = username
+        """Update user statistics; the action also counts towards the bot totals."""
+        self.activity_log.record(user_id, username, action)
+        self.active_users.record(user_id)
+        if action in USER_ACTIONS:
+            self.counters.incr(f"total_{action}")
+            timeseries.record(action)
+
+    def handle_history(self, update: Update, context: CallbackContext) -> None:
+        """Show sparkline history of activity and LLM metrics."""
+        query = update.callback_query
+        views = {
+            'minute': (60, "last hour, per minute"),
+            'hour': (48, "last 48 hours, per hour"),
+            'day': (30, "last 30 days, per day")
+        }
+        resolution = query.data[len("admin_history_"):]
+        if resolution not in views:
+            resolution = 'minute'
+        points, label = views[resolution]
+
+        message = f"📈 *Activity History* ({label})\n\n"
+        for metric, title in (("searches", "🔍 Searches"), ("downloads", "📥 Downloads"),
+                              ("summaries", "🤖 Summaries"), ("llm_errors", "⚠️ LLM Errors"),
+                              ("llm_rejected", "🚦 LLM Rejected")):
+            counts = timeseries.counts(metric, resolution, points)
+            message += f"{title}: {sum(counts)} total, peak {max(counts, default=0)}\n`{sparkline(counts)}`\n"
+
+        window = timeseries.window("llm_latency", resolution, points)
+        calls = sum(count for count, _, _ in window)
+        avg_latency = sum(total for _, total, _ in window) / calls if calls else 0.0
+        max_latency = max((peak for count, _, peak in window if count), default=0.0)
+        averages = [total / count if count else 0.0 for count, total, _ in window]
+        message += f"⏱ LLM Latency: avg {avg_latency:.2f}s, max {max_latency:.2f}s\n`{sparkline(averages)}`\n"
 
-        users[str(user_id)]["total_actions"] += 1
-        if action in users[str(user_id)]["actions"]:
-            users[str(user_id)]["actions"][action] += 1
+        keyboard = [
+            [InlineKeyboardButton("Minutes", callback_data="admin_history_minute"),
+             InlineKeyboardButton("Hours", callback_data="admin_history_hour"),
+             InlineKeyboardButton("Days", callback_data="admin_history_day")],
+            [InlineKeyboardButton("« Back", callback_data="admin_panel")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
 
-        self._save_data(self.users_file, users)
-        self._save_data(self.stats_file, stats)
+        try:
+            query.edit_message_text(
+                text=message,
+                reply_markup=reply_markup,
+                parse_mode=ParseMode.MARKDOWN
+            )
+        except BadRequest as e:
+            # Refreshing an unchanged view is not an error
+            if "not modified" not in str(e):
+                raise
 
     def handle_users(self, update: Update, context: CallbackContext) -> None:
         """Show user management panel."""
         query = update.callback_query
-        users = self._load_data(self.users_file)
 
         # Create a paginated user list (10 users per page)
-        page = context.user_data.get('user_page', 0)
-        users_list = list(users.items())
-        total_pages = (len(users_list) - 1) // 10 + 1
-        start_idx = page * 10
-        end_idx = start_idx + 10
-        current_users = users_list[start_idx:end_idx]
+        current_users, state = self._user_page(context, 'user_pages', 10)
+        page = len(state["cursors"]) - 1
+        total_users = self.storage.get_statistics().get('total_users', 0)
+        total_pages = max(0, total_users - 1) // 10 + 1
+        sort_label = "last active" if state["sort_by"] == "last_active" else "total actions"
 
-        message = "👥 *User Management Panel*\n\n"
+        message = f"👥 *User Management Panel*\n_Sorted by {sort_label}_\n\n"
 
-        for user_id, user_data in current_users:
+        for user_data in current_users:
+            user_id = user_data['user_id']
             username = user_data.get('username', 'No username')
             last_active = user_data.get('last_active', 'Never')
             total_actions = user_data.get('total_actions', 0)
             message += f"*ID:* `{user_id}`\n"
-            message += f"*Username:* @{username}\n"
+            message += f"*Username:* @{escape_markdown(username)}\n"
             message += f"*Last Active:* {last_active}\n"
             message += f"*Total Actions:* {total_actions}\n"
             message += "─────────────────\n"
@@ -235,19 +309,21 @@ Select an option to manage:
         if page > 0:
             nav_row.append(InlineKeyboardButton("◀️ Previous", callback_data="users_prev"))
 
-        if end_idx < len(users_list):
+        if state["next"] is not None:
             nav_row.append(InlineKeyboardButton("Next ▶️", callback_data="users_next"))
 
         if nav_row:
             keyboard.append(nav_row)
 
         keyboard.extend([
-            [InlineKeyboardButton("🚫 Restrict User", callback_data="users_restrict"),
-             InlineKeyboardButton("⛔️ Block User", callback_data="users_block")],
+            [InlineKeyboardButton("↕️ Change Sort Order", callback_data="users_sort")],
+            [InlineKeyboardButton("🚫 Restrict User", callback_data="restrict_add"),
+             InlineKeyboardButton("⛔️ Block User", callback_data="restrict_block")],
             [InlineKeyboardButton("« Back to Admin Panel", callback_data="admin_panel")]
         ])
 
         message += f"\nPage {page + 1}/{total_pages}"
+        message += "\nUse /finduser <username> to look up a user."
 
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -262,47 +338,56 @@ Select an option to manage:
         query = update.callback_query
         action = query.data.split('_')[1]
 
-        if action == 'prev':
-            context.user_data['user_page'] = max(0, context.user_data.get('user_page', 0) - 1)
-        elif action == 'next':
-            context.user_data['user_page'] = context.user_data.get('user_page', 0) + 1
-
+        self._turn_user_page(context, 'user_pages', action)
         self.handle_users(update, context)
 
-    def restrict_user(self, update: Update, context: CallbackContext, user_id: int, duration_hours: int) -> None:
-        """Restrict a user for specified duration."""
-        restrictions = self._load_data(self.restrictions_file)
+    def find_users(self, update: Update, context: CallbackContext) -> None:
+        """Look up users by username prefix (/finduser <prefix>)."""
+        if not self.is_admin(update.effective_user.id):
+            update.message.reply_text("🚫 You don't have permission to access admin controls.")
+            return
 
-        end_time = datetime.utcnow().replace(microsecond=0) + datetime.timedelta(hours=duration_hours)
+        if not context.args:
+            update.message.reply_text("Usage: /finduser <username or prefix>")
+            return
 
-        restrictions["restricted"][str(user_id)] = {
-            "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "restricted_by": update.effective_user.id,
-            "reason": context.user_data.get('restrict_reason', 'No reason provided')
-        }
+        self.activity_log.compact()
+        prefix = context.args[0].lstrip('@')
+        users = self.storage.find_users_by_username(prefix, limit=10)
+        if not users:
+            update.message.reply_text(f"No users found matching '{prefix}'.")
+            return
+
+        message = f"🔍 *Users matching* {escape_markdown(prefix)}\n\n"
+        for user_data in users:
+            message += f"*ID:* `{user_data['user_id']}`\n"
+            message += f"*Username:* @{escape_markdown(user_data['username'])}\n"
+            message += f"*Last Active:* {user_data['last_active']}\n"
+            message += f"*Total Actions:* {user_data['total_actions']}\n"
+            message += "─────────────────\n"
+        update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+
+    def restrict_user(self, update: Update, context: CallbackContext, user_id: int, duration_hours: int) -> None:
+        """Restrict a user for specified duration."""
+        end_time = datetime.utcnow().replace(microsecond=0) + timedelta(hours=duration_hours)
 
-        self._save_data(self.restrictions_file, restrictions)
+        self.storage.restrict_user(
+            user_id,
+            end_time.strftime("%Y-%m-%d %H:%M:%S"),
+            update.effective_user.id,
+            context.user_data.get('restrict_reason', 'No reason provided')
+        )
+        self.auth.invalidate()
 
     def block_user(self, update: Update, context: CallbackContext, user_id: int) -> None:
         """Permanently block a user."""
-        restrictions = self._load_data(self.restrictions_file)
-
-        if user_id not in restrictions["blocked"]:
-            restrictions["blocked"].append(user_id)
-
-        self._save_data(self.restrictions_file, restrictions)
+        self.storage.block_user(user_id, blocked_by=update.effective_user.id)
+        self.auth.invalidate()
 
     def unblock_user(self, update: Update, context: CallbackContext, user_id: int) -> None:
         """Unblock a user."""
-        restrictions = self._load_data(self.restrictions_file)
-
-        if user_id in restrictions["blocked"]:
-            restrictions["blocked"].remove(user_id)
-
-        if str(user_id) in restrictions["restricted"]:
-            del restrictions["restricted"][str(user_id)]
-
-        self._save_data(self.restrictions_file, restrictions)
+        self.storage.remove_restriction(user_id)
+        self.auth.invalidate()
 
     def handle_broadcast(self, update: Update, context: CallbackContext) -> None:
         """Show broadcast message panel."""
@@ -351,14 +436,12 @@ Choose wisely! Your message will only be sent to the selected audience.
     def show_user_selection(self, update: Update, context: CallbackContext) -> None:
         """Show user selection panel for specific targeting."""
         query = update.callback_query
-        users = self._load_data(self.users_file)
 
-        # Get current page from context or default to 0
-        page = context.user_data.get('broadcast_user_page', 0)
-        users_list = list(users.items())
-        total_pages = (len(users_list) - 1) // 5 + 1
-        start_idx = page * 5
-        end_idx = start_idx + 5
+        # Get the current page of users, most recently active first
+        current_users, state = self._user_page(context, 'broadcast_user_pages', 5)
+        page = len(state["cursors"]) - 1
+        total_users = self.storage.get_statistics().get('total_users', 0)
+        total_pages = max(0, total_users - 1) // 5 + 1
 
         # Get selected users from context or initialize empty list
         selected_users = context.user_data.get('broadcast_selected_users', [])
@@ -373,7 +456,8 @@ Choose users to receive your broadcast:
         keyboard = []
 
         # Add user selection buttons
-        for user_id, user_data in users_list[start_idx:end_idx]:
+        for user_data in current_users:
+            user_id = str(user_data['user_id'])
             username = user_data.get('username', 'No username')
             is_selected = user_id in selected_users
             select_text = "✅" if is_selected else "⭕️"
@@ -387,7 +471,7 @@ Choose users to receive your broadcast:
         nav_row = []
         if page > 0:
             nav_row.append(InlineKeyboardButton("◀️ Previous", callback_data="broadcast_users_prev"))
-        if end_idx < len(users_list):
+        if state["next"] is not None:
             nav_row.append(InlineKeyboardButton("Next ▶️", callback_data="broadcast_users_next"))
         if nav_row:
             keyboard.append(nav_row)
@@ -425,12 +509,8 @@ Choose users to receive your broadcast:
             context.user_data['broadcast_selected_users'] = selected_users
             self.show_user_selection(update, context)
 
-        elif action == 'prev':
-            context.user_data['broadcast_user_page'] = max(0, context.user_data.get('broadcast_user_page', 0) - 1)
-            self.show_user_selection(update, context)
-
-        elif action == 'next':
-            context.user_data['broadcast_user_page'] = context.user_data.get('broadcast_user_page', 0) + 1
+        elif action in ('prev', 'next'):
+            self._turn_user_page(context, 'broadcast_user_pages', action)
             self.show_user_selection(update, context)
 
         elif action == 'confirm':
@@ -478,38 +558,20 @@ Select message type:
     def handle_restrictions(self, update: Update, context: CallbackContext) -> None:
         """Show restriction management panel."""
         query = update.callback_query
-        restrictions = self._load_data(self.restrictions_file)
-        users = self._load_data(self.users_file)
-
         # Get current page from context or default to 0
         page = context.user_data.get('restriction_page', 0)
 
-        # Combine blocked and restricted users
-        restricted_users = []
-
-        # Add blocked users
-        for user_id in restrictions.get("blocked", []):
-            user_data = users.get(str(user_id), {})
-            restricted_users.append({
-                "id": user_id,
-                "username": user_data.get("username", "Unknown"),
-                "type": "Blocked",
-                "end_time": "Permanent",
-                "restricted_by": "Admin"
-            })
-
-        # Add temporarily restricted users
-        for user_id, data in restrictions.get("restricted", {}).items():
-            user_data = users.get(str(user_id), {})
-            end_time = datetime.strptime(data["end_time"], "%Y-%m-%d %H:%M:%S")
-            if datetime.utcnow() < end_time:  # Only show active restrictions
-                restricted_users.append({
-                    "id": int(user_id),
-                    "username": user_data.get("username", "Unknown"),
-                    "type": "Restricted",
-                    "end_time": data["end_time"],
-                    "restricted_by": data.get("restricted_by", "Unknown")
-                })
+        # Blocked users first, then restrictions that have not expired
+        restricted_users = [
+            {
+                "id": row["user_id"],
+                "username": row["username"] or "Unknown",
+                "type": "Blocked" if row["kind"] == "blocked" else "Restricted",
+                "end_time": "Permanent" if row["kind"] == "blocked" else row["end_time"],
+                "restricted_by": row["restricted_by"] or "Admin"
+            }
+            for row in self.storage.list_restrictions(datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
+        ]
 
         total_pages = (len(restricted_users) - 1) // 5 + 1 if restricted_users else 1
         start_idx = page * 5
@@ -525,7 +587,7 @@ Current restricted/blocked users:
             message += "\nNo users are currently restricted or blocked."
         else:
             for user in restricted_users[start_idx:end_idx]:
-                message += f"\n*User:* @{user['username']} (`{user['id']}`)"
+                message += f"\n*User:* @{escape_markdown(user['username'])} (`{user['id']}`)"
                 message += f"\n*Type:* {user['type']}"
                 message += f"\n*Until:* {user['end_time']}"
                 message += "\n───────────────"
@@ -556,11 +618,10 @@ Current restricted/blocked users:
     def handle_admin_management(self, update: Update, context: CallbackContext) -> None:
         """Show admin management panel."""
         query = update.callback_query
-        admin_data = self._load_data(self.admin_file)
-        users = self._load_data(self.users_file)
-
-        admins = admin_data.get("admins", [])
-        owner = admin_data.get("owner", self.owner_id)
+        admin_rows = self.storage.get_admins()
+        admins = [row["user_id"] for row in admin_rows]
+        owner = next((row["user_id"] for row in admin_rows if row["is_owner"]), self.owner_id)
+        usernames = self.storage.get_usernames(admins)
 
         message = """
 👮‍♂️ *Admin Management*
@@ -569,10 +630,9 @@ Current admins:
 """
 
         for admin_id in admins:
-            user_data = users.get(str(admin_id), {})
-            username = user_data.get("username", "Unknown")
+            username = usernames.get(admin_id) or "Unknown"
             is_owner = admin_id == owner
-            message += f"\n{'👑' if is_owner else '👮‍♂️'} @{username} (`{admin_id}`)"
+            message += f"\n{'👑' if is_owner else '👮‍♂️'} @{escape_markdown(username)} (`{admin_id}`)"
             if is_owner:
                 message += " - *Owner*"
 
@@ -710,19 +770,4 @@ Send /cancel to cancel this operation.
 
     def is_user_restricted(self, user_id: int) -> bool:
         """Check if user is restricted or blocked."""
-        restrictions = self._load_data(self.restrictions_file)
-
-        if user_id in restrictions.get("blocked", []):
-            return True
-
-        if str(user_id) in restrictions.get("restricted", {}):
-            restriction = restrictions["restricted"][str(user_id)]
-            end_time = datetime.strptime(restriction["end_time"], "%Y-%m-%d %H:%M:%S")
-
-            if datetime.utcnow() < end_time:
-                return True
-            else:
-                del restrictions["restricted"][str(user_id)]
-                self._save_data(self.restrictions_file, restrictions)
-
-        return False
\ No newline at end of file
+        return self.auth.is_restricted(user_id)
@@ -13,7 +13,9 @@ from telegram.ext import (
     Filters,
     CallbackContext,
     CallbackQueryHandler,
-    ConversationHandler
+    ConversationHandler,
+    DispatcherHandlerStop,
+    TypeHandler
 )
 from advanced_search_handlers import (
     show_advanced_search_menu,
@@ -39,7 +41,14 @@ from telegram.error import TimedOut, NetworkError, BadRequest
 import paper_comparison
 from voice_handler import VoiceSearchHandler
 from user_preferences import UserPreferences
-from notifications import NotificationPreferences
+from notifications import (
+    NotificationPreferences,
+    SubscriptionKey,
+    get_keyword_automaton,
+    subscription_key,
+    subscription_query
+)
+from percolator import SubscriptionPercolator, paper_harvester
 import arxiv
 import google.generativeai as genai
 import os
@@ -50,7 +59,29 @@ from dotenv import load_dotenv
 import time
 import random
 import json
-from admin_handler import AdminManager
+from admin_handler import AdminManager, escape_markdown
+import fake_llm
+from llm_scheduler import (
+    llm_scheduler,
+    SchedulerBusyError,
+    BUSY_MESSAGE,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_STANDARD,
+    PRIORITY_BATCH
+)
+from qa_cache import qa_cache
+from paper_index import paper_index
+from paper_dedup import paper_dedup
+from model_router import (
+    ModelRouter,
+    GeminiProvider,
+    StubProvider,
+    REQUEST_SUMMARY,
+    REQUEST_QA,
+    REQUEST_COMPARISON,
+    REQUEST_CHAT,
+    is_stub_response
+)
 
 # Load environment variables
 load_dotenv()
@@ -62,12 +93,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configure Gemini AI
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    raise ValueError("❌ Google API Key not found in environment variables!")
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Configure Gemini AI (FAKE_LLM=1 swaps in an offline fake for load testing)
+model = fake_llm.from_env()
+if model is None:
+    GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+    if not GOOGLE_API_KEY:
+        raise ValueError("❌ Google API Key not found in environment variables!")
+    genai.configure(api_key=GOOGLE_API_KEY)
+    model = genai.GenerativeModel('gemini-1.5-pro')
+
+# Route each request class to a provider; Gemini is the default backend
+model_router = ModelRouter(default_provider='gemini')
+model_router.register(GeminiProvider(model=model))
+if os.getenv('ENABLE_STUB_PROVIDER'):
+    model_router.register(StubProvider())
 
 # Get Telegram token from environment variables
 TOKEN = os.getenv('TELEGRAM_TOKEN')
@@ -77,6 +116,25 @@ if not TOKEN:
 MAX_PAPERS_TO_COMPARE = 3
 MAX_RESPONSE_LENGTH = 4096  # Telegram's message length limit
 RATE_LIMIT_DELAY = 1  # seconds between messages
+NOTIFICATION_CHECK_INTERVAL = 600  # seconds between notification checks
+NOTIFICATION_BATCH_SIZE = 1000  # due users handled per check
+NOTIFICATION_RETRY_DELAY = timedelta(hours=1)
+# Threads for run_async handlers: one per scheduler slot and queued request plus
+# headroom, so a full LLM queue answers with BUSY_MESSAGE instead of stalling here
+DISPATCHER_WORKERS = llm_scheduler.max_concurrent + llm_scheduler.max_queue_depth + 4
+
+# Models listed in /model; only those registered with model_router can be selected
+MODEL_OPTIONS = {
+    'gemini': "🌟 Gemini 1.5 Pro",
+    'gpt4': "🤖 GPT-4 Turbo",
+    'claude3': "🧠 Claude 3 Opus",
+    'palm2': "⚡ PaLM 2",
+    'llama2': "🔮 Llama 2 70B",
+    'mistral': "🎯 Mistral Large",
+    'stub': "🧪 Offline Stub"
+}
+
+RESTRICTED_MESSAGE = "🚫 Your access to PaperPilot is currently restricted."
 
 # Channel config
 CHANNEL_USERNAME = "@TheodoreI1"  # For display purposes
@@ -125,6 +183,7 @@ Your AI-powered research companion! Let's explore the world of science together!
 /search `<query>` - Search for papers
 /help - Show help message
 /latest - Get latest papers
+/survey `<query>` - Survey up to 100 papers by theme
 /about - About this bot
 """
 
@@ -238,7 +297,38 @@ def subscription_required(func):
             return func(update, context, *args, **kwargs)
     return wrapper
 
-def generate_paper_summary(paper):
+def gate_restricted_users(update: Update, context: CallbackContext) -> None:
+    """Stop handling updates from blocked or restricted users."""
+    user = update.effective_user
+    admin_manager = context.bot_data.get('admin_manager')
+    if user is None or admin_manager is None:
+        return
+    try:
+        if not admin_manager.is_user_restricted(user.id) or admin_manager.is_admin(user.id):
+            return
+    except Exception as e:
+        logger.error(f"Error checking restrictions for user {user.id}: {str(e)}")
+        return
+
+    if update.callback_query:
+        update.callback_query.answer(RESTRICTED_MESSAGE, show_alert=True)
+    elif update.effective_message:
+        update.effective_message.reply_text(RESTRICTED_MESSAGE)
+    raise DispatcherHandlerStop()
+
+def get_preferred_model(user_id: Optional[int]) -> str:
+    """Return the user's selected provider name, falling back to the default."""
+    if user_id is not None and globals().get('preferences_manager'):
+        preferred = preferences_manager.get_preferences(user_id).get('preferred_model')
+        if preferred and model_router.has_provider(preferred):
+            return preferred
+    return model_router.default_provider
+
+def get_model_for(user_id: Optional[int], request_class: str):
+    """Return a routed model for this user and request class."""
+    return model_router.for_request(request_class, get_preferred_model(user_id))
+
+def generate_paper_summary(paper, user_id: Optional[int] = None):
     """Generate summary using Gemini."""
     prompt = f"""
     Please provide a clear and engaging summary of this research paper:
@@ -259,7 +349,11 @@ def generate_paper_summary(paper):
     Make it informative yet accessible for a general audience.
     """
 
-    response = model.generate_content(prompt)
+    response = llm_scheduler.generate(
+        get_model_for(user_id, REQUEST_SUMMARY), prompt,
+        user_id=user_id,
+        priority=PRIORITY_STANDARD
+    )
     return response.text
 
 def format_paper(paper) -> str:
@@ -279,6 +373,9 @@ def format_paper(paper) -> str:
         [
             InlineKeyboardButton("📥 Download PDF", callback_data=f"download_{paper.get_short_id()}"),
             InlineKeyboardButton("➕ Add to Compare", callback_data=f"compare_add_{paper.get_short_id()}")
+        ],
+        [
+            InlineKeyboardButton("🔎 Similar papers", callback_data=f"similar_{paper.get_short_id()}")
         ]
     ]
 
@@ -333,15 +430,38 @@ def admin_command(update: Update, context: CallbackContext) -> None:
     admin_manager = context.bot_data['admin_manager']
     admin_manager.show_admin_panel(update, context)
 
+@subscription_required
+def finduser_command(update: Update, context: CallbackContext) -> None:
+    """Handle the /finduser command."""
+    admin_manager = context.bot_data['admin_manager']
+    admin_manager.find_users(update, context)
+
+def track_activity(update: Update, context: CallbackContext, action: str) -> None:
+    """Record a user action for the admin statistics."""
+    admin_manager = context.bot_data.get('admin_manager')
+    user = update.effective_user
+    if admin_manager is None or user is None:
+        return
+    try:
+        admin_manager.update_user_stats(user.id, user.username or user.first_name, action)
+    except Exception as e:
+        logger.error(f"Error recording activity: {str(e)}")
+
 def handle_admin_callback(update: Update, context: CallbackContext) -> None:
     """Handle admin panel callback queries."""
     query = update.callback_query
     admin_manager = context.bot_data['admin_manager']
 
+    if not admin_manager.is_admin(update.effective_user.id):
+        query.answer("🚫 You don't have permission to access admin controls.")
+        return
+
     if query.data == "admin_panel":
         admin_manager.show_admin_panel(update, context)
     elif query.data == "admin_stats":
         admin_manager.handle_stats(update, context)
+    elif query.data.startswith("admin_history"):
+        admin_manager.handle_history(update, context)
     elif query.data == "admin_users":
         admin_manager.handle_users(update, context)
     elif query.data == "admin_restrictions":
@@ -372,8 +492,7 @@ def handle_admin_callback(update: Update, context: CallbackContext) -> None:
         elif query.data.startswith("broadcast_users_"):
             action = query.data.split('_')[2]
             if action in ['prev', 'next']:
-                context.user_data['broadcast_user_page'] = context.user_data.get('broadcast_user_page', 0) + (1 if action == 'next' else -1)
-                admin_manager.show_user_selection(update, context)
+                admin_manager.handle_user_selection(update, context)
 
     # Prevent "loading" animation from getting stuck
     if not query.data.startswith("broadcast_select_"):
@@ -416,22 +535,26 @@ def handle_restriction_input(update: Update, context: CallbackContext) -> None:
 @subscription_required
 def model_command(update: Update, context: CallbackContext) -> None:
     """Show available AI models for paper summarization."""
-    keyboard = [
-        [InlineKeyboardButton("🌟 Gemini 1.5 Pro (Default) ✓", callback_data="model_gemini")],
-        [InlineKeyboardButton("🤖 GPT-4 Turbo", callback_data="model_gpt4")],
-        [InlineKeyboardButton("🧠 Claude 3 Opus", callback_data="model_claude3")],
-        [InlineKeyboardButton("⚡ PaLM 2", callback_data="model_palm2")],
-        [InlineKeyboardButton("🔮 Llama 2 70B", callback_data="model_llama2")],
-        [InlineKeyboardButton("🎯 Mistral Large", callback_data="model_mistral")]
-    ]
+    ensure_preferences_initialized(context)
+    current = get_preferred_model(update.effective_user.id)
+
+    keyboard = []
+    for name, label in MODEL_OPTIONS.items():
+        if name == 'stub' and not model_router.has_provider(name):
+            continue
+        if name == model_router.default_provider:
+            label += " (Default)"
+        if name == current:
+            label += " ✓"
+        keyboard.append([InlineKeyboardButton(label, callback_data=f"model_{name}")])
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    message = """
+    message = f"""
 🤖 *AI Model Selection*
 
 Choose your preferred AI model for paper summarization:
 
-Current model: *Gemini 1.5 Pro* ✓
+Current model: *{MODEL_OPTIONS.get(current, current)}* ✓
 
 Each model has its own strengths:
 • 🌟 *Gemini 1.5 Pro:* Balanced performance & efficiency
@@ -473,7 +596,8 @@ def handle_chat_message(update: Update, context: CallbackContext) -> None:
         return
     if 'chat_handler' not in context.bot_data:
         context.bot_data['chat_handler'] = ChatHandler()
-    context.bot_data['chat_handler'].handle_message(update, context, model)
+    chat_model = get_model_for(update.effective_user.id, REQUEST_CHAT)
+    context.bot_data['chat_handler'].handle_message(update, context, chat_model)
 
 def end_chat_command(update: Update, context: CallbackContext) -> None:
     """End the chat session."""
@@ -492,14 +616,16 @@ def handle_model_selection(update: Update, context: CallbackContext) -> None:
         return
 
     selected_model = query.data.split('_')[1]
+    user_id = update.effective_user.id
 
-    # For now, show that only Gemini is available
-    if selected_model != 'gemini':
-        message = """
+    # Only providers registered with the router can be selected
+    if not model_router.has_provider(selected_model):
+        current = get_preferred_model(user_id)
+        message = f"""
 ⏳ *Model Not Yet Available*
 
 This model will be integrated soon! Currently using:
-🌟 *Gemini 1.5 Pro*
+*{MODEL_OPTIONS.get(current, current)}*
 
 Stay tuned for updates!
 """
@@ -513,16 +639,18 @@ Stay tuned for updates!
         )
         return
 
-    # If Gemini is selected
-    message = """
-✅ *Model Selected: Gemini 1.5 Pro*
+    pref_manager = ensure_preferences_initialized(context)
+    pref_manager.update_preference(user_id, 'preferred_model', selected_model)
+
+    message = f"""
+✅ *Model Selected: {MODEL_OPTIONS.get(selected_model, selected_model)}*
 
 Current active model for:
 • Paper summarization
 • Q&A responses
 • Comparative analysis
 
-Optimized for research paper understanding!
+_If it is slow or unavailable, PaperPilot automatically fails over to the fastest healthy model._
 """
     keyboard = [[InlineKeyboardButton("« Back to Model Selection", callback_data="back_to_models")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -730,6 +858,7 @@ def execute_search(update: Update, context: CallbackContext) -> None:
 
     query = ' '.join(context.args)
     loading_message = update.message.reply_text("🔍 Searching papers... Please wait...")
+    track_activity(update, context, "searches")
 
     try:
         # Get user preferences
@@ -766,7 +895,8 @@ def execute_search(update: Update, context: CallbackContext) -> None:
             sort_by=arxiv.SortCriterion.Relevance
         )
 
-        results = list(search.results())
+        # Versions and reposts of the same paper are shown once
+        results = paper_dedup.dedupe(list(search.results()))
 
         if not results:
             # Provide detailed feedback
@@ -783,6 +913,7 @@ def execute_search(update: Update, context: CallbackContext) -> None:
             loading_message.edit_text(message)
             return
 
+        paper_index.add_papers(results)
         context.user_data['search_state'] = {
             'results': results,
             'current_index': 0,
@@ -835,6 +966,9 @@ def handle_more_results(update: Update, context: CallbackContext) -> None:
         [
             InlineKeyboardButton("📥 Download PDF", callback_data=f"download_{paper.get_short_id()}"),
             InlineKeyboardButton("➕ Add to Compare", callback_data=f"compare_add_{paper.get_short_id()}")
+        ],
+        [
+            InlineKeyboardButton("🔎 Similar papers", callback_data=f"similar_{paper.get_short_id()}")
         ]
     ]
 
@@ -877,6 +1011,9 @@ def show_paper_result(update: Update, context: CallbackContext, user_state, is_n
     [
         InlineKeyboardButton("📥 Download PDF", callback_data=f"download_{paper.get_short_id()}"),
         InlineKeyboardButton("➕ Add to Compare", callback_data=f"compare_add_{paper.get_short_id()}")  # Fixed here
+    ],
+    [
+        InlineKeyboardButton("🔎 Similar papers", callback_data=f"similar_{paper.get_short_id()}")
     ]
 ]
 
@@ -898,6 +1035,39 @@ def show_paper_result(update: Update, context: CallbackContext, user_state, is_n
         disable_web_page_preview=True
     )
 
+def show_similar_papers(update: Update, context: CallbackContext) -> None:
+    """Show papers similar to the selected one from the local index."""
+    query = update.callback_query
+
+    if not check_channel_subscription(update, context):
+        return
+
+    paper_id = query.data.split('_', 1)[1]
+    matches = paper_index.similar(paper_dedup.lookup(paper_id), k=5)
+
+    if matches is None:
+        query.answer("❌ This paper isn't in the index yet. Try searching for it again.")
+        return
+    if not matches:
+        query.answer("🔎 No similar papers found. Run a few more searches!")
+        return
+
+    query.answer()
+    lines = ["🔎 *Similar papers:*\n"]
+    for i, (match, score) in enumerate(matches, 1):
+        # Escapes only work outside entities, so the title is not used as link text
+        lines.append(
+            f"{i}. {escape_markdown(match['title'])}\n"
+            f"   👥 {escape_markdown(', '.join(match['authors']))} | 📅 {match['published']} | {score:.0%} match | "
+            f"[arXiv](https://arxiv.org/abs/{match['id']})"
+        )
+
+    query.message.reply_text(
+        "\n".join(lines),
+        parse_mode=ParseMode.MARKDOWN,
+        disable_web_page_preview=True
+    )
+
 def summarize_paper(update: Update, context: CallbackContext) -> None:
     """Summarize paper and enable Q&A mode."""
     query = update.callback_query
@@ -915,7 +1085,7 @@ def summarize_paper(update: Update, context: CallbackContext) -> None:
 
         paper = next(arxiv.Search(id_list=[paper_id]).results())
         context.user_data['current_paper'] = paper
-        summary = generate_paper_summary(paper)
+        summary = generate_paper_summary(paper, update.effective_user.id)
 
         summary_message = f"""
 *PaperPilot Summary* 🤖
@@ -937,6 +1107,10 @@ Just type your question below and I'll answer based on the paper's content.
             parse_mode=ParseMode.MARKDOWN,
             disable_web_page_preview=True
         )
+        track_activity(update, context, "summaries")
+
+    except SchedulerBusyError:
+        processing_message.edit_text(BUSY_MESSAGE)
 
     except Exception as e:
         processing_message.edit_text(
@@ -1030,6 +1204,7 @@ def download_paper(update: Update, context: CallbackContext) -> None:
                     InlineKeyboardButton("🌟 Rate This Paper", callback_data=f"rate_{paper_id}")
                 ]])
             )
+            track_activity(update, context, "downloads")
 
     except Exception as e:
         error_msg = f"""
@@ -1055,6 +1230,18 @@ _Error details:_ `{str(e)}`
             )
         logger.error(f"Paper download error for {paper_id}: {str(e)}")
 
+def format_qa_answer(question: str, answer: str) -> str:
+    """Format a paper Q&A exchange."""
+    return f"""
+💭 *You:*
+{question}
+
+🤖 *PaperPilot:*
+{answer}
+
+_Ask another question or use /search to find more papers!_
+            """
+
 def chat_about_paper(update: Update, context: CallbackContext) -> None:
     # Check if we're expecting a keyword or journal name
     if context.user_data.get('awaiting_notification_keyword') or context.user_data.get('awaiting_journal_name'):
@@ -1082,6 +1269,17 @@ def chat_about_paper(update: Update, context: CallbackContext) -> None:
     # Get the paper and the user's question
     paper = context.user_data['current_paper']
     question = update.message.text
+    paper_id = paper_dedup.canonical_id(paper)
+
+    # Repeated questions about the same paper (or another version of it) are answered from the cache
+    cached_answer = qa_cache.get(paper_id, question)
+    if cached_answer is not None:
+        update.message.reply_text(
+            format_qa_answer(question, cached_answer),
+            parse_mode=ParseMode.MARKDOWN,
+            quote=True
+        )
+        return
 
     try:
         # Show typing indicator and analyzing message
@@ -1112,22 +1310,24 @@ def chat_about_paper(update: Update, context: CallbackContext) -> None:
         """
 
         # Get response from Gemini
-        response = model.generate_content(prompt)
+        response = llm_scheduler.generate(
+            get_model_for(update.effective_user.id, REQUEST_QA), prompt,
+            user_id=update.effective_user.id,
+            priority=PRIORITY_INTERACTIVE
+        )
+
+        if not is_stub_response(response):
+            qa_cache.set(paper_id, question, response.text)
 
         # Update the analyzing message with the answer
         analyzing_message.edit_text(
-            f"""
-💭 *You:*
-{question}
-
-🤖 *PaperPilot:*
-{response.text}
-
-_Ask another question or use /search to find more papers!_
-            """,
+            format_qa_answer(question, response.text),
             parse_mode=ParseMode.MARKDOWN
         )
 
+    except SchedulerBusyError:
+        analyzing_message.edit_text(BUSY_MESSAGE)
+
     except Exception as e:
         analyzing_message.edit_text(
             f"❌ Sorry, I couldn't process your question: {str(e)}"
@@ -1158,6 +1358,7 @@ def get_latest_papers(update: Update, context: CallbackContext) -> None:
             loading_message.edit_text("❌ Could not fetch latest papers. Please try again later.")
             return
 
+        paper_index.add_papers(results)
         context.user_data['search_state'] = {
             'results': results,
             'current_index': 0,
@@ -1212,7 +1413,7 @@ def add_paper_to_comparison(update: Update, context: CallbackContext) -> None:
         papers_list = context.user_data['papers_to_compare']
 
         # Check if paper is already in the list
-        if any(p.entry_id == paper.entry_id for p in papers_list):
+        if any(paper_dedup.canonical_id(p) == paper_dedup.canonical_id(paper) for p in papers_list):
             query.answer("❌ This paper is already in your comparison list!")
             return
 
@@ -1283,7 +1484,8 @@ def generate_comparison(update: Update, context: CallbackContext) -> None:
         )
         return
 
-    papers = context.user_data['papers_to_compare']
+    # Cached comparisons are shared across users, so label papers in a fixed order
+    papers = paper_comparison.order_papers(context.user_data['papers_to_compare'])
     if len(papers) < 2:
         update.message.reply_text(
             "❌ Please add at least 2 papers to compare\\!"
@@ -1303,8 +1505,14 @@ def generate_comparison(update: Update, context: CallbackContext) -> None:
         if not comparison:
             comparison = paper_comparison.compare_papers(papers)
             prompt = paper_comparison.generate_comparison_prompt(papers)
-            ai_response = model.generate_content(prompt)
+            ai_response = llm_scheduler.generate(
+                get_model_for(update.effective_user.id, REQUEST_COMPARISON), prompt,
+                user_id=update.effective_user.id,
+                priority=PRIORITY_BATCH
+            )
             comparison.methodology_comparison = str(ai_response.text)
+            if not is_stub_response(ai_response):
+                paper_comparison.comparison_cache.set(papers, comparison)
 
         # Format papers with cool emojis
         papers_list = []
@@ -1414,6 +1622,9 @@ def generate_comparison(update: Update, context: CallbackContext) -> None:
         # Clear the comparison list
         context.user_data['papers_to_compare'] = []
 
+    except SchedulerBusyError:
+        processing_msg.edit_text(escape_markdown_v2(BUSY_MESSAGE), parse_mode=ParseMode.MARKDOWN_V2)
+
     except Exception as e:
         logger.error(f"Comparison error: {str(e)}")
         if processing_msg:
@@ -1427,6 +1638,102 @@ def generate_comparison(update: Update, context: CallbackContext) -> None:
                     "❌ Oops! Something went wrong. Let's try that again!"
                 )
 
+@subscription_required
+def survey_command(update: Update, context: CallbackContext) -> None:
+    """Survey a large set of papers by clustering them into themes."""
+    if 'session' not in context.user_data:
+        context.user_data['session'] = UserSession()
+    session = context.user_data['session']
+
+    if not session.can_compare():
+        update.message.reply_text("📊 You've reached your daily comparison limit. Try again tomorrow!")
+        return
+
+    processing_msg = update.message.reply_text("🗺️ Mapping the research landscape... please wait...")
+
+    try:
+        if context.args:
+            # Survey a fresh result set for the given query
+            search = arxiv.Search(
+                query=' '.join(context.args),
+                max_results=paper_comparison.MAX_PAPERS_TO_SURVEY,
+                sort_by=arxiv.SortCriterion.Relevance
+            )
+            papers = list(search.results())
+            paper_index.add_papers(papers)
+        else:
+            # Otherwise survey the current search results
+            papers = context.user_data.get('search_state', {}).get('results', [])
+
+        if len(papers) < 3:
+            processing_msg.edit_text(
+                "❌ A survey needs at least 3 papers.\n"
+                "Use /survey <query> or run /search first!"
+            )
+            return
+
+        survey, clusters = paper_comparison.survey_papers(papers)
+        papers = papers[:paper_comparison.MAX_PAPERS_TO_SURVEY]
+        prompt = paper_comparison.generate_survey_prompt(papers, clusters)
+        ai_response = llm_scheduler.generate(
+            get_model_for(update.effective_user.id, REQUEST_COMPARISON), prompt,
+            user_id=update.effective_user.id,
+            priority=PRIORITY_BATCH
+        )
+        survey.methodology_comparison = str(ai_response.text)
+
+        theme_emojis = ["🔵", "🟢", "🟡", "🟣", "🟠", "🔴"]
+        themes = []
+        for i, (cluster, (theme, topics)) in enumerate(zip(clusters, survey.unique_aspects.items())):
+            representative = escape_markdown_v2(str(papers[cluster.representative].title))
+            topics_text = escape_markdown_v2(", ".join(topics))
+            themes.append(
+                f"{theme_emojis[i % len(theme_emojis)]} *{escape_markdown_v2(theme)}*\n"
+                f"   📌 {representative}\n"
+                f"   🏷️ {topics_text}"
+            )
+
+        common_topics_text = "\n".join(
+            f"⭐️ {escape_markdown_v2(topic)}" for topic in survey.common_topics
+        ) or "⭐️ No single theme dominates"
+        safe_similarity = escape_markdown_v2(f"{survey.similarity_score:.2%}")
+
+        response = "".join([
+            "*PaperPilot Research Survey*\n\n",
+            f"📚 *{len(papers)} papers in {len(clusters)} themes*\n",
+            f"🎯 Average similarity: {safe_similarity}\n\n",
+            "🌟 *Dominant Topics*\n",
+            f"{common_topics_text}\n\n",
+            "🧩 *Themes*\n",
+            "\n".join(themes), "\n\n",
+            "📊 *Survey Analysis*\n",
+            f"{escape_markdown_v2(survey.methodology_comparison)}\n\n",
+            "🤖 Powered by PaperPilot AI"
+        ])
+
+        processing_msg.delete()
+        chunks = split_long_message(response, 4000)
+        for i, chunk in enumerate(chunks):
+            if len(chunks) > 1:
+                chunk = f"✨ *PaperPilot Survey \\| Part {i+1}/{len(chunks)}* ✨\n\n" + chunk
+            context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=chunk,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                disable_web_page_preview=True
+            )
+            if i < len(chunks) - 1:
+                time.sleep(0.5)
+
+        session.record_comparison()
+
+    except SchedulerBusyError:
+        processing_msg.edit_text(BUSY_MESSAGE)
+
+    except Exception as e:
+        logger.error(f"Survey error: {str(e)}")
+        processing_msg.edit_text("❌ Oops! Something went wrong while building the survey. Please try again!")
+
 def safe_send_message(update: Update, context: CallbackContext, text: str, **kwargs) -> None:
     """Safely send messages with retry logic and splitting."""
     try:
@@ -2158,81 +2465,141 @@ _All buttons are clickable - tap any option to change settings_
         except:
             pass
 
+def send_paper_alert(context: CallbackContext, user_id: int, prefs: Dict, results: List) -> None:
+    """Send the user the papers published since their last check and mark them checked."""
+    last_check = datetime.strptime(prefs['last_checked'], '%Y-%m-%d %H:%M:%S')
+    new_papers = [paper for paper in results if paper.published.replace(tzinfo=None) > last_check]
+
+    if new_papers:
+        # Send notification
+        message = f"🔔 *New Papers Alert!*\n\nFound {len(new_papers)} new papers matching your interests:\n\n"
+
+        for i, paper in enumerate(new_papers[:5], 1):
+            message += f"{i}. [{paper.title}]({paper.pdf_url})\n"
+
+        if len(new_papers) > 5:
+            message += f"\n_...and {len(new_papers) - 5} more papers_"
+
+        context.bot.send_message(
+            chat_id=user_id,
+            text=message,
+            parse_mode=ParseMode.MARKDOWN,
+            disable_web_page_preview=True
+        )
+
+    # Update last checked time
+    prefs['last_checked'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    prefs['last_notification'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
 def check_notifications(context: CallbackContext) -> None:
     """Check and send notifications to users."""
-    job = context.job
     notif_manager = NotificationPreferences()
 
-    # Get all notification files
-    for filename in os.listdir(notif_manager.notifications_dir):
-        if not filename.startswith("notifications_"):
-            continue
-
+    # Only users whose next check is due are loaded; saving prefs below reschedules them.
+    # Due users are grouped by canonical subscription so each distinct query runs once.
+    subscribers: Dict[SubscriptionKey, List] = {}
+    for user_id in notif_manager.get_due_user_ids(limit=NOTIFICATION_BATCH_SIZE):
         try:
-            user_id = int(filename.split('_')[1].split('.')[0])
             prefs = notif_manager.get_preferences(user_id)
 
-            if not prefs['enabled'] or not notif_manager.should_notify(user_id):
+            if not notif_manager.should_notify(user_id, prefs):
+                notif_manager.save_preferences(user_id, prefs)
                 continue
 
-            # Search for new papers
-            search_query_parts = []
-
-            # Add keywords
-            for keyword in prefs['keywords']:
-                search_query_parts.append(keyword)
-
-            # Add categories if any
-            if prefs['categories']:
-                category_filter = ' OR '.join(f'cat:{cat}' for cat in prefs['categories'])
-                search_query_parts.append(f"({category_filter})")
+            subscribers.setdefault(subscription_key(prefs), []).append((user_id, prefs))
+        except Exception as e:
+            logger.error(f"Error processing notifications for user {user_id}: {str(e)}")
+            notif_manager.postpone(user_id, NOTIFICATION_RETRY_DELAY)
 
-            # Get papers from last day/week
-            time_window = 7 if prefs['frequency'] == 'weekly' else 1
-            last_check = datetime.strptime(prefs['last_checked'], '%Y-%m-%d %H:%M:%S')
+    if not subscribers:
+        return
 
-            query = ' AND '.join(f"({part})" for part in search_query_parts if part)
+    # Match the new submissions in the subscribed categories against all subscriptions at once
+    percolator = SubscriptionPercolator(get_keyword_automaton())
+    keyword_only = []
+    for key in subscribers:
+        keywords, categories = key
+        if categories:
+            percolator.add(key)
+        elif keywords:
+            keyword_only.append(key)
+    since = min(
+        datetime.strptime(prefs['last_checked'], '%Y-%m-%d %H:%M:%S')
+        for users in subscribers.values() for _, prefs in users
+    )
+    matches: Dict[SubscriptionKey, List] = {key: [] for key in subscribers}
+    failed = set()
+    try:
+        papers = paper_harvester.harvest(percolator.harvest_categories(), since)
+    except Exception as e:
+        logger.error(f"Error harvesting new papers for notifications: {str(e)}")
+        failed.update(key for key in subscribers if key not in keyword_only)
+        papers = []
+    for paper in papers:
+        for key in percolator.match(paper):
+            matches[key].append(paper)
+
+    # Keyword-only subscriptions cover all of arXiv, so each keeps its own search
+    for key in keyword_only:
+        query = subscription_query(key)
+        try:
             search = arxiv.Search(
                 query=query,
                 max_results=10,
                 sort_by=arxiv.SortCriterion.SubmittedDate
             )
+            matches[key] = list(search.results())
+        except Exception as e:
+            logger.error(f"Error searching for notification query {query}: {str(e)}")
+            failed.add(key)
 
-            results = list(search.results())
-            new_papers = []
+    for key in failed:
+        for user_id, _ in subscribers.pop(key):
+            notif_manager.postpone(user_id, NOTIFICATION_RETRY_DELAY)
 
-            for paper in results:
-                if paper.published.replace(tzinfo=None) > last_check:
-                    new_papers.append(paper)
+    logger.info(f"Notification check: {sum(len(users) for users in subscribers.values())} due users, "
+                f"{len(subscribers)} distinct subscriptions, {len(papers)} new papers")
 
-            if new_papers:
-                # Send notification
-                message = f"🔔 *New Papers Alert!*\n\nFound {len(new_papers)} new papers matching your interests:\n\n"
+    for key, users in subscribers.items():
+        for user_id, prefs in users:
+            try:
+                send_paper_alert(context, user_id, prefs, matches[key])
+                notif_manager.save_preferences(user_id, prefs)
+            except Exception as e:
+                logger.error(f"Error processing notifications for user {user_id}: {str(e)}")
+                notif_manager.postpone(user_id, NOTIFICATION_RETRY_DELAY)
 
-                for i, paper in enumerate(new_papers[:5], 1):
-                    message += f"{i}. [{paper.title}]({paper.pdf_url})\n"
 
-                if len(new_papers) > 5:
-                    message += f"\n_...and {len(new_papers) - 5} more papers_"
+def add_llm_handlers(dp) -> None:
+    """Register the handlers that call the LLM.
 
-                context.bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN,
-                    disable_web_page_preview=True
-                )
+    They run on the dispatcher's worker threads so a slow model call does not
+    hold up other users; llm_scheduler decides how many run at once.
+    """
+    dp.add_handler(CommandHandler("compare", generate_comparison, run_async=True), group=2)
+    dp.add_handler(CommandHandler("survey", survey_command, run_async=True), group=2)
+    dp.add_handler(CallbackQueryHandler(summarize_paper, pattern="^summarize_", run_async=True), group=2)
 
-            # Update last checked time
-            prefs['last_checked'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            prefs['last_notification'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            notif_manager.save_preferences(user_id, prefs)
+    # Paper Q&A, unless the message answers a keyword or journal prompt
+    dp.add_handler(MessageHandler(
+        Filters.text & ~Filters.command & Filters.chat_type.private,
+        lambda u, c: chat_about_paper(u, c) if not (
+            c.user_data.get('awaiting_notification_keyword') or
+            c.user_data.get('awaiting_journal_name')
+        ) else None,
+        run_async=True
+    ), group=3)
 
-        except Exception as e:
-            logger.error(f"Error processing notifications for user {user_id}: {str(e)}")
+    # Chat mode, with lower priority than other handlers
+    dp.add_handler(MessageHandler(
+        Filters.text & ~Filters.command & Filters.chat_type.private,
+        handle_chat_message,
+        run_async=True
+    ), group=5)
 
 
 def main() -> None:
-    updater = Updater(TOKEN)
+    updater = Updater(TOKEN, workers=DISPATCHER_WORKERS)
     dp = updater.dispatcher
 
     advanced_search_handler = ConversationHandler(
@@ -2292,9 +2659,13 @@ def main() -> None:
 
     admin_manager = AdminManager()
     dp.bot_data['admin_manager'] = admin_manager
+    # Runs before every other group, so updates from blocked or restricted users reach no handler
+    dp.add_handler(TypeHandler(Update, gate_restricted_users), group=-1)
 
     dp.add_handler(CommandHandler("admin", admin_command))
-    dp.add_handler(CallbackQueryHandler(handle_admin_callback, pattern="^admin_"))
+    dp.add_handler(CommandHandler("finduser", finduser_command))
+    # users_ callbacks only page the user list; its restrict and block buttons send restrict_ actions
+    dp.add_handler(CallbackQueryHandler(handle_admin_callback, pattern=r"^(admin_|restrict_|users_(prev|next|sort)$)"))
 
     voice_handler = VoiceSearchHandler()
     dp.bot_data['chat_handler'] = ChatHandler()
@@ -2305,7 +2676,6 @@ def main() -> None:
     dp.add_handler(CommandHandler("search", handle_search), group=2)
     dp.add_handler(CommandHandler("about", about_command), group=2)
     dp.add_handler(CommandHandler("latest", get_latest_papers), group=2)
-    dp.add_handler(CommandHandler("compare", generate_comparison), group=2)
     dp.add_handler(CommandHandler("clear_comparison", clear_comparison), group=2)
     dp.add_handler(CommandHandler("settings", settings_command), group=2)
     dp.add_handler(CommandHandler("notifications", setup_notifications), group=2)
@@ -2321,10 +2691,10 @@ def main() -> None:
     dp.add_handler(CallbackQueryHandler(handle_max_results_callback, pattern="^set_max_results_"), group=2)
     dp.add_handler(CallbackQueryHandler(handle_journal_actions, pattern="^journal_"), group=2)
     dp.add_handler(CallbackQueryHandler(handle_back_to_settings, pattern="^back_settings$"), group=2)
-    dp.add_handler(CallbackQueryHandler(summarize_paper, pattern="^summarize_"), group=2)
     dp.add_handler(CallbackQueryHandler(download_paper, pattern="^download_"), group=2)
     dp.add_handler(CallbackQueryHandler(handle_more_results, pattern="^more_results"), group=2)
     dp.add_handler(CallbackQueryHandler(add_paper_to_comparison, pattern="^compare_add_"), group=2)
+    dp.add_handler(CallbackQueryHandler(show_similar_papers, pattern="^similar_"), group=2)
     dp.add_handler(CallbackQueryHandler(voice_handler.handle_voice_callback, pattern='^(retry|edit|search)_voice_'))
     dp.add_handler(CallbackQueryHandler(handle_categories_menu, pattern="^settings_categories$"), group=2)
     dp.add_handler(CallbackQueryHandler(handle_category_field, pattern="^category_field_"), group=2)
@@ -2351,12 +2721,6 @@ def main() -> None:
     ))
 
 
-    # Add chat message handler with lower priority than other handlers
-    dp.add_handler(MessageHandler(
-        Filters.text & ~Filters.command & Filters.chat_type.private,
-        handle_chat_message
-    ), group=5)  # Higher group number means lower priority
-
     dp.add_handler(CallbackQueryHandler(
         handle_search_options,
         pattern='^(simple_search|advanced_search|back_to_search_options)$'
@@ -2377,15 +2741,8 @@ def main() -> None:
     )
     dp.add_handler(journal_handler, group=2)
 
-    # Add general chat handler (lowest priority)
-    chat_handler = MessageHandler(
-        Filters.text & ~Filters.command & Filters.chat_type.private,
-        lambda u, c: chat_about_paper(u, c) if not (
-            c.user_data.get('awaiting_notification_keyword') or
-            c.user_data.get('awaiting_journal_name')
-        ) else None
-    )
-    dp.add_handler(chat_handler, group=3)
+    # Summaries, comparisons, surveys and chat run concurrently
+    add_llm_handlers(dp)
 
     # Add voice handler
     dp.add_handler(MessageHandler(
@@ -2393,10 +2750,18 @@ def main() -> None:
         voice_handler.process_voice
     ))
 
+    # Check for due paper notifications periodically
+    updater.job_queue.run_repeating(check_notifications, interval=NOTIFICATION_CHECK_INTERVAL, first=60)
+
     # Start the Bot
     updater.start_polling()
     logger.info("✨ ArXiv Research Assistant is online! 🚀")
     updater.idle()
 
+    # Persist anything cached since the last periodic write
+    paper_comparison.comparison_cache.close()
+    preferences_manager.close()
+    admin_manager.close()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
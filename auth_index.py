@@ -0,0 +1,96 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+
+from storage import Storage, TIMESTAMP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+
+class AuthIndex:
+    """In-memory index of admins and restrictions for per-request gate checks.
+
+    Holds the admin ids, the blocked ids and the active temporary
+    restrictions with a min-heap of their expiry times, so is_admin and
+    is_restricted are set and dict lookups. The index is rebuilt after
+    writes made through invalidate(), and at most every check_interval
+    seconds it reads the auth_version counter, which storage bumps only on
+    admin and restriction writes, to pick up changes made elsewhere.
+    """
+
+    def __init__(self, storage: Storage, check_interval_seconds: float = 1.0):
+        self.storage = storage
+        self.check_interval = check_interval_seconds
+
+        self._lock = threading.Lock()
+        self._admins: Set[int] = set()
+        self._blocked: Set[int] = set()
+        self._restricted: Dict[int, str] = {}
+        self._expiries: List[Tuple[str, int]] = []
+
+        self._stale = True
+        self._version = None
+        self._next_check = 0.0
+
+    def invalidate(self) -> None:
+        """Rebuild the index on the next lookup."""
+        self._stale = True
+
+    def _refresh(self) -> None:
+        """Reload from the database if it may have changed. Caller holds the lock."""
+        now = time.monotonic()
+        if not self._stale and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        version = self.storage.get_auth_version()
+        if not self._stale and version == self._version:
+            return
+
+        # Clear the flag first so a write landing during the reload triggers another one
+        self._stale = False
+        self._version = version
+        current_time = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+        self._admins = {row["user_id"] for row in self.storage.get_admins()}
+        self._blocked = set()
+        self._restricted = {}
+        for row in self.storage.list_restrictions(current_time):
+            if row["kind"] == "blocked":
+                self._blocked.add(row["user_id"])
+            else:
+                self._restricted[row["user_id"]] = row["end_time"]
+        self._expiries = [(end_time, user_id) for user_id, end_time in self._restricted.items()]
+        heapq.heapify(self._expiries)
+
+    def _expire(self, current_time: str) -> None:
+        """Drop restrictions whose end time has passed. Caller holds the lock."""
+        while self._expiries and self._expiries[0][0] <= current_time:
+            end_time, user_id = heapq.heappop(self._expiries)
+            if self._restricted.get(user_id) == end_time:
+                del self._restricted[user_id]
+
+    def is_admin(self, user_id: int) -> bool:
+        with self._lock:
+            self._refresh()
+            return user_id in self._admins
+
+    def is_restricted(self, user_id: int) -> bool:
+        """Whether the user is blocked or under an unexpired restriction."""
+        with self._lock:
+            self._refresh()
+            if user_id in self._blocked:
+                return True
+            if user_id not in self._restricted:
+                return False
+            self._expire(datetime.utcnow().strftime(TIMESTAMP_FORMAT))
+            return user_id in self._restricted
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "admins": len(self._admins),
+                "blocked": len(self._blocked),
+                "restricted": len(self._restricted)
+            }
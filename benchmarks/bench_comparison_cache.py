@@ -0,0 +1,65 @@
+"""Benchmark PaperComparisonCache inserts as the cache grows to 100k entries.
+
+Run from the repository root:
+
+    python benchmarks/bench_comparison_cache.py
+
+Per-batch insert time should stay flat: expiry and LRU eviction only touch
+the front of the ordered indexes instead of scanning every entry.
+"""
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Canonical-id lookups open the bot database; keep it out of bot_data/
+DATA_DIR = tempfile.TemporaryDirectory(prefix="paperpilot-bench-")
+os.environ["BOT_DB_PATH"] = os.path.join(DATA_DIR.name, "bot.db")
+
+from paper_comparison import ComparisonResult, PaperComparisonCache  # noqa: E402
+
+TOTAL_ENTRIES = 100_000
+BATCH_SIZE = 10_000
+
+
+def make_pair(i: int):
+    return [SimpleNamespace(entry_id=f"http://arxiv.org/abs/{i:07d}a"),
+            SimpleNamespace(entry_id=f"http://arxiv.org/abs/{i:07d}b")]
+
+
+def run(max_entries: int) -> None:
+    cache = PaperComparisonCache(max_entries=max_entries, cache_file=None)
+    result = ComparisonResult(similarity_score=0.5, common_topics=[], unique_aspects={},
+                              methodology_comparison="", findings_comparison="",
+                              impact_comparison="")
+    print(f"max_entries={max_entries}")
+    print(f"{'entries':>9} {'insert batch':>13} {'per insert':>11} {'lookup batch':>13}")
+    for start in range(0, TOTAL_ENTRIES, BATCH_SIZE):
+        pairs = [make_pair(i) for i in range(start, start + BATCH_SIZE)]
+
+        started = time.perf_counter()
+        for pair in pairs:
+            cache.set(pair, result)
+        insert_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for pair in pairs:
+            cache.get(pair)
+        lookup_time = time.perf_counter() - started
+
+        print(f"{start + BATCH_SIZE:>9} {insert_time * 1000:>11.1f}ms "
+              f"{insert_time / BATCH_SIZE * 1e6:>9.2f}us {lookup_time * 1000:>11.1f}ms")
+    print(cache.get_stats())
+    print()
+
+
+def main() -> None:
+    run(max_entries=TOTAL_ENTRIES)  # cache only grows
+    run(max_entries=BATCH_SIZE)     # every insert evicts once full
+
+
+if __name__ == "__main__":
+    main()
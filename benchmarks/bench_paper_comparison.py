@@ -0,0 +1,200 @@
+"""Benchmark the paper_comparison hot paths against a saved baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_paper_comparison.py --save-baseline   # record
+    python benchmarks/bench_paper_comparison.py                   # compare
+
+Papers are loaded from benchmarks/data/synthetic_abstracts.json, a fixed
+set of hand-written, arXiv-style abstracts of 50-150 words across several
+categories. They are not real papers or captured traffic; they stand in for
+them so the suite runs offline and every run sees the same input. For each case the
+median time per call and the peak traced allocation of one call are
+reported. When a baseline exists, cases slower than --threshold or
+allocating more than --threshold over it are flagged and the script exits
+with status 1. Baselines are machine specific and are not committed.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Canonical-id lookups open the bot database; keep it out of bot_data/
+DATA_DIR = tempfile.TemporaryDirectory(prefix="paperpilot-bench-")
+os.environ["BOT_DB_PATH"] = os.path.join(DATA_DIR.name, "bot.db")
+
+import paper_comparison  # noqa: E402
+from text_similarity import similarity_engine  # noqa: E402
+
+ABSTRACTS_FILE = os.path.join(BENCH_DIR, "data", "synthetic_abstracts.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline_paper_comparison.json")
+
+
+def load_papers(path: str = ABSTRACTS_FILE):
+    """Paper stand-ins exposing the attributes paper_comparison reads."""
+    with open(path, 'r') as f:
+        records = json.load(f)
+    return [
+        SimpleNamespace(
+            entry_id=r['entry_id'],
+            title=r['title'],
+            authors=r['authors'],
+            published=datetime.strptime(r['published'], '%Y-%m-%d'),
+            primary_category=r['primary_category'],
+            summary=r['summary']
+        )
+        for r in records
+    ]
+
+
+def relabel(papers, suffix: str):
+    """Copies of papers with new entry ids, so per-paper caches miss."""
+    return [SimpleNamespace(**{**vars(p), 'entry_id': f"{p.entry_id}-{suffix}"}) for p in papers]
+
+
+def clear_caches() -> None:
+    paper_comparison._topic_profiles.clear()
+    similarity_engine._cache.clear()
+
+
+def build_cases(papers):
+    """Map case name to (setup, func); setup, if any, runs untimed before every call."""
+    by_length = sorted(papers, key=lambda p: len(p.summary))
+    short, median, longest = by_length[0], by_length[len(by_length) // 2], by_length[-1]
+
+    cases = {
+        "extract_key_topics/short": (None, lambda: paper_comparison.extract_key_topics(short.summary)),
+        "extract_key_topics/median": (None, lambda: paper_comparison.extract_key_topics(median.summary)),
+        "extract_key_topics/long": (None, lambda: paper_comparison.extract_key_topics(longest.summary)),
+        "calculate_text_similarity/pair": (
+            None, lambda: paper_comparison.calculate_text_similarity(median.summary, longest.summary)),
+        "generate_comparison_prompt/2": (None, lambda: paper_comparison.generate_comparison_prompt(papers[:2])),
+        "generate_comparison_prompt/5": (None, lambda: paper_comparison.generate_comparison_prompt(papers[:5])),
+    }
+    for count in (2, 5, len(papers)):
+        subset = papers[:count]
+        cases[f"compare_papers/{count}/cold"] = (clear_caches, lambda s=subset: paper_comparison.compare_papers(s))
+        cases[f"compare_papers/{count}/warm"] = (None, lambda s=subset: paper_comparison.compare_papers(s))
+
+    # Wider comparisons reuse the synthetic abstracts under fresh ids
+    many = papers + relabel(papers, "b") + relabel(papers, "c") + relabel(papers, "d")
+    cases[f"compare_papers/{len(many)}/cold"] = (clear_caches, lambda: paper_comparison.compare_papers(many))
+    return cases
+
+
+def measure(setup, func, repeat: int, min_time: float):
+    """Median seconds per call and peak bytes allocated by one call."""
+    setup_each = setup is not None
+    setup = setup or (lambda: None)
+    setup()
+    func()  # warm up imports and caches the case does not clear
+
+    # Find a loop count that runs for at least min_time
+    loops = 1
+    while True:
+        setup()
+        elapsed = timeit.timeit(func, number=loops)
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10
+
+    if setup_each:
+        timings = []
+        for _ in range(repeat):
+            total = 0.0
+            for _ in range(loops):
+                setup()
+                total += timeit.timeit(func, number=1)
+            timings.append(total / loops)
+    else:
+        timings = [t / loops for t in timeit.repeat(func, number=loops, repeat=repeat)]
+
+    setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def run(repeat: int, min_time: float, only: str = ""):
+    cases = build_cases(load_papers())
+    results = {}
+    for name, (setup, func) in cases.items():
+        if only and only not in name:
+            continue
+        seconds, peak = measure(setup, func, repeat, min_time)
+        results[name] = {"seconds": seconds, "peak_bytes": peak}
+    return results
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def report(results, baseline, threshold: float):
+    """Print the results table and return the names of regressed cases."""
+    regressions = []
+    print(f"{'case':<36} {'time':>10} {'peak alloc':>11} {'vs baseline':>22}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        change = ""
+        if previous:
+            time_ratio = current["seconds"] / previous["seconds"] if previous["seconds"] else 1.0
+            mem_ratio = current["peak_bytes"] / previous["peak_bytes"] if previous["peak_bytes"] else 1.0
+            change = f"{time_ratio - 1:+.0%} time {mem_ratio - 1:+.0%} mem"
+            if time_ratio > 1 + threshold or mem_ratio > 1 + threshold:
+                regressions.append(name)
+                change += "  REGRESSION"
+        print(f"{name:<36} {format_time(current['seconds']):>10} "
+              f"{current['peak_bytes'] / 1024:>9.1f}KB {change:>22}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per case")
+    parser.add_argument("--min-time", type=float, default=0.02, help="minimum seconds per timing repeat")
+    parser.add_argument("--only", default="", help="run cases whose name contains this string")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.min_time, args.only)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif not baseline:
+        print("\nNo baseline found; run with --save-baseline to record one.")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
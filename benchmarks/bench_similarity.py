@@ -0,0 +1,77 @@
+"""Benchmark TF-IDF similarity against difflib.SequenceMatcher.
+
+Run from the repository root:
+
+    python benchmarks/bench_similarity.py
+"""
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_similarity import TfidfSimilarityEngine  # noqa: E402
+
+VOCABULARY = (
+    "neural network training data model learning deep representation graph "
+    "quantum state circuit optimization gradient descent convergence bound "
+    "theorem proof algorithm complexity sampling inference bayesian prior "
+    "posterior distribution estimation robust adversarial attack defense "
+    "transformer attention language vision image segmentation detection "
+    "reinforcement policy reward agent environment simulation physics particle "
+    "energy spectrum galaxy cosmology dark matter protein structure folding "
+    "molecular dynamics genome sequence expression cell tissue clinical trial"
+).split()
+
+
+def make_abstracts(count: int, seed: int = 7):
+    """Synthetic abstracts of 120-260 words drawn from a shared vocabulary."""
+    rng = random.Random(seed)
+    abstracts = []
+    for _ in range(count):
+        focus = rng.sample(VOCABULARY, 12)
+        words = [rng.choice(focus) if rng.random() < 0.6 else rng.choice(VOCABULARY)
+                 for _ in range(rng.randint(120, 260))]
+        abstracts.append(" ".join(words))
+    return abstracts
+
+
+def time_call(func, repeat: int) -> float:
+    """Best wall time of func over repeat runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def sequence_matcher_all_pairs(abstracts):
+    n = len(abstracts)
+    for i in range(n):
+        for j in range(i + 1, n):
+            SequenceMatcher(None, abstracts[i].lower(), abstracts[j].lower()).ratio()
+
+
+def main() -> None:
+    print(f"{'papers':>7} {'SequenceMatcher':>16} {'TF-IDF cold':>12} {'TF-IDF cached':>14} {'speedup':>8}")
+    for count in (3, 10, 100):
+        abstracts = make_abstracts(count)
+        keys = [f"paper-{i}" for i in range(count)]
+        repeat = 1 if count == 100 else 10
+
+        baseline = time_call(lambda: sequence_matcher_all_pairs(abstracts), repeat)
+        cold = time_call(lambda: TfidfSimilarityEngine().similarity_matrix(abstracts, keys), repeat)
+
+        engine = TfidfSimilarityEngine()
+        engine.similarity_matrix(abstracts, keys)
+        warm = time_call(lambda: engine.similarity_matrix(abstracts, keys), repeat)
+
+        print(f"{count:>7} {baseline * 1000:>14.2f}ms {cold * 1000:>10.2f}ms "
+              f"{warm * 1000:>12.2f}ms {baseline / warm:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measure how many queries the topic classifier decides without the LLM.
+
+Scores held-out queries that are not in topic_seeds and reports, per
+class, the share decided locally and how many of those were right, along
+with the probabilities of the undecided ones. Run from the repository
+root:
+
+    python benchmarks/bench_topic_classifier.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from topic_classifier import TopicClassifier  # noqa: E402
+from topic_seeds import ALLOWED_TOPICS  # noqa: E402
+
+ACADEMIC_QUERIES = [
+    "how do vaccines work", "what is a fourier series", "explain the photoelectric effect",
+    "how does mitosis differ from meiosis", "what is a confidence interval",
+    "how do gravitational waves get detected", "what is the central limit theorem",
+    "explain how batch normalization helps training", "what is chaos theory",
+    "how are rna viruses different", "what is the speed of light in a medium",
+    "explain maxwell's equations", "what does this paper propose", "how do antibiotics kill bacteria",
+    "what is a black hole event horizon", "how do you compute a derivative",
+    "what is a decision tree classifier", "what are prime numbers", "how does sonar work",
+    "explain the krebs cycle",
+]
+
+CASUAL_QUERIES = [
+    "what is the weather in london", "asdf qwerty", "hey whats going on", "recommend a nice cafe nearby",
+    "who is the greatest tennis player", "i want sushi", "can you tell me a funny story",
+    "what movie should i watch tonight", "how do i get to the airport", "where can i buy cheap jeans",
+    "my boyfriend is angry", "lets hang out", "see you later", "what's your favourite food",
+    "is it going to snow", "which team will win the league", "play some music", "buy ethereum",
+    "how to get followers on instagram", "book a hotel in madrid",
+]
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        classifier = TopicClassifier(ALLOWED_TOPICS, decisions_file=os.path.join(directory, "decisions.jsonl"))
+
+    undecided = []
+    print(f"{'class':<10}{'queries':>9}{'local':>8}{'correct':>9}")
+    for name, queries, label in (("academic", ACADEMIC_QUERIES, True), ("casual", CASUAL_QUERIES, False)):
+        local = correct = 0
+        for query in queries:
+            verdict = classifier.classify(query)
+            if verdict is None:
+                undecided.append((classifier.predict_proba(query), query))
+            else:
+                local += 1
+                correct += verdict == label
+        print(f"{name:<10}{len(queries):>9}{local:>8}{correct:>9}")
+
+    stats = classifier.get_stats()
+    print(f"\ndecided locally: {stats['local_share']:.0%} ({stats['local']}/{stats['local'] + stats['llm']})")
+    print("\nsent to the LLM:")
+    for p, query in sorted(undecided):
+        print(f"  {p:.2f}  {query}")
+
+
+if __name__ == "__main__":
+    main()
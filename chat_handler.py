@@ -3,23 +3,22 @@ from telegram import Update, ParseMode, InlineKeyboardButton, InlineKeyboardMark
 from telegram.ext import CallbackContext
 import google.generativeai as genai
 import random
+from typing import Optional
+from llm_scheduler import llm_scheduler, SchedulerBusyError, BUSY_MESSAGE, PRIORITY_INTERACTIVE
+from topic_classifier import TopicClassifier
+from topic_seeds import ALLOWED_TOPICS
+from model_router import is_stub_response
 
 logger = logging.getLogger(__name__)
 
 class ChatHandler:
     def __init__(self):
         self.active_chats = {}  # Store active chat sessions
-        # Define allowed topics and their related keywords
-        self.allowed_topics = {
-            "physics": ["quantum", "relativity", "mechanics", "particles", "energy", "force", "waves", "matter"],
-            "mathematics": ["algebra", "calculus", "geometry", "statistics", "probability", "theorem", "equation"],
-            "computer_science": ["algorithm", "programming", "machine learning", "AI", "data structure", "computation"],
-            "biology": ["genetics", "cells", "evolution", "organism", "molecular", "biology", "neuroscience"],
-            "chemistry": ["molecule", "reaction", "compound", "element", "bond", "atomic", "chemical"],
-            "astronomy": ["cosmos", "galaxy", "planet", "star", "universe", "space", "celestial", "astronomical"],
-            "research": ["paper", "study", "experiment", "theory", "hypothesis", "methodology", "analysis"],
-            "education": ["learning", "teaching", "academic", "study", "knowledge", "education", "research"]
-        }
+        # Allowed topics and their related keywords
+        self.allowed_topics = ALLOWED_TOPICS
+
+        # Local relevance model; the LLM is only asked when it is unsure
+        self.topic_classifier = TopicClassifier(self.allowed_topics)
 
         # Fun off-topic responses
         self.off_topic_responses = [
@@ -35,8 +34,16 @@ class ChatHandler:
             "🔮 My crystal ball only shows academic content! Care to discuss some fascinating research?"
         ]
 
-    def is_topic_relevant(self, query: str, model) -> bool:
-        """Check if the query aligns with academic or research intent using the AI model."""
+    def is_topic_relevant(self, query: str, model, user_id: Optional[int] = None) -> bool:
+        """Check if the query aligns with academic or research intent.
+
+        The local classifier answers confident cases; uncertain ones are sent
+        to the AI model and its verdict is fed back into the classifier.
+        """
+        verdict = self.topic_classifier.classify(query)
+        if verdict is not None:
+            return verdict
+
         check_prompt = f"""
         As an AI, determine if this query is related to academic, scientific, or research topics:
         Query: "{query}"
@@ -44,13 +51,19 @@ class ChatHandler:
         Respond with only 'YES' if it’s relevant, or 'NO' if it’s not.
         """
         try:
-            response = model.generate_content(check_prompt)
-            return response.text.strip() == "YES"
+            response = llm_scheduler.generate(model, check_prompt, user_id=user_id,
+                                              priority=PRIORITY_INTERACTIVE)
+            is_relevant = response.text.strip() == "YES"
+            if not is_stub_response(response):
+                self.topic_classifier.learn(query, is_relevant)
+            return is_relevant
+        except SchedulerBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error checking topic relevance: {str(e)}")
             return False  # Default to off-topic if there’s an error
 
-    def generate_response(self, query: str, model) -> str:
+    def generate_response(self, query: str, model, user_id: Optional[int] = None) -> str:
         """Generate response using the AI model."""
         prompt = f"""
         As PaperPilot, a research-focused AI assistant, respond to this query:
@@ -67,8 +80,11 @@ class ChatHandler:
         """
 
         try:
-            response = model.generate_content(prompt)
+            response = llm_scheduler.generate(model, prompt, user_id=user_id,
+                                              priority=PRIORITY_INTERACTIVE)
             return response.text
+        except SchedulerBusyError:
+            return BUSY_MESSAGE
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             return "I apologize, but I encountered an error processing your query. Please try again."
@@ -137,7 +153,13 @@ Use /endchat to end our conversation.
         query = update.message.text
 
         # Check relevance using the AI model
-        if not self.is_topic_relevant(query, model):
+        try:
+            is_relevant = self.is_topic_relevant(query, model, user_id)
+        except SchedulerBusyError:
+            update.message.reply_text(BUSY_MESSAGE)
+            return
+
+        if not is_relevant:
             update.message.reply_text(
                 random.choice(self.off_topic_responses),
                 parse_mode=ParseMode.MARKDOWN
@@ -162,7 +184,7 @@ Use /endchat to end our conversation.
         )
 
         # Generate the response
-        response = self.generate_response(query, model)
+        response = self.generate_response(query, model, user_id)
 
         # Delete the placeholder and send the response
         context.bot.delete_message(
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Sentence bank used to build deterministic responses
+_SENTENCES = [
+    "The paper proposes a novel approach that improves on prior baselines.",
+    "Its methodology combines a theoretical analysis with extensive experiments.",
+    "The authors evaluate the method on several standard benchmarks.",
+    "Results show consistent gains in accuracy and efficiency.",
+    "A key limitation is the reliance on large amounts of labelled data.",
+    "The work opens directions for future research on scalability.",
+    "Compared with related work, the contribution is mainly empirical.",
+    "The findings have practical implications for real-world deployments.",
+    "An ablation study isolates the effect of each component.",
+    "The theoretical results hold under mild assumptions."
+]
+
+
+class FakeLLMError(Exception):
+    """Error injected by the fake backend."""
+
+
+class FakeChunk:
+    """One streamed piece of a fake response."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics the parts of a Gemini response the bot uses."""
+
+    def __init__(self, chunks: List[str], chunk_delay: float = 0.0, stream: bool = False):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._stream = stream
+        self._consumed = not stream
+
+    @property
+    def text(self) -> str:
+        if not self._consumed:
+            self.resolve()
+        return "".join(self._chunks)
+
+    def resolve(self) -> None:
+        """Wait for the remaining stream to arrive."""
+        for _ in self:
+            pass
+
+    def __iter__(self) -> Iterator[FakeChunk]:
+        for chunk in self._chunks:
+            if self._stream and not self._consumed and self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield FakeChunk(chunk)
+        self._consumed = True
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel.
+
+    Responses are derived from a hash of the prompt, so the same prompt always
+    yields the same text. Latency is sampled from a configurable distribution,
+    streamed responses are split into timed chunks, and errors can be
+    injected at a fixed rate.
+    """
+
+    def __init__(self, model_name: str = "fake-gemini", latency_ms: float = 800.0,
+                 latency_dist: str = "lognormal", latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, chunk_count: int = 8,
+                 chunk_delay_ms: float = 50.0, seed: Optional[int] = None):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.chunk_count = max(1, chunk_count)
+        self.chunk_delay_ms = chunk_delay_ms
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _sample_latency(self) -> float:
+        """Sample a response latency in seconds."""
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        with self._lock:
+            if self.latency_dist == "fixed":
+                return mean
+            if self.latency_dist == "uniform":
+                return self._rng.uniform(0, 2 * mean)
+            if self.latency_dist == "exponential":
+                return self._rng.expovariate(1.0 / mean)
+            # Lognormal with the configured median
+            return self._rng.lognormvariate(math.log(mean), self.latency_sigma)
+
+    def _should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def _render(self, prompt: str) -> str:
+        """Build a deterministic response for the prompt."""
+        prompt = str(prompt)
+        # Topic relevance checks expect a bare YES/NO
+        if "Respond with only 'YES'" in prompt:
+            return "YES"
+        digest = hashlib.sha256(prompt.encode()).digest()
+        count = 3 + digest[0] % 4
+        picked = [_SENTENCES[digest[i + 1] % len(_SENTENCES)] for i in range(count)]
+        return "\n".join(f"• {sentence}" for sentence in picked)
+
+    def _split(self, text: str) -> List[str]:
+        size = max(1, math.ceil(len(text) / self.chunk_count))
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs) -> FakeResponse:
+        """Return a fake response after the sampled latency."""
+        self.calls += 1
+        time.sleep(self._sample_latency())
+        if self._should_fail():
+            self.errors += 1
+            raise FakeLLMError("429 Resource has been exhausted (injected by fake LLM)")
+
+        chunks = self._split(self._render(prompt))
+        return FakeResponse(chunks, self.chunk_delay_ms / 1000.0, stream=stream)
+
+
+def from_env(environ: Optional[Dict[str, str]] = None) -> Optional[FakeGenerativeModel]:
+    """Build a fake model if FAKE_LLM is enabled in the environment."""
+    environ = os.environ if environ is None else environ
+    if environ.get("FAKE_LLM", "").lower() not in ("1", "true", "yes"):
+        return None
+
+    seed = environ.get("FAKE_LLM_SEED")
+    fake = FakeGenerativeModel(
+        latency_ms=float(environ.get("FAKE_LLM_LATENCY_MS", 800)),
+        latency_dist=environ.get("FAKE_LLM_LATENCY_DIST", "lognormal"),
+        latency_sigma=float(environ.get("FAKE_LLM_LATENCY_SIGMA", 0.5)),
+        error_rate=float(environ.get("FAKE_LLM_ERROR_RATE", 0)),
+        chunk_count=int(environ.get("FAKE_LLM_CHUNKS", 8)),
+        chunk_delay_ms=float(environ.get("FAKE_LLM_CHUNK_MS", 50)),
+        seed=int(seed) if seed else None
+    )
+    logger.warning(
+        f"Using fake LLM backend ({fake.latency_dist} latency ~{fake.latency_ms:.0f}ms, "
+        f"error rate {fake.error_rate:.0%})"
+    )
+    return fake
@@ -0,0 +1,152 @@
+import re
+import threading
+from typing import Dict, Hashable, List, Optional, Set
+
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_phrase(text: str) -> str:
+    """Lowercase text with every run of punctuation or whitespace turned into one space."""
+    return NON_WORD_PATTERN.sub(" ", str(text).lower()).strip()
+
+
+class KeywordAutomaton:
+    """Aho–Corasick automaton over keyword phrases, each with a set of owners.
+
+    Phrases and texts are normalized and padded with spaces, so a phrase
+    only matches whole words ("neural networks" does not match inside
+    "neural networkss"). One pass over a text finds every phrase in it,
+    however many phrases there are.
+
+    Adding a phrase extends the trie and marks the failure links stale;
+    they are recomputed once, before the next search. Removing the last
+    owner of a phrase only clears its end marker. The trie is rebuilt from
+    the live phrases when removed phrases outnumber them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners: Dict[str, Set[Hashable]] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._next_match: List[int] = [0]  # nearest proper suffix node that ended a phrase
+        self._phrase: List[Optional[str]] = [None]
+        self._removed = 0
+        self._links_stale = False
+
+    def _insert(self, phrase: str) -> None:
+        node = 0
+        for char in f" {phrase} ":
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._next_match.append(0)
+                self._phrase.append(None)
+            node = child
+        self._phrase[node] = phrase
+        self._links_stale = True
+
+    def _find(self, phrase: str) -> Optional[int]:
+        node = 0
+        for char in f" {phrase} ":
+            node = self._goto[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def _build_links(self) -> None:
+        """Recompute failure and match links breadth-first. Caller holds the lock."""
+        if self._removed > len(self._owners):
+            self._reset()
+            for phrase in self._owners:
+                self._insert(phrase)
+        queue = list(self._goto[0].values())
+        for child in queue:
+            self._fail[child] = 0
+            self._next_match[child] = 0
+        for node in queue:
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                suffix = self._fail[child]
+                self._next_match[child] = suffix if self._phrase[suffix] is not None else self._next_match[suffix]
+                queue.append(child)
+        self._links_stale = False
+
+    def add(self, phrase: str, owner: Hashable) -> None:
+        phrase = normalize_phrase(phrase)
+        if not phrase:
+            return
+        with self._lock:
+            owners = self._owners.get(phrase)
+            if owners is None:
+                owners = self._owners[phrase] = set()
+                self._insert(phrase)
+            owners.add(owner)
+
+    def remove(self, phrase: str, owner: Hashable) -> None:
+        phrase = normalize_phrase(phrase)
+        with self._lock:
+            owners = self._owners.get(phrase)
+            if owners is None:
+                return
+            owners.discard(owner)
+            if not owners:
+                del self._owners[phrase]
+                node = self._find(phrase)
+                if node is not None:
+                    self._phrase[node] = None
+                    self._removed += 1
+                    # Match links through the dead node still lead on to live ones;
+                    # once dead phrases outnumber live ones the next search rebuilds the trie
+                    if self._removed > len(self._owners):
+                        self._links_stale = True
+
+    def update(self, owner: Hashable, old_phrases, new_phrases) -> None:
+        """Move owner from old_phrases to new_phrases."""
+        old = {normalize_phrase(phrase) for phrase in old_phrases}
+        new = {normalize_phrase(phrase) for phrase in new_phrases}
+        for phrase in old - new:
+            self.remove(phrase, owner)
+        for phrase in new - old:
+            self.add(phrase, owner)
+
+    def search(self, text: str) -> Set[str]:
+        """Every phrase occurring in text."""
+        found = set()
+        with self._lock:
+            if self._links_stale:
+                self._build_links()
+            goto, fail, next_match, phrases = self._goto, self._fail, self._next_match, self._phrase
+            node = 0
+            for char in f" {normalize_phrase(text)} ":
+                while node and char not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(char, 0)
+                match = node if phrases[node] is not None else next_match[node]
+                while match:
+                    if phrases[match] is not None:
+                        found.add(phrases[match])
+                    match = next_match[match]
+        return found
+
+    def owners(self, text: str) -> Set[Hashable]:
+        """Owners of every phrase occurring in text."""
+        phrases = self.search(text)
+        matched = set()
+        with self._lock:
+            for phrase in phrases:
+                matched |= self._owners.get(phrase, set())
+        return matched
+
+    def __len__(self) -> int:
+        return len(self._owners)
@@ -0,0 +1,218 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from timeseries import timeseries
+
+logger = logging.getLogger(__name__)
+
+# Priority classes (lower value is served first)
+PRIORITY_INTERACTIVE = 0  # Academic chat and paper Q&A
+PRIORITY_STANDARD = 1     # Paper summaries
+PRIORITY_BATCH = 2        # Paper comparisons
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_STANDARD: "standard",
+    PRIORITY_BATCH: "batch"
+}
+
+BUSY_MESSAGE = (
+    "🚦 PaperPilot is handling a lot of requests right now! "
+    "Please try again in a minute."
+)
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the LLM queue is too deep to accept another request."""
+
+
+class _Ticket:
+    """A queued LLM request waiting for a concurrency slot."""
+
+    __slots__ = ("user_id", "priority", "enqueued_at", "granted", "cancelled")
+
+    def __init__(self, user_id: Optional[int], priority: int):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = threading.Event()
+        self.cancelled = False
+
+
+class LLMScheduler:
+    """Admission control for Gemini calls.
+
+    Requests are ordered by priority class and, within a class, by weighted
+    fair queuing: each user gets a virtual finish time so a user with many
+    queued requests cannot starve users with a single one. Callers block in
+    their own dispatcher thread until a slot is free, then run the call.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue_depth: int = 32,
+                 max_wait_seconds: float = 120.0, metrics_window: int = 500):
+        self.max_concurrent = max_concurrent
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+
+        self._lock = threading.Lock()
+        self._queue = []  # heap of (priority, virtual_finish, seq, ticket)
+        self._waiting = 0  # tickets in the heap that have not timed out
+        self._seq = itertools.count()
+        self._active = 0
+        self._virtual_time = 0.0
+        self._user_finish: Dict[Any, float] = {}
+
+        # Metrics
+        self._wait_times = deque(maxlen=metrics_window)
+        self._run_times = deque(maxlen=metrics_window)
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._max_depth_seen = 0
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the head of the queue. Caller must hold the lock."""
+        while self._active < self.max_concurrent and self._queue:
+            _, finish, _, ticket = heapq.heappop(self._queue)
+            if ticket.cancelled:
+                continue
+            self._waiting -= 1
+            self._virtual_time = max(self._virtual_time, finish)
+            self._active += 1
+            ticket.granted.set()
+
+    def _enqueue(self, user_id: Optional[int], priority: int, weight: float, cost: float) -> _Ticket:
+        with self._lock:
+            if self._waiting >= self.max_queue_depth:
+                self._rejected += 1
+                timeseries.record("llm_rejected")
+                logger.warning(f"LLM queue full ({self._waiting} waiting), rejecting request from {user_id}")
+                raise SchedulerBusyError("LLM queue is full")
+
+            ticket = _Ticket(user_id, priority)
+            start = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+            finish = start + cost / max(weight, 1e-6)
+            self._user_finish[user_id] = finish
+            heapq.heappush(self._queue, (priority, finish, next(self._seq), ticket))
+            self._waiting += 1
+            self._max_depth_seen = max(self._max_depth_seen, self._waiting)
+            self._dispatch()
+            return ticket
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        """Withdraw a ticket that timed out. Caller must hold the lock."""
+        ticket.cancelled = True
+        self._waiting -= 1
+        self._timed_out += 1
+        # Cancelled tickets are skipped when popped; rebuild once they are most of the heap
+        if len(self._queue) > 2 * self._waiting + self.max_concurrent:
+            self._queue = [entry for entry in self._queue if not entry[3].cancelled]
+            heapq.heapify(self._queue)
+
+    def _release(self, wait_time: float, run_time: float, failed: bool) -> None:
+        with self._lock:
+            self._active -= 1
+            self._wait_times.append(wait_time)
+            self._run_times.append(run_time)
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            # Forget users that have nothing left queued to keep the map bounded
+            if not self._waiting and not self._active:
+                self._user_finish.clear()
+            elif len(self._user_finish) > 10000:
+                self._user_finish = {
+                    user: finish for user, finish in self._user_finish.items()
+                    if finish > self._virtual_time
+                }
+            self._dispatch()
+
+    def submit(self, func: Callable, *args, user_id: Optional[int] = None,
+               priority: int = PRIORITY_STANDARD, weight: float = 1.0,
+               cost: float = 1.0, **kwargs) -> Any:
+        """Run func(*args, **kwargs) once the scheduler admits the request.
+
+        Raises SchedulerBusyError if the queue is full or the request waited
+        longer than max_wait_seconds for a slot.
+        """
+        ticket = self._enqueue(user_id, priority, weight, cost)
+
+        if not ticket.granted.wait(self.max_wait_seconds):
+            with self._lock:
+                if not ticket.granted.is_set():
+                    self._cancel(ticket)
+                    timeseries.record("llm_rejected")
+                    raise SchedulerBusyError("Timed out waiting for an LLM slot")
+            # Granted just as we timed out, fall through and use the slot
+
+        started = time.monotonic()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        except Exception:
+            timeseries.record("llm_errors")
+            raise
+        finally:
+            run_time = time.monotonic() - started
+            timeseries.record("llm_latency", run_time)
+            self._release(started - ticket.enqueued_at, run_time, failed)
+
+    def generate(self, model, prompt: str, user_id: Optional[int] = None,
+                 priority: int = PRIORITY_STANDARD, **kwargs) -> Any:
+        """Schedule model.generate_content(prompt) and return the response."""
+        return self.submit(model.generate_content, prompt, user_id=user_id,
+                           priority=priority, **kwargs)
+
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        with self._lock:
+            return self._waiting
+
+    def is_busy(self) -> bool:
+        """True if a new request would be rejected."""
+        return self.queue_depth() >= self.max_queue_depth
+
+    @staticmethod
+    def _percentile(values, pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+        return ordered[index]
+
+    def get_stats(self) -> Dict:
+        """Return queue and latency metrics for the admin panel."""
+        with self._lock:
+            counts = {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "queue_depth": self._waiting,
+                "max_queue_depth": self.max_queue_depth,
+                "max_depth_seen": self._max_depth_seen,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out
+            }
+            waits = list(self._wait_times)
+            runs = list(self._run_times)
+        return {
+            **counts,
+            "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait": self._percentile(waits, 0.95),
+            "avg_run": sum(runs) / len(runs) if runs else 0.0,
+            "p95_run": self._percentile(runs, 0.95)
+        }
+
+
+# Global scheduler instance shared by all LLM call sites
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,117 @@
+"""One-time migration of the bot's JSON state files into the SQLite store.
+
+Run from the bot's working directory before starting the new version:
+
+    python migrate_json_to_sqlite.py [--db bot_data/bot.db]
+
+The migration is idempotent: records are upserted, so running it again
+after a partial run is safe. The JSON files are left in place and can be
+archived once the bot is running on the database.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from notifications import next_due_time
+from storage import DEFAULT_DB_PATH, Storage
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _load_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Skipping unreadable {path}: {str(e)}")
+        return None
+
+
+def _user_id_from_filename(path: str, prefix: str) -> Optional[int]:
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return int(name[len(prefix):])
+    except ValueError:
+        logger.error(f"Skipping {path}: no user id in file name")
+        return None
+
+
+def migrate_user_preferences(storage: Storage, root: str) -> int:
+    items = []
+    for path in glob.glob(os.path.join(root, "user_preferences", "user_*.json")):
+        user_id = _user_id_from_filename(path, "user_")
+        prefs = _load_json(path)
+        if user_id is not None and prefs is not None:
+            items.append((user_id, prefs))
+    storage.save_user_preferences(items)
+    return len(items)
+
+
+def migrate_notification_preferences(storage: Storage, root: str) -> int:
+    count = 0
+    for path in glob.glob(os.path.join(root, "user_notifications", "notifications_*.json")):
+        user_id = _user_id_from_filename(path, "notifications_")
+        prefs = _load_json(path)
+        if user_id is not None and prefs is not None:
+            storage.save_notification_preferences(user_id, prefs, next_due_time(prefs))
+            count += 1
+    return count
+
+
+def migrate_admin_data(storage: Storage, root: str) -> Dict[str, int]:
+    data_dir = os.path.join(root, "bot_data")
+    counts = {"admins": 0, "statistics": 0, "users": 0, "restrictions": 0}
+
+    admins = _load_json(os.path.join(data_dir, "admins.json")) or {}
+    owner = admins.get("owner")
+    for admin_id in admins.get("admins", []):
+        storage.add_admin(int(admin_id), is_owner=admin_id == owner)
+        counts["admins"] += 1
+
+    stats = _load_json(os.path.join(data_dir, "statistics.json")) or {}
+    for name, value in stats.items():
+        storage.set_statistic(name, value)
+        counts["statistics"] += 1
+
+    users = _load_json(os.path.join(data_dir, "users.json")) or {}
+    for user_id, user_data in users.items():
+        storage.import_user(int(user_id), user_data)
+        counts["users"] += 1
+
+    restrictions = _load_json(os.path.join(data_dir, "restrictions.json")) or {}
+    for user_id, data in restrictions.get("restricted", {}).items():
+        storage.restrict_user(int(user_id), data["end_time"], data.get("restricted_by"),
+                              data.get("reason", "No reason provided"))
+        counts["restrictions"] += 1
+    for user_id in restrictions.get("blocked", []):
+        storage.block_user(int(user_id))
+        counts["restrictions"] += 1
+
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate JSON state files into the SQLite store.")
+    parser.add_argument("--db", default=os.getenv("BOT_DB_PATH", DEFAULT_DB_PATH), help="database file")
+    parser.add_argument("--root", default=".", help="directory containing the JSON state folders")
+    args = parser.parse_args()
+
+    storage = Storage(args.db)
+    logger.info(f"Migrating JSON state from {os.path.abspath(args.root)} into {args.db}")
+
+    logger.info(f"User preferences: {migrate_user_preferences(storage, args.root)}")
+    logger.info(f"Notification preferences: {migrate_notification_preferences(storage, args.root)}")
+    for name, count in migrate_admin_data(storage, args.root).items():
+        logger.info(f"{name.capitalize()}: {count}")
+
+    logger.info("Migration complete. The JSON files were left in place.")
+
+
+if __name__ == "__main__":
+    main()
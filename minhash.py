@@ -0,0 +1,107 @@
+import random
+import zlib
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def char_shingles(text: str, k: int = 3) -> List[str]:
+    """Overlapping k-character shingles of text."""
+    text = str(text)
+    if len(text) <= k:
+        return [text] if text else []
+    return [text[i:i + k] for i in range(len(text) - k + 1)]
+
+
+def word_shingles(tokens: Sequence[str], k: int = 2) -> List[str]:
+    """Overlapping k-word shingles of a token sequence."""
+    if len(tokens) <= k:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+
+
+class MinHasher:
+    """MinHash signatures using universal hashing (a*x + b) mod p."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self._params = [
+            (rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: Iterable[str]) -> Tuple[int, ...]:
+        """Compute the MinHash signature of a set of shingles."""
+        hashes = {zlib.crc32(s.encode()) for s in shingles}
+        if not hashes:
+            return tuple([MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(sig1: Sequence[int], sig2: Sequence[int]) -> float:
+        """Estimate Jaccard similarity from two signatures."""
+        if not sig1 or len(sig1) != len(sig2):
+            return 0.0
+        return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+
+class MinHashLSH:
+    """Banded locality-sensitive hashing index over MinHash signatures.
+
+    A signature is split into `bands` bands of equal width; two items become
+    candidates when any band matches exactly. With 8 bands of 8 rows, pairs
+    above roughly 0.77 Jaccard similarity are found with high probability.
+    Inserting and removing an item touches one bucket per band.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def _band_keys(self, signature: Sequence[int]) -> List[Tuple[int, ...]]:
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def insert(self, key: Hashable, signature: Sequence[int]) -> None:
+        """Add an item, replacing any previous signature for the key."""
+        if key in self._signatures:
+            self.remove(key)
+        signature = tuple(signature)
+        self._signatures[key] = signature
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Drop an item from the index."""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = band.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del band[band_key]
+
+    def query(self, signature: Sequence[int], threshold: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """Candidates sharing a band with signature, best estimated similarity first."""
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(band_key, ()))
+        scored = [(key, MinHasher.similarity(signature, self._signatures[key])) for key in candidates]
+        return sorted([item for item in scored if item[1] >= threshold], key=lambda item: -item[1])
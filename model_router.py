@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Request classes routed independently
+REQUEST_SUMMARY = "summary"
+REQUEST_QA = "qa"
+REQUEST_COMPARISON = "comparison"
+REQUEST_CHAT = "chat"
+
+
+class ProviderResponse:
+    """Minimal response object exposing .text like Gemini responses."""
+
+    def __init__(self, text: str, stub: bool = False):
+        self.text = text
+        self.stub = stub
+
+
+def is_stub_response(response) -> bool:
+    """True for placeholder text from the offline stub, which must not be cached or learned from."""
+    return getattr(response, "stub", False) is True
+
+
+class LLMProvider(ABC):
+    """Base class for text generation backends."""
+
+    def __init__(self, name: str, display_name: str):
+        self.name = name
+        self.display_name = display_name
+
+    @abstractmethod
+    def generate_content(self, prompt: str):
+        """Return a response object with a .text attribute."""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend."""
+
+    def __init__(self, name: str = "gemini", display_name: str = "Gemini 1.5 Pro",
+                 model=None, model_name: str = "gemini-1.5-pro"):
+        super().__init__(name, display_name)
+        if model is None:
+            import google.generativeai as genai
+            model = genai.GenerativeModel(model_name)
+        self.model = model
+
+    def generate_content(self, prompt: str):
+        return self.model.generate_content(prompt)
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline backend for exercising routing and failover."""
+
+    def __init__(self, name: str = "stub", display_name: str = "Offline Stub",
+                 latency_seconds: float = 0.0, failing: bool = False):
+        super().__init__(name, display_name)
+        self.latency_seconds = latency_seconds
+        self.failing = failing
+        self.calls = 0
+
+    def generate_content(self, prompt: str):
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self.failing:
+            raise RuntimeError(f"{self.name} provider is unavailable")
+        digest = hashlib.sha256(str(prompt).encode()).hexdigest()[:12]
+        return ProviderResponse(f"[{self.name}:{digest}] Stub response for a {len(str(prompt))}-character prompt.",
+                                stub=True)
+
+
+class _ProviderStats:
+    """Rolling latency and error window for one provider and request class.
+
+    Request threads append to the windows, so every method must be called
+    with the router lock held.
+    """
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+
+    def p95(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class RoutedModel:
+    """Drop-in model object that routes generate_content through the router."""
+
+    def __init__(self, router: "ModelRouter", request_class: str, preferred: Optional[str]):
+        self.router = router
+        self.request_class = request_class
+        self.preferred = preferred
+
+    def generate_content(self, prompt: str):
+        return self.router.generate_content(prompt, self.request_class, self.preferred)
+
+
+class ModelRouter:
+    """Choose a provider per request class with latency-aware failover.
+
+    The user's preferred provider is tried first while it is healthy; other
+    providers are ordered by p95 latency penalised by error rate. A provider
+    that fails repeatedly is put on a cooldown and only tried as a last resort.
+    """
+
+    def __init__(self, default_provider: str, window: int = 100,
+                 max_consecutive_failures: int = 3, cooldown_seconds: float = 60.0,
+                 error_penalty: float = 4.0):
+        self.default_provider = default_provider
+        self.window = window
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown_seconds = cooldown_seconds
+        self.error_penalty = error_penalty
+
+        self.providers: Dict[str, LLMProvider] = {}
+        self._stats: Dict[tuple, _ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: LLMProvider) -> None:
+        """Add a provider to the routing pool."""
+        self.providers[provider.name] = provider
+
+    def has_provider(self, name: str) -> bool:
+        return name in self.providers
+
+    def _get_stats(self, name: str, request_class: str) -> _ProviderStats:
+        key = (name, request_class)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, _ProviderStats(self.window))
+        return stats
+
+    def _is_healthy(self, name: str, request_class: str, now: float) -> bool:
+        return self._get_stats(name, request_class).cooldown_until <= now
+
+    def _score(self, name: str, request_class: str) -> float:
+        stats = self._get_stats(name, request_class)
+        with self._lock:
+            return stats.p95() * (1.0 + self.error_penalty * stats.error_rate())
+
+    def candidates(self, request_class: str, preferred: Optional[str] = None) -> List[LLMProvider]:
+        """Providers in the order they should be tried for this request."""
+        now = time.monotonic()
+        preferred = preferred if preferred in self.providers else self.default_provider
+
+        healthy, cooling = [], []
+        for name in self.providers:
+            (healthy if self._is_healthy(name, request_class, now) else cooling).append(name)
+
+        healthy.sort(key=lambda n: (n != preferred, self._score(n, request_class)))
+        cooling.sort(key=lambda n: self._get_stats(n, request_class).cooldown_until)
+        return [self.providers[n] for n in healthy + cooling]
+
+    def record(self, name: str, request_class: str, latency: float, ok: bool) -> None:
+        """Record the outcome of a call for routing decisions."""
+        stats = self._get_stats(name, request_class)
+        with self._lock:
+            stats.record(latency, ok)
+            if not ok and stats.consecutive_failures >= self.max_consecutive_failures:
+                stats.cooldown_until = time.monotonic() + self.cooldown_seconds
+                logger.warning(f"Provider {name} cooling down for {request_class} requests")
+
+    def generate_content(self, prompt: str, request_class: str, preferred: Optional[str] = None):
+        """Generate with the best provider, failing over to the next on error."""
+        last_error = None
+        for provider in self.candidates(request_class, preferred):
+            started = time.monotonic()
+            try:
+                response = provider.generate_content(prompt)
+            except Exception as e:
+                self.record(provider.name, request_class, time.monotonic() - started, False)
+                logger.error(f"Provider {provider.name} failed for {request_class}: {str(e)}")
+                last_error = e
+                continue
+            self.record(provider.name, request_class, time.monotonic() - started, True)
+            return response
+
+        if last_error is None:
+            raise RuntimeError("No LLM providers registered")
+        raise last_error
+
+    def for_request(self, request_class: str, preferred: Optional[str] = None) -> RoutedModel:
+        """Return a model-like object bound to a request class and preference."""
+        return RoutedModel(self, request_class, preferred)
+
+    def get_stats(self) -> Dict:
+        """Per-provider, per-class latency and error metrics."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{name}/{request_class}": {
+                    "p95": stats.p95(),
+                    "error_rate": stats.error_rate(),
+                    "calls": len(stats.outcomes),
+                    "cooling_down": stats.cooldown_until > now
+                }
+                for (name, request_class), stats in self._stats.items()
+            }
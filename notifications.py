@@ -1,26 +1,92 @@
 from datetime import datetime, timedelta
-import json
-import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
+import threading
+
+from keyword_automaton import KeywordAutomaton, normalize_phrase
+from storage import get_storage, TIMESTAMP_FORMAT
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATION_PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(days=7)
+}
+
+
+def next_due_time(prefs: Dict) -> Optional[str]:
+    """When the user should next be checked for new papers, or None if never."""
+    if not prefs.get('enabled'):
+        return None
+    last_notification = prefs.get('last_notification')
+    if not last_notification:
+        return datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    period = NOTIFICATION_PERIODS.get(prefs.get('frequency'))
+    if period is None:
+        return None
+    return (datetime.strptime(last_notification, TIMESTAMP_FORMAT) + period).strftime(TIMESTAMP_FORMAT)
+
+
+SubscriptionKey = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def subscription_key(prefs: Dict) -> SubscriptionKey:
+    """Canonical (keywords, categories) of a subscription.
+
+    Keywords are normalised as the keyword automaton sees them and both
+    lists are deduped and sorted, so users who subscribe to the same thing
+    share one entry.
+    """
+    keywords = {normalize_phrase(keyword) for keyword in prefs.get('keywords', [])}
+    categories = {category.strip() for category in prefs.get('categories', [])}
+    keywords.discard('')
+    categories.discard('')
+    return tuple(sorted(keywords)), tuple(sorted(categories))
+
+
+def subscription_query(key: SubscriptionKey) -> str:
+    """arXiv query for a subscription: every keyword, and any of the categories."""
+    keywords, categories = key
+    parts = list(keywords)
+    if categories:
+        parts.append(' OR '.join(f'cat:{category}' for category in categories))
+    return ' AND '.join(f"({part})" for part in parts)
+
+
+def _subscribed_keywords(prefs: Optional[Dict]) -> List[str]:
+    return prefs.get('keywords', []) if prefs and prefs.get('enabled') else []
+
+
+_keyword_automaton: Optional[KeywordAutomaton] = None
+_keyword_automaton_lock = threading.Lock()
+
+
+def get_keyword_automaton() -> KeywordAutomaton:
+    """Shared automaton of every enabled user's keywords, owned by user id.
+
+    Loaded from storage on first use and kept current by save_preferences.
+    """
+    global _keyword_automaton
+    with _keyword_automaton_lock:
+        if _keyword_automaton is None:
+            automaton = KeywordAutomaton()
+            for user_id, prefs in get_storage().enabled_notification_preferences():
+                for keyword in _subscribed_keywords(prefs):
+                    automaton.add(keyword, user_id)
+            _keyword_automaton = automaton
+            logger.info(f"Loaded {len(automaton)} notification keywords")
+    return _keyword_automaton
+
+
 class NotificationPreferences:
     def __init__(self):
-        self.notifications_dir = "user_notifications"
-        os.makedirs(self.notifications_dir, exist_ok=True)
-
-    def _get_user_file_path(self, user_id: int) -> str:
-        return os.path.join(self.notifications_dir, f"notifications_{user_id}.json")
+        self.storage = get_storage()
 
     def get_preferences(self, user_id: int) -> Dict:
         """Get user notification preferences."""
-        try:
-            with open(self._get_user_file_path(user_id), 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            default_prefs = {
+        prefs = self.storage.get_notification_preferences(user_id)
+        if prefs is None:
+            prefs = {
                 'enabled': False,
                 'frequency': 'daily',  # or 'weekly'
                 'keywords': [],
@@ -29,13 +95,24 @@ class NotificationPreferences:
                 'notification_time': "09:00",  # Default to 9 AM UTC
                 'last_checked': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             }
-            self.save_preferences(user_id, default_prefs)
-            return default_prefs
+            self.save_preferences(user_id, prefs)
+        return prefs
 
     def save_preferences(self, user_id: int, preferences: Dict) -> None:
-        """Save user notification preferences."""
-        with open(self._get_user_file_path(user_id), 'w') as f:
-            json.dump(preferences, f, indent=2)
+        """Save user notification preferences and schedule the next check."""
+        previous = self.storage.get_notification_preferences(user_id) if _keyword_automaton is not None else None
+        self.storage.save_notification_preferences(user_id, preferences, next_due_time(preferences))
+        with _keyword_automaton_lock:
+            if _keyword_automaton is not None:
+                _keyword_automaton.update(user_id, _subscribed_keywords(previous), _subscribed_keywords(preferences))
+
+    def get_due_user_ids(self, limit: int = 100) -> List[int]:
+        """Users due a notification check now, from the schedule index."""
+        return self.storage.due_notification_user_ids(datetime.utcnow().strftime(TIMESTAMP_FORMAT), limit)
+
+    def postpone(self, user_id: int, delay: timedelta) -> None:
+        """Push a user's next check back, e.g. after a failed attempt."""
+        self.storage.reschedule_notification(user_id, (datetime.utcnow() + delay).strftime(TIMESTAMP_FORMAT))
 
     def add_keyword(self, user_id: int, keyword: str) -> None:
         """Add a keyword to user's notification preferences."""
@@ -51,23 +128,13 @@ class NotificationPreferences:
             prefs['keywords'].remove(keyword)
             self.save_preferences(user_id, prefs)
 
-    def should_notify(self, user_id: int) -> bool:
+    def should_notify(self, user_id: int, prefs: Optional[Dict] = None) -> bool:
         """Check if it's time to send notifications to the user."""
-        prefs = self.get_preferences(user_id)
+        if prefs is None:
+            prefs = self.get_preferences(user_id)
 
         if not prefs['enabled']:
             return False
 
-        last_notification = prefs.get('last_notification')
-        if not last_notification:
-            return True
-
-        last_notification = datetime.strptime(last_notification, '%Y-%m-%d %H:%M:%S')
-        now = datetime.utcnow()
-
-        if prefs['frequency'] == 'daily':
-            return (now - last_notification) >= timedelta(days=1)
-        elif prefs['frequency'] == 'weekly':
-            return (now - last_notification) >= timedelta(days=7)
-
-        return False
\ No newline at end of file
+        next_due = next_due_time(prefs)
+        return next_due is not None and next_due <= datetime.utcnow().strftime(TIMESTAMP_FORMAT)
\ No newline at end of file
@@ -1,12 +1,28 @@
-from dataclasses import dataclass
-from typing import List, Dict
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional
 import arxiv
-from difflib import SequenceMatcher
+import numpy as np
 from datetime import datetime, timedelta
+import json
 import logging
+import os
+import threading
+from text_similarity import similarity_engine
+from paper_dedup import paper_dedup
+from periodic_flusher import PeriodicFlusher
 
 logger = logging.getLogger(__name__)
 
+# Bump when generate_comparison_prompt changes so stale analyses are not reused
+COMPARISON_PROMPT_VERSION = 2
+
+
+def order_papers(papers: List[arxiv.Result]) -> List[arxiv.Result]:
+    """Papers sorted by canonical id, the order cached comparisons are labelled in."""
+    return sorted(papers, key=lambda p: paper_dedup.lookup(p.entry_id))
+
+
 @dataclass
 class ComparisonResult:
     similarity_score: float
@@ -15,95 +31,260 @@ class ComparisonResult:
     methodology_comparison: str
     findings_comparison: str
     impact_comparison: str
-    timestamp: datetime = datetime.utcnow()
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self) -> Dict:
+        """Serialize for the persistent cache."""
+        data = asdict(self)
+        data['timestamp'] = self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ComparisonResult':
+        """Rebuild a result stored by to_dict."""
+        data = dict(data)
+        data['timestamp'] = datetime.strptime(data['timestamp'], '%Y-%m-%d %H:%M:%S')
+        return cls(**data)
 
 class PaperComparisonCache:
-    def __init__(self, max_cache_age_hours: int = 24):
-        self.cache: Dict[str, ComparisonResult] = {}
+    """Size-bounded LRU of comparison results with time-based expiry.
+
+    Recency is tracked by `cache` (an OrderedDict moved-to-end on every hit)
+    and expiry by `inserted_at`, kept in insertion order. Every entry has the
+    same lifetime, so expired entries are always at the front of
+    `inserted_at` and are popped in amortized O(1) per insert. Changes are
+    written to cache_file by a background flusher every flush_interval
+    seconds and on close, from a snapshot taken under the lock.
+    """
+
+    def __init__(self, max_cache_age_hours: int = 24, max_entries: int = 500,
+                 cache_file: Optional[str] = os.path.join("bot_data", "comparison_cache.json"),
+                 flush_interval_seconds: float = 30.0):
+        self.cache: "OrderedDict[str, ComparisonResult]" = OrderedDict()
+        self.inserted_at: "OrderedDict[str, datetime]" = OrderedDict()
         self.max_cache_age = timedelta(hours=max_cache_age_hours)
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.flush_interval = flush_interval_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._load()
+        self._flusher = PeriodicFlusher(self.flush, flush_interval_seconds, "comparison-cache") if cache_file else None
 
     def get_cache_key(self, papers: List[arxiv.Result]) -> str:
-        """Generate a cache key from paper IDs."""
-        paper_ids = sorted([str(p.entry_id) for p in papers])  # Convert to str
-        return "_".join(paper_ids)
+        """Generate an order-independent cache key from canonical paper IDs and the prompt version."""
+        # Canonical ids let versions and reposts of a paper share entries;
+        # callers pass papers through order_papers so "Paper N" labels agree
+        paper_ids = [paper_dedup.lookup(p.entry_id) for p in order_papers(papers)]
+        return f"v{COMPARISON_PROMPT_VERSION}_" + "_".join(paper_ids)
 
-    def get(self, papers: List[arxiv.Result]) -> ComparisonResult:
+    def get(self, papers: List[arxiv.Result]) -> Optional[ComparisonResult]:
         """Get cached comparison result if available and not expired."""
         key = self.get_cache_key(papers)
-        if key in self.cache:
-            result = self.cache[key]
-            if datetime.utcnow() - result.timestamp < self.max_cache_age:
-                return result
-            else:
-                del self.cache[key]
+        with self._lock:
+            result = self.cache.get(key)
+            if result is not None:
+                if datetime.utcnow() - self.inserted_at[key] < self.max_cache_age:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self._remove(key)
+                self.expirations += 1
+                self._dirty = True
+            self.misses += 1
         return None
 
     def set(self, papers: List[arxiv.Result], result: ComparisonResult) -> None:
-        """Cache comparison result."""
+        """Cache comparison result; the file is rewritten by the next flush."""
         key = self.get_cache_key(papers)
-        self.cache[key] = result
+        now = datetime.utcnow()
+        with self._lock:
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+            self.inserted_at[key] = now
+            self.inserted_at.move_to_end(key)
+            self._cleanup(now)
+            # Least recently used entries sit at the front of the cache
+            while len(self.cache) > self.max_entries:
+                oldest, _ = self.cache.popitem(last=False)
+                del self.inserted_at[oldest]
+                self.evictions += 1
+            self._dirty = True
+
+    def _remove(self, key: str) -> None:
+        del self.cache[key]
+        del self.inserted_at[key]
+
+    def _cleanup(self, current_time: Optional[datetime] = None) -> None:
+        """Pop expired entries from the front of the insertion-ordered index."""
+        current_time = current_time or datetime.utcnow()
+        while self.inserted_at:
+            key, inserted = next(iter(self.inserted_at.items()))
+            if current_time - inserted < self.max_cache_age:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def flush(self) -> None:
+        """Write pending changes to disk."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = [(key, self.inserted_at[key], result) for key, result in self.cache.items()]
+                self._dirty = False
+            if not self._save(entries):
+                with self._lock:
+                    self._dirty = True
+
+    def close(self) -> None:
+        """Stop the background flusher and write pending changes."""
+        if self._flusher is not None:
+            self._flusher.close()
+
+    def get_stats(self) -> Dict:
+        """Return size and hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def _load(self) -> None:
+        """Load persisted comparisons, skipping expired or outdated entries."""
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Error loading comparison cache: {str(e)}")
+            return
+
+        prefix = f"v{COMPARISON_PROMPT_VERSION}_"
+        entries = sorted(data.items(), key=lambda item: item[1].get('inserted_at', ''))
+        for key, entry in entries:
+            if not key.startswith(prefix):
+                continue
+            try:
+                self.cache[key] = ComparisonResult.from_dict(entry['result'])
+                self.inserted_at[key] = datetime.strptime(entry['inserted_at'], '%Y-%m-%d %H:%M:%S')
+            except Exception as e:
+                logger.error(f"Skipping bad comparison cache entry: {str(e)}")
         self._cleanup()
+        while len(self.cache) > self.max_entries:
+            oldest, _ = self.cache.popitem(last=False)
+            del self.inserted_at[oldest]
 
-    def _cleanup(self) -> None:
-        """Remove expired entries from cache."""
-        current_time = datetime.utcnow()
-        expired_keys = [
-            key for key, result in self.cache.items()
-            if current_time - result.timestamp > self.max_cache_age
-        ]
-        for key in expired_keys:
-            del self.cache[key]
+    def _save(self, entries: List) -> bool:
+        """Write (key, inserted_at, result) entries to disk atomically; return whether it worked."""
+        if not self.cache_file:
+            return True
+        data = {
+            key: {
+                'inserted_at': inserted_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'result': result.to_dict()
+            }
+            for key, inserted_at, result in entries
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+            tmp_path = f"{self.cache_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving comparison cache: {str(e)}")
+            return False
 
 # Global cache instance
 comparison_cache = PaperComparisonCache()
 
 def calculate_text_similarity(text1: str, text2: str) -> float:
-    """Calculate similarity between two texts using SequenceMatcher."""
-    return SequenceMatcher(None, str(text1).lower(), str(text2).lower()).ratio()
+    """Calculate TF-IDF cosine similarity between two texts."""
+    return similarity_engine.similarity(str(text1), str(text2))
+
+def calculate_similarity_matrix(papers: List[arxiv.Result]) -> np.ndarray:
+    """Pairwise TF-IDF cosine similarity of paper abstracts, reusing cached vectors."""
+    return similarity_engine.similarity_matrix(
+        [str(p.summary) for p in papers],
+        keys=[str(p.entry_id) for p in papers]
+    )
+
+COMMON_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'}
+TOPIC_STRIP_CHARS = '.,;:!?()[]{}"\''
+
+# Topic profiles memoized by paper entry_id
+MAX_CACHED_PROFILES = 4096
+_topic_profiles: "OrderedDict[str, List[str]]" = OrderedDict()
+_topic_profiles_lock = threading.Lock()
 
 def extract_key_topics(text: str, max_topics: int = 5) -> List[str]:
-    """Extract key topics from text using simple keyword extraction."""
+    """Extract the most frequent keywords from text in a single pass."""
     try:
-        common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'}
-        words = str(text).lower().split()
-        topics = list(set([w for w in words if len(w) > 4 and w not in common_words]))
-        return sorted(topics, key=lambda x: str(text).lower().count(x), reverse=True)[:max_topics]
+        counts = Counter()
+        for word in str(text).lower().split():
+            word = word.strip(TOPIC_STRIP_CHARS)
+            if len(word) > 4 and word not in COMMON_WORDS:
+                counts[word] += 1
+        # most_common breaks ties by first occurrence, keeping results stable
+        return [word for word, _ in counts.most_common(max_topics)]
     except Exception as e:
         logger.error(f"Error extracting topics: {str(e)}")
         return []
 
+def get_topic_profile(paper: arxiv.Result, max_topics: int = 5) -> List[str]:
+    """Return a paper's key topics, computing them once per paper."""
+    key = f"{paper.entry_id}:{max_topics}"
+    with _topic_profiles_lock:
+        profile = _topic_profiles.get(key)
+        if profile is not None:
+            _topic_profiles.move_to_end(key)
+            return profile
+
+    profile = extract_key_topics(str(paper.summary), max_topics)
+    with _topic_profiles_lock:
+        _topic_profiles[key] = profile
+        while len(_topic_profiles) > MAX_CACHED_PROFILES:
+            _topic_profiles.popitem(last=False)
+    return profile
+
 def compare_papers(papers: List[arxiv.Result]) -> ComparisonResult:
     """Compare multiple papers and generate a structured comparison."""
     if len(papers) < 2:
         raise ValueError("Need at least 2 papers to compare")
 
     try:
-        # Calculate similarity scores between papers
-        similarity_scores = []
-        for i in range(len(papers)):
-            for j in range(i + 1, len(papers)):
-                similarity_scores.append(
-                    calculate_text_similarity(str(papers[i].summary), str(papers[j].summary))
-                )
-        avg_similarity = sum(similarity_scores) / len(similarity_scores) if similarity_scores else 0
-
-        # Extract common topics
-        all_topics = []
-        for paper in papers:
-            all_topics.extend(extract_key_topics(str(paper.summary)))
-        common_topics = list(set([topic for topic in all_topics
-                                if all(topic in extract_key_topics(str(p.summary)) for p in papers)]))
-
-        # Analyze unique aspects
+        # Average pairwise similarity from one similarity matrix
+        similarity_matrix = calculate_similarity_matrix(papers)
+        upper = similarity_matrix[np.triu_indices(len(papers), k=1)]
+        avg_similarity = float(upper.mean()) if upper.size else 0.0
+
+        # Build each topic profile once, then count how many papers share each topic
+        profiles = [get_topic_profile(paper) for paper in papers]
+        papers_per_topic = Counter(topic for profile in profiles for topic in set(profile))
+
+        # Common topics appear in every paper
+        common_topics = [topic for topic, count in papers_per_topic.items() if count == len(papers)]
+
+        # Unique aspects appear in exactly one paper
         unique_aspects = {}
-        for i, paper in enumerate(papers):
-            topics = extract_key_topics(str(paper.summary))
-            other_topics = []
-            for other_paper in papers:
-                if other_paper != paper:
-                    other_topics.extend(extract_key_topics(str(other_paper.summary)))
-            unique = list(set(topics) - set(other_topics))
-            unique_aspects[f"Paper {i+1}"] = unique
+        for i, profile in enumerate(profiles):
+            unique_aspects[f"Paper {i+1}"] = [topic for topic in profile if papers_per_topic[topic] == 1]
 
         result = ComparisonResult(
             similarity_score=float(avg_similarity),
@@ -167,4 +348,152 @@ def generate_comparison_prompt(papers: List[arxiv.Result]) -> str:
 
     except Exception as e:
         logger.error(f"Error generating prompt: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+# Survey mode: compare large result sets by clustering them into themes
+MAX_PAPERS_TO_SURVEY = 100
+MAX_SURVEY_THEMES = 6
+
+@dataclass
+class PaperCluster:
+    paper_indices: List[int]
+    representative: int
+    topics: List[str]
+
+def cluster_papers(vectors: np.ndarray, max_clusters: int = MAX_SURVEY_THEMES,
+                   max_iterations: int = 20) -> List[PaperCluster]:
+    """Group L2-normalized paper vectors into themes with spherical k-means.
+
+    Centroids are seeded deterministically by farthest-point selection, so the
+    same papers always produce the same themes. Topics are filled in by the caller.
+    """
+    n_papers = vectors.shape[0]
+    if n_papers == 0:
+        return []
+    k = max(1, min(max_clusters, n_papers, int(round(np.sqrt(n_papers / 2)))))
+
+    similarity = vectors @ vectors.T
+    # Start from the most central paper, then repeatedly add the least covered one
+    seeds = [int(np.argmax(similarity.mean(axis=1)))]
+    closest = similarity[seeds[0]].copy()
+    while len(seeds) < k:
+        candidate = int(np.argmin(closest))
+        if candidate in seeds:
+            break
+        seeds.append(candidate)
+        closest = np.maximum(closest, similarity[candidate])
+
+    centroids = vectors[seeds].copy()
+    labels = np.full(n_papers, -1)
+    for _ in range(max_iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centroids)):
+            members = vectors[labels == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[c] = centroid / norm if norm else centroid
+
+    clusters = []
+    for c in range(len(centroids)):
+        members = np.flatnonzero(labels == c)
+        if not len(members):
+            continue
+        representative = int(members[np.argmax(vectors[members] @ centroids[c])])
+        clusters.append(PaperCluster(paper_indices=members.tolist(), representative=representative, topics=[]))
+
+    clusters.sort(key=lambda cluster: len(cluster.paper_indices), reverse=True)
+    return clusters
+
+def survey_papers(papers: List[arxiv.Result], max_clusters: int = MAX_SURVEY_THEMES):
+    """Compare up to MAX_PAPERS_TO_SURVEY papers by theme.
+
+    Returns a ComparisonResult whose unique_aspects are keyed by theme, and the
+    clusters used to build the survey prompt.
+    """
+    if len(papers) < 2:
+        raise ValueError("Need at least 2 papers to survey")
+    papers = papers[:MAX_PAPERS_TO_SURVEY]
+
+    try:
+        vectors = similarity_engine.tfidf_matrix(
+            [str(p.summary) for p in papers],
+            keys=[str(p.entry_id) for p in papers]
+        )
+        similarity_matrix = np.clip(vectors @ vectors.T, 0.0, 1.0)
+        upper = similarity_matrix[np.triu_indices(len(papers), k=1)]
+
+        profiles = [get_topic_profile(paper) for paper in papers]
+        papers_per_topic = Counter(topic for profile in profiles for topic in set(profile))
+        # With many papers "shared by all" is almost always empty, so use a majority
+        common_topics = [topic for topic, count in papers_per_topic.most_common(10)
+                         if count * 2 >= len(papers)]
+
+        clusters = cluster_papers(vectors, max_clusters)
+        unique_aspects = {}
+        for i, cluster in enumerate(clusters, 1):
+            cluster_topics = Counter(
+                topic for idx in cluster.paper_indices for topic in profiles[idx]
+                if topic not in common_topics
+            )
+            cluster.topics = [topic for topic, _ in cluster_topics.most_common(5)]
+            unique_aspects[f"Theme {i} ({len(cluster.paper_indices)} papers)"] = cluster.topics
+
+        result = ComparisonResult(
+            similarity_score=float(upper.mean()) if upper.size else 0.0,
+            common_topics=common_topics,
+            unique_aspects=unique_aspects,
+            methodology_comparison="",  # Will be filled by Gemini AI
+            findings_comparison="",
+            impact_comparison=""
+        )
+        return result, clusters
+
+    except Exception as e:
+        logger.error(f"Error surveying papers: {str(e)}")
+        raise
+
+def generate_survey_prompt(papers: List[arxiv.Result], clusters: List[PaperCluster],
+                           max_titles_per_theme: int = 5) -> str:
+    """Generate a prompt that sends Gemini only one representative abstract per theme."""
+    try:
+        prompt = (
+            f"Please write a short research survey of {len(papers)} papers that were "
+            f"grouped into {len(clusters)} themes by topic similarity.\n\n"
+        )
+
+        for i, cluster in enumerate(clusters, 1):
+            representative = papers[cluster.representative]
+            other_titles = [
+                str(papers[idx].title) for idx in cluster.paper_indices
+                if idx != cluster.representative
+            ][:max_titles_per_theme]
+            prompt += f"""
+            Theme {i} ({len(cluster.paper_indices)} papers, keywords: {', '.join(cluster.topics)}):
+            Representative paper: {str(representative.title)}
+            Abstract: {str(representative.summary)}
+            Other papers in this theme: {'; '.join(other_titles) if other_titles else 'None'}
+
+            """
+
+        prompt += """
+        For each theme, describe:
+        - The shared research question and typical methods
+        - How the theme differs from the others
+
+        Then summarize:
+        - Overall trends across the themes
+        - Open problems and promising directions
+
+        Format the response in clear sections with bullet points.
+        Keep the total response length under 4000 characters.
+        """
+
+        return prompt
+
+    except Exception as e:
+        logger.error(f"Error generating survey prompt: {str(e)}")
+        raise
@@ -0,0 +1,179 @@
+import logging
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from minhash import MinHasher, MinHashLSH, word_shingles
+from storage import Storage, get_storage
+from text_similarity import tokenize
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"v\d+$")
+
+
+def base_paper_id(paper_id: str) -> str:
+    """Strip the URL prefix and version suffix from an arXiv id."""
+    paper_id = str(paper_id).strip()
+    if "/abs/" in paper_id:
+        paper_id = paper_id.split("/abs/", 1)[1]
+    return VERSION_PATTERN.sub("", paper_id)
+
+
+class PaperDeduplicator:
+    """Map paper versions and near-duplicate reposts to one canonical id.
+
+    Versions of a paper share an id once the vN suffix is stripped. Reposts
+    and cross-listings under a different id are found with MinHash-LSH over
+    word shingles of the title and abstract: a paper whose estimated
+    similarity to an earlier one reaches the threshold takes that paper's
+    canonical id. Each new paper costs one signature and one insert per LSH
+    band.
+
+    Canonical ids are stored in the database when first assigned, because
+    the paper index and the comparison cache are keyed by them; a paper
+    keeps its canonical id across restarts. The last max_papers papers and
+    their signatures are loaded into memory on first use; once there are
+    more than that, ids not in memory are looked up in the database.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, threshold: float = 0.8,
+                 max_papers: int = 50000, storage: Optional[Storage] = None):
+        self.threshold = threshold
+        self.max_papers = max_papers
+        self._hasher = MinHasher(num_perm=num_perm)
+        self._lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+        self._canonical: "OrderedDict[str, str]" = OrderedDict()
+        # Database answers for ids outside the loaded papers, None if not stored
+        self._stored: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._storage = storage
+        self._loaded = False
+        self._all_in_memory = False  # every stored paper is in _canonical, so misses need no query
+        self.duplicates_found = 0
+
+    def _load(self) -> None:
+        """Load recently registered papers on first use. Caller holds the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self._storage is None:
+            self._storage = get_storage()
+        try:
+            rows = self._storage.recent_paper_canonical_ids(self.max_papers)
+            for base_id, canonical, signature in rows:
+                self._canonical[base_id] = canonical
+                if signature:
+                    self._lsh.insert(base_id, tuple(array('I', signature)))
+            self._all_in_memory = len(rows) < self.max_papers
+        except Exception as e:
+            logger.error(f"Error loading paper canonical ids: {str(e)}")
+
+    def _remember(self, base_id: str) -> Optional[str]:
+        """Canonical id known for base_id, in memory or stored. Caller holds the lock."""
+        self._load()
+        canonical = self._canonical.get(base_id)
+        if canonical is not None or self._all_in_memory:
+            return canonical
+        if base_id in self._stored:
+            self._stored.move_to_end(base_id)
+            return self._stored[base_id]
+        try:
+            canonical = self._storage.get_paper_canonical_id(base_id)
+        except Exception as e:
+            logger.error(f"Error looking up paper canonical id: {str(e)}")
+            return None
+        self._stored[base_id] = canonical
+        while len(self._stored) > self.max_papers:
+            self._stored.popitem(last=False)
+        return canonical
+
+    def _save(self, registered: List[Tuple[str, str, bytes]]) -> None:
+        if not registered:
+            return
+        try:
+            self._storage.save_paper_canonical_ids(registered)
+        except Exception as e:
+            logger.error(f"Error saving paper canonical ids: {str(e)}")
+
+    def _signature(self, paper):
+        text = f"{paper.title} {paper.summary}"
+        return self._hasher.signature(word_shingles(tokenize(text), k=3))
+
+    def canonical_id(self, paper) -> str:
+        """Canonical id for an arxiv result, registering it if unseen."""
+        registered = []
+        canonical = self._canonical_id(paper, registered)
+        self._save(registered)
+        return canonical
+
+    def _canonical_id(self, paper, registered: List[Tuple[str, str, bytes]]) -> str:
+        """canonical_id, appending a newly registered paper's row to registered."""
+        base_id = base_paper_id(paper.entry_id)
+        with self._lock:
+            canonical = self._canonical.get(base_id)
+            if canonical is not None:
+                self._canonical.move_to_end(base_id)
+                return canonical
+            canonical = self._remember(base_id)
+            if canonical is not None:
+                return canonical
+
+        try:
+            signature = self._signature(paper)
+        except Exception as e:
+            logger.error(f"Error computing paper signature: {str(e)}")
+            return base_id
+
+        with self._lock:
+            canonical = self._canonical.get(base_id)
+            if canonical is not None:
+                return canonical
+            canonical = base_id
+            matches = self._lsh.query(signature, self.threshold)
+            if matches:
+                canonical = self._canonical.get(matches[0][0], base_id)
+                self.duplicates_found += 1
+                logger.info(f"Paper {base_id} is a near-duplicate of {canonical}")
+
+            self._lsh.insert(base_id, signature)
+            self._canonical[base_id] = canonical
+            self._stored.pop(base_id, None)
+            while len(self._canonical) > self.max_papers:
+                oldest, _ = self._canonical.popitem(last=False)
+                self._lsh.remove(oldest)
+                self._all_in_memory = False
+        registered.append((base_id, canonical, array('I', signature).tobytes()))
+        return canonical
+
+    def lookup(self, paper_id: str) -> str:
+        """Canonical id for a bare arXiv id, without registering anything."""
+        base_id = base_paper_id(paper_id)
+        with self._lock:
+            canonical = self._remember(base_id)
+        return canonical or base_id
+
+    def dedupe(self, papers: List) -> List:
+        """Drop later results that share a canonical id with an earlier one."""
+        seen = set()
+        unique = []
+        registered = []
+        for paper in papers:
+            canonical = self._canonical_id(paper, registered)
+            if canonical not in seen:
+                seen.add(canonical)
+                unique.append(paper)
+        self._save(registered)
+        return unique
+
+    def get_stats(self) -> Dict:
+        return {
+            "papers": len(self._canonical),
+            "duplicates_found": self.duplicates_found
+        }
+
+
+# Global deduplicator instance
+paper_dedup = PaperDeduplicator()
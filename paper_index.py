@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from paper_dedup import paper_dedup
+from text_similarity import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Each token is scattered into this many output dimensions
+PROJECTION_NONZEROS = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+# Below this cosine score a match is noise: unrelated abstracts score up to
+# about 0.25 in this embedding, rewrites of the same topic 0.4 and up
+MIN_SIMILARITY = 0.3
+
+_PROJECTION_SEEDS = [((0x9E3779B97F4A7C15 + 2 * i + 1) & 0xFFFFFFFFFFFFFFFF,
+                      (0xBF58476D1CE4E5B9 * (i + 1)) & 0xFFFFFFFFFFFFFFFF)
+                     for i in range(PROJECTION_NONZEROS)]
+
+
+class PaperEmbeddingIndex:
+    """Local vector index of paper abstracts for "more like this" lookups.
+
+    Abstracts are embedded with a sparse random projection of hashed terms:
+    every token is hashed to a few output dimensions with random signs, which
+    approximates a dense Gaussian projection without storing a matrix.
+    Vectors are L2-normalized and kept in a memory-mapped float32 file that
+    doubles in size as papers are added; paper metadata is appended to a
+    JSONL file alongside it. Both files are created by the first write.
+    Queries are a brute-force dot product over all rows, which takes a few
+    milliseconds at tens of thousands of papers.
+    """
+
+    def __init__(self, index_dir: str = os.path.join("bot_data", "paper_index"),
+                 dim: int = 128, initial_capacity: int = 1024, title_weight: float = 2.0):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.title_weight = title_weight
+        self.initial_capacity = initial_capacity
+        self.vectors_file = os.path.join(index_dir, "vectors.f32")
+        self.papers_file = os.path.join(index_dir, "papers.jsonl")
+
+        self.papers: List[Dict] = []
+        self.rows: Dict[str, int] = {}
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.RLock()
+
+        self._load()
+
+    def _load(self) -> None:
+        """Read paper metadata and map the vector file, if the index has been written."""
+        try:
+            with open(self.papers_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.papers.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading paper index metadata: {str(e)}")
+            self.papers = []
+
+        if not os.path.exists(self.vectors_file):
+            if self.papers:
+                self._reject(f"{len(self.papers)} papers but no vector file")
+            return
+        # The file is preallocated in whole rows and metadata is appended only
+        # after its vectors are flushed, so it must hold at least one row per paper
+        row_bytes = 4 * self.dim
+        size = os.path.getsize(self.vectors_file)
+        if size % row_bytes or size // row_bytes < len(self.papers):
+            self._reject(f"vector file of {size} bytes does not fit {len(self.papers)} papers of dimension {self.dim}")
+            return
+        self.rows = {paper['id']: row for row, paper in enumerate(self.papers)}
+        if size:
+            self._open(size // row_bytes)
+
+    def _reject(self, reason: str) -> None:
+        """Set aside index files that do not match each other and start empty."""
+        logger.error(f"Discarding paper index: {reason}")
+        self.papers = []
+        for path in (self.vectors_file, self.papers_file):
+            if os.path.exists(path):
+                os.replace(path, path + ".invalid")
+
+    def _open(self, capacity: int) -> None:
+        """Map the vector file with room for capacity rows."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(self.vectors_file, 'ab') as f:
+            if f.tell() < capacity * self.dim * 4:
+                f.truncate(capacity * self.dim * 4)
+        self._capacity = capacity
+        self._vectors = np.memmap(self.vectors_file, dtype=np.float32, mode='r+',
+                                  shape=(capacity, self.dim))
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def __contains__(self, paper_id: str) -> bool:
+        return paper_id in self.rows
+
+    def embed(self, title: str, abstract: str) -> np.ndarray:
+        """Project a paper's title and abstract into the index space."""
+        counts = Counter(tokenize(abstract))
+        for token in tokenize(title):
+            counts[token] += self.title_weight
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not counts:
+            return vector
+        hashes = np.fromiter((zlib.crc32(t.encode()) for t in counts), dtype=np.uint64, count=len(counts))
+        weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        for a, b in _PROJECTION_SEEDS:
+            mixed = (hashes * np.uint64(a) + np.uint64(b)) % np.uint64(_MERSENNE_PRIME)
+            buckets = (mixed % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where((mixed >> np.uint64(32)) & np.uint64(1), 1.0, -1.0).astype(np.float32)
+            np.add.at(vector, buckets, signs * weights)
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def add_papers(self, papers: List) -> int:
+        """Index arxiv results under their canonical ids; return how many were added."""
+        added = []
+        with self._lock:
+            for paper in papers:
+                try:
+                    paper_id = paper_dedup.canonical_id(paper)
+                    if paper_id in self.rows:
+                        continue
+                    if len(self.papers) >= self._capacity:
+                        self._open(max(self._capacity * 2, self.initial_capacity))
+                    row = len(self.papers)
+                    self._vectors[row] = self.embed(str(paper.title), str(paper.summary))
+                    record = {
+                        'id': paper_id,
+                        'title': str(paper.title),
+                        'authors': [str(author) for author in paper.authors[:3]],
+                        'published': paper.published.strftime('%Y-%m-%d'),
+                        'category': str(paper.primary_category)
+                    }
+                    self.papers.append(record)
+                    self.rows[paper_id] = row
+                    added.append(record)
+                except Exception as e:
+                    logger.error(f"Error indexing paper: {str(e)}")
+
+            if added:
+                try:
+                    self._vectors.flush()
+                    with open(self.papers_file, 'a') as f:
+                        for record in added:
+                            f.write(json.dumps(record) + "\n")
+                except Exception as e:
+                    logger.error(f"Error saving paper index: {str(e)}")
+        return len(added)
+
+    def _top_k(self, query: np.ndarray, k: int, exclude: Optional[int] = None,
+               min_score: float = -1.0) -> List[Tuple[Dict, float]]:
+        with self._lock:
+            count = len(self.papers)
+            if count == 0:
+                return []
+            scores = np.asarray(self._vectors[:count] @ query)
+            if exclude is not None:
+                scores[exclude] = -np.inf
+            k = min(k, count - (exclude is not None))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.papers[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def similar(self, paper_id: str, k: int = 5,
+                min_score: float = MIN_SIMILARITY) -> Optional[List[Tuple[Dict, float]]]:
+        """Indexed papers scoring at least min_score against an indexed paper, or None if it is unknown."""
+        with self._lock:
+            row = self.rows.get(paper_id)
+            if row is None:
+                return None
+            query = np.array(self._vectors[row])
+            return self._top_k(query, k, exclude=row, min_score=min_score)
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[Dict, float]]:
+        """Indexed papers closest to free text."""
+        return self._top_k(self.embed("", text), k)
+
+    def get_stats(self) -> Dict:
+        return {
+            "papers": len(self.papers),
+            "capacity": self._capacity,
+            "dim": self.dim,
+            "size_mb": self._capacity * self.dim * 4 / (1024 * 1024)
+        }
+
+
+# Global index instance
+paper_index = PaperEmbeddingIndex()
@@ -0,0 +1,221 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import arxiv
+
+from keyword_automaton import KeywordAutomaton, normalize_phrase
+from notifications import SubscriptionKey
+from paper_dedup import base_paper_id
+
+logger = logging.getLogger(__name__)
+
+# Minute precision used by arXiv's submittedDate ranges
+ARXIV_DATE_FORMAT = "%Y%m%d%H%M"
+
+
+class HarvestedPaper:
+    """The fields of a new submission needed for matching and alerts."""
+
+    __slots__ = ("paper_id", "title", "pdf_url", "published", "categories", "text")
+
+    def __init__(self, paper_id: str, title: str, pdf_url: str, published: datetime,
+                 categories: FrozenSet[str], text: str):
+        self.paper_id = paper_id
+        self.title = title
+        self.pdf_url = pdf_url
+        self.published = published
+        self.categories = categories
+        self.text = text
+
+    @classmethod
+    def from_result(cls, result) -> "HarvestedPaper":
+        return cls(
+            base_paper_id(result.entry_id),
+            result.title,
+            result.pdf_url,
+            result.published.replace(tzinfo=None),
+            frozenset(result.categories),
+            normalize_phrase(f"{result.title} {result.summary}")
+        )
+
+
+class PaperHarvester:
+    """Incremental per-category listing of new arXiv submissions.
+
+    For each category the harvester keeps the newest submission time it has
+    listed and a queue of time ranges still to list. A harvest queues the
+    range above the newest listed paper and, if the requested window starts
+    before what the category has been listed back to (a weekly subscriber
+    after daily ones, or the first harvest after a restart), the range below
+    it. Ranges are listed newest first, page by page, so every submission is
+    fetched and normalized once. One harvest lists at most max_per_category
+    papers per category; a range cut short keeps its unlisted remainder,
+    bounded above by the last paper listed, and the next harvest resumes it
+    with a submittedDate query instead of listing from the top again.
+    Papers are kept for retention_days and shared by all categories they
+    are cross-listed in.
+    """
+
+    def __init__(self, retention_days: int = 7, max_per_category: int = 5000, page_size: int = 200):
+        self.retention = timedelta(days=retention_days)
+        self.max_per_category = max_per_category
+        self.client = arxiv.Client(page_size=page_size)
+        self._lock = threading.Lock()
+        self._papers: Dict[str, HarvestedPaper] = {}
+        self._newest: Dict[str, datetime] = {}
+        self._oldest: Dict[str, datetime] = {}
+        # category -> (after, up to) ranges still to list, newest first; None is "now"
+        self._pending: Dict[str, List[Tuple[datetime, Optional[datetime]]]] = {}
+
+    def _list_range(self, category: str, after: datetime, upto: Optional[datetime],
+                    budget: int) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+        """List papers published after `after` and up to `upto`, newest first.
+
+        Returns the number listed, the newest publication time seen, and the
+        time of the last paper listed if the budget ran out first, else None.
+        """
+        query = f"cat:{category}"
+        if upto is not None:
+            query += (f" AND submittedDate:[{after.strftime(ARXIV_DATE_FORMAT)}"
+                      f" TO {upto.strftime(ARXIV_DATE_FORMAT)}]")
+        search = arxiv.Search(query=query, max_results=None, sort_by=arxiv.SortCriterion.SubmittedDate)
+        listed = 0
+        newest = None
+        for result in self.client.results(search):
+            paper = HarvestedPaper.from_result(result)
+            if paper.published <= after:
+                break
+            if upto is not None and paper.published > upto:
+                continue  # submittedDate only has minute precision
+            newest = newest or paper.published
+            self._papers.setdefault(paper.paper_id, paper)
+            listed += 1
+            if listed >= budget:
+                return listed, newest, paper.published
+        return listed, newest, None
+
+    def _fetch_category(self, category: str, oldest: datetime) -> int:
+        """List the category's queued ranges within one budget; return papers added."""
+        pending = self._pending.setdefault(category, [])
+        if category not in self._newest:
+            pending.append((oldest, None))
+            self._oldest[category] = oldest
+        else:
+            pending.insert(0, (self._newest[category], None))
+            if oldest < self._oldest[category]:
+                pending.append((oldest, self._oldest[category]))
+                self._oldest[category] = oldest
+
+        before = len(self._papers)
+        budget = self.max_per_category
+        remaining = []
+        for after, upto in pending:
+            if budget <= 0:
+                remaining.append((after, upto))
+                continue
+            listed, newest, cut_at = self._list_range(category, after, upto, budget)
+            budget -= listed
+            if upto is None:
+                self._newest[category] = newest or after
+            if cut_at is not None:
+                remaining.append((after, cut_at))
+        self._pending[category] = remaining
+
+        if remaining:
+            logger.warning(
+                f"Listing of {category} stopped at {self.max_per_category} papers; "
+                f"papers from {remaining[-1][0]} to {remaining[0][1]} will be listed by the next harvest"
+            )
+        return len(self._papers) - before
+
+    def harvest(self, categories: Iterable[str], since: datetime) -> List[HarvestedPaper]:
+        """Papers in any of categories published after since, newest first."""
+        categories = set(categories)
+        now = datetime.utcnow()
+        cutoff = now - self.retention
+        oldest = max(since, cutoff)
+        with self._lock:
+            for paper_id in [pid for pid, paper in self._papers.items() if paper.published < cutoff]:
+                del self._papers[paper_id]
+            for category, pending in self._pending.items():
+                self._pending[category] = [
+                    (max(after, cutoff), upto) for after, upto in pending if upto is None or upto > cutoff
+                ]
+            for category in sorted(categories):
+                added = self._fetch_category(category, oldest)
+                if added:
+                    logger.info(f"Harvested {added} new papers from {category}")
+            papers = [
+                paper for paper in self._papers.values()
+                if paper.published > since and paper.categories & categories
+            ]
+        papers.sort(key=lambda paper: paper.published, reverse=True)
+        return papers
+
+
+class _CompiledSubscription:
+    __slots__ = ("key", "phrases", "categories")
+
+    def __init__(self, key: SubscriptionKey, phrases: FrozenSet[str], categories: FrozenSet[str]):
+        self.key = key
+        self.phrases = phrases
+        self.categories = categories
+
+
+class SubscriptionPercolator:
+    """Match papers against many subscriptions through an inverted index.
+
+    Each subscription needs every one of its keyword phrases in the paper's
+    title or abstract and, if it names categories, any one of them. The
+    phrases in a paper are found in one pass of the shared keyword
+    automaton. A subscription is indexed under a single anchor, its
+    least-shared phrase, or under each of its categories if it has no
+    keywords, so the work per paper depends on the phrases it contains and
+    the few subscriptions anchored on them, not on how many subscriptions
+    exist. Only papers from the subscribed categories are harvested, so
+    keyword-only subscriptions, which cover all of arXiv, are searched for
+    separately rather than added here.
+    """
+
+    def __init__(self, automaton: KeywordAutomaton):
+        self.automaton = automaton
+        self._by_phrase: Dict[str, List[_CompiledSubscription]] = {}
+        self._by_category: Dict[str, List[_CompiledSubscription]] = {}
+        self._categories: Set[str] = set()
+
+    def add(self, key: SubscriptionKey) -> None:
+        keywords, categories = key
+        phrases = frozenset(normalize_phrase(keyword) for keyword in keywords) - {""}
+        subscription = _CompiledSubscription(key, phrases, frozenset(categories))
+        if phrases:
+            anchor = min(phrases, key=lambda phrase: (len(self._by_phrase.get(phrase, ())), -len(phrase), phrase))
+            self._by_phrase.setdefault(anchor, []).append(subscription)
+        else:
+            for category in categories:
+                self._by_category.setdefault(category, []).append(subscription)
+        self._categories.update(categories)
+
+    def harvest_categories(self) -> Set[str]:
+        """Categories to list so every subscription can see its candidates."""
+        return set(self._categories)
+
+    def match(self, paper: HarvestedPaper) -> List[SubscriptionKey]:
+        """Keys of the subscriptions the paper satisfies."""
+        matched = []
+        phrases = self.automaton.search(paper.text)
+        for phrase in phrases:
+            for subscription in self._by_phrase.get(phrase, ()):
+                if subscription.phrases <= phrases and (
+                        not subscription.categories or subscription.categories & paper.categories):
+                    matched.append(subscription.key)
+        for category in paper.categories:
+            for subscription in self._by_category.get(category, ()):
+                matched.append(subscription.key)
+        # A category-only subscription can be reached through several of the paper's categories
+        return list(dict.fromkeys(matched))
+
+
+# Global harvester; new submissions are cached between notification checks
+paper_harvester = PaperHarvester()
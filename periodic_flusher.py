@@ -0,0 +1,52 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """Daemon thread that calls flush every interval_seconds and once more on close.
+
+    wake() runs the next call straight away instead of waiting out the
+    interval. An exception from flush is logged and the thread carries on,
+    so one failed write does not stop later ones.
+    """
+
+    def __init__(self, flush: Callable[[], None], interval_seconds: float, name: str):
+        self.flush = flush
+        self.interval = interval_seconds
+        self.name = name
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Run the next flush now."""
+        self._wake.set()
+
+    def _call(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error in {self.name} flush: {str(e)}")
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self._call()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread, letting a flush in progress finish."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the thread and flush what is pending."""
+        self.stop(timeout)
+        self._call()
@@ -0,0 +1,156 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Words that do not change what is being asked about a paper
+QUESTION_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'for', 'by',
+    'is', 'are', 'was', 'were', 'be', 'it', 'its', 'this', 'that', 'these',
+    'what', 'whats', 'which', 'can', 'could', 'would', 'you', 'please', 'me',
+    'tell', 'about', 'do', 'does', 'did', 'i', 'we', 'us', 'paper', 'article',
+    'briefly', 'give', 'some', 'here', 'there'
+}
+
+# Negations are always content words; contractions fold to "not"
+NEGATION_WORDS = {
+    'not', 'no', 'nor', 'never', 'none', 'without', 'neither', 'cannot',
+    'isnt', 'arent', 'wasnt', 'werent', 'dont', 'doesnt', 'didnt', 'cant',
+    'couldnt', 'wouldnt', 'shouldnt', 'wont', 'hasnt', 'havent', 'hadnt'
+}
+
+APOSTROPHE_PATTERN = re.compile(r"['\u2019]")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, punctuation and stopwords into a question signature."""
+    text = APOSTROPHE_PATTERN.sub("", str(question).lower())
+    text = PUNCTUATION_PATTERN.sub(" ", text)
+    tokens = ["not" if t in NEGATION_WORDS else t for t in text.split() if t not in QUESTION_STOPWORDS]
+    return " ".join(tokens)
+
+
+def content_words(signature: str) -> Tuple[str, ...]:
+    """Content words of a signature in order, with plural endings folded."""
+    return tuple(
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in signature.split()
+    )
+
+
+class _CachedAnswer:
+    __slots__ = ("answer", "words", "expires_at")
+
+    def __init__(self, answer: str, words: Tuple[str, ...], expires_at: float):
+        self.answer = answer
+        self.words = words
+        self.expires_at = expires_at
+
+
+class QuestionAnswerCache:
+    """LRU cache of Q&A answers keyed by paper id and normalized question.
+
+    Exact signature matches are a dict lookup. When near-duplicate matching is
+    enabled, a miss falls back to questions about the same paper with the same
+    content words in the same order, so re-punctuated questions and singular
+    or plural forms share an answer. Questions that differ in any content word,
+    in word order or in negation never do: "how does x cause y" and "how does
+    y cause x" are different questions however similar their spelling.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_hours: float = 24,
+                 match_near_duplicates: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_hours * 3600
+        self.match_near_duplicates = match_near_duplicates
+
+        self._entries: "OrderedDict[Tuple[str, str], _CachedAnswer]" = OrderedDict()
+        # paper id -> content words -> signature cached under them
+        self._by_paper: Dict[str, Dict[Tuple[str, ...], str]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        """Drop an entry. Caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        signatures = self._by_paper.get(key[0])
+        if entry is not None and signatures is not None:
+            if signatures.get(entry.words) == key[1]:
+                del signatures[entry.words]
+            if not signatures:
+                del self._by_paper[key[0]]
+
+    def _lookup(self, key: Tuple[str, str], now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.answer
+
+    def get(self, paper_id: str, question: str) -> Optional[str]:
+        """Return a cached answer for this question about the paper, if any."""
+        signature = normalize_question(question)
+        if not signature:
+            return None
+        now = time.monotonic()
+
+        with self._lock:
+            answer = self._lookup((paper_id, signature), now)
+            if answer is not None:
+                self.hits += 1
+                return answer
+
+            if self.match_near_duplicates:
+                other = self._by_paper.get(paper_id, {}).get(content_words(signature))
+                if other is not None:
+                    answer = self._lookup((paper_id, other), now)
+                    if answer is not None:
+                        self.near_hits += 1
+                        return answer
+
+            self.misses += 1
+            return None
+
+    def set(self, paper_id: str, question: str, answer: str) -> None:
+        """Cache the answer to a question about a paper."""
+        signature = normalize_question(question)
+        if not signature or not answer:
+            return
+        key = (paper_id, signature)
+        entry = _CachedAnswer(answer, content_words(signature), time.monotonic() + self.ttl_seconds)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_paper.setdefault(paper_id, {})[entry.words] = signature
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and current size."""
+        return {
+            "entries": len(self._entries),
+            "papers": len(self._by_paper),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+# Global cache instance
+qa_cache = QuestionAnswerCache()
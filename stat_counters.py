@@ -0,0 +1,55 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict
+
+from periodic_flusher import PeriodicFlusher
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class StatCounters:
+    """Thread-safe in-memory counters flushed to the statistics table.
+
+    Incrementing takes a lock and bumps a dict entry, with no I/O. A
+    background thread adds the accumulated deltas to the database in one
+    transaction every flush_interval seconds and at shutdown; a failed
+    flush puts its deltas back so nothing is lost.
+    """
+
+    def __init__(self, storage: Storage, flush_interval_seconds: float = 10.0):
+        self.storage = storage
+        self.flush_interval = flush_interval_seconds
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = PeriodicFlusher(self.flush, flush_interval_seconds, "stat-counters")
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def pending(self) -> Dict[str, int]:
+        """Increments not yet written to the database."""
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self) -> None:
+        """Add the pending increments to the database."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._counts:
+                    return
+                deltas, self._counts = self._counts, defaultdict(int)
+            try:
+                self.storage.add_statistics(deltas)
+            except Exception as e:
+                logger.error(f"Error flushing statistics: {str(e)}")
+                with self._lock:
+                    for name, amount in deltas.items():
+                        self._counts[name] += amount
+
+    def close(self) -> None:
+        """Stop the flusher and write what is pending."""
+        self._flusher.close()
@@ -0,0 +1,513 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("bot_data", "bot.db")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS user_preferences (
+        user_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS notification_preferences (
+        user_id INTEGER PRIMARY KEY,
+        enabled INTEGER NOT NULL DEFAULT 0,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_notification_enabled ON notification_preferences (user_id) WHERE enabled = 1",
+    # One row per user with notifications on, keyed for "who is due now" range scans
+    """CREATE TABLE IF NOT EXISTS notification_schedule (
+        user_id INTEGER PRIMARY KEY,
+        next_due TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_notification_schedule_due ON notification_schedule (next_due)",
+    # Enabled users from before the schedule existed are due immediately
+    "INSERT OR IGNORE INTO notification_schedule (user_id, next_due) "
+    "SELECT user_id, '' FROM notification_preferences WHERE enabled = 1",
+    """CREATE TABLE IF NOT EXISTS admins (
+        user_id INTEGER PRIMARY KEY,
+        is_owner INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_seen TEXT NOT NULL,
+        last_active TEXT NOT NULL,
+        total_actions INTEGER NOT NULL DEFAULT 0,
+        searches INTEGER NOT NULL DEFAULT 0,
+        downloads INTEGER NOT NULL DEFAULT 0,
+        summaries INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active)",
+    "CREATE INDEX IF NOT EXISTS idx_users_total_actions ON users (total_actions)",
+    "CREATE INDEX IF NOT EXISTS idx_users_username ON users (username COLLATE NOCASE)",
+    """CREATE TABLE IF NOT EXISTS statistics (
+        name TEXT PRIMARY KEY,
+        value
+    )""",
+    """CREATE TABLE IF NOT EXISTS restrictions (
+        user_id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        end_time TEXT,
+        restricted_by INTEGER,
+        reason TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_restrictions_end_time ON restrictions (end_time)",
+    """CREATE TABLE IF NOT EXISTS active_user_sketches (
+        day TEXT PRIMARY KEY,
+        registers BLOB NOT NULL
+    )""",
+    # Bumped by every admin or restriction change so readers can tell when to reload them
+    """CREATE TABLE IF NOT EXISTS auth_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO auth_version (id, version) VALUES (1, 0)",
+    """CREATE TABLE IF NOT EXISTS timeseries_slots (
+        resolution TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        slot INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        total REAL NOT NULL,
+        peak REAL NOT NULL,
+        PRIMARY KEY (resolution, slot, metric)
+    )""",
+    """CREATE TABLE IF NOT EXISTS paper_canonical_ids (
+        base_id TEXT PRIMARY KEY,
+        canonical_id TEXT NOT NULL,
+        signature BLOB
+    )""",
+]
+
+USER_ACTIONS = ("searches", "downloads", "summaries")
+
+# Columns the user list can be ordered by; each has an index ending in the rowid
+USER_SORT_KEYS = ("last_active", "total_actions")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now() -> str:
+    return datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+
+
+class Storage:
+    """SQLite-backed store for all per-user bot state.
+
+    The database runs in WAL mode so dispatcher threads can read while one
+    writes. Each thread gets its own connection; all statements are constant
+    SQL with parameters, so sqlite3's per-connection statement cache reuses
+    the prepared statements. Every operation touches only the rows it needs,
+    so its cost does not grow with the number of users.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self.transaction() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run statements atomically; the write lock is taken up front."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        return self._connection().execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # User preferences
+
+    def get_user_preferences(self, user_id: int) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM user_preferences WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def save_user_preferences(self, items: Iterable[Tuple[int, Dict]]) -> None:
+        """Upsert preferences for several users in one transaction."""
+        now = _now()
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO user_preferences (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(user_id, json.dumps(prefs), now) for user_id, prefs in items]
+            )
+
+    # Notification preferences
+
+    def get_notification_preferences(self, user_id: int) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM notification_preferences WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def enabled_notification_preferences(self) -> List[Tuple[int, Dict]]:
+        """(user_id, preferences) for every user with notifications enabled."""
+        rows = self._query("SELECT user_id, data FROM notification_preferences WHERE enabled = 1")
+        return [(row["user_id"], json.loads(row["data"])) for row in rows]
+
+    def save_notification_preferences(self, user_id: int, prefs: Dict, next_due: Optional[str]) -> None:
+        """Store preferences and schedule the next check; next_due None unschedules the user."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO notification_preferences (user_id, enabled, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET enabled = excluded.enabled, data = excluded.data",
+                (user_id, int(bool(prefs.get('enabled'))), json.dumps(prefs))
+            )
+            self._schedule_notification(conn, user_id, next_due)
+
+    @staticmethod
+    def _schedule_notification(conn: sqlite3.Connection, user_id: int, next_due: Optional[str]) -> None:
+        if next_due is None:
+            conn.execute("DELETE FROM notification_schedule WHERE user_id = ?", (user_id,))
+        else:
+            conn.execute(
+                "INSERT INTO notification_schedule (user_id, next_due) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET next_due = excluded.next_due",
+                (user_id, next_due)
+            )
+
+    def reschedule_notification(self, user_id: int, next_due: str) -> None:
+        with self.transaction() as conn:
+            self._schedule_notification(conn, user_id, next_due)
+
+    def due_notification_user_ids(self, now: str, limit: int) -> List[int]:
+        """Users whose next notification check is at or before now, earliest first."""
+        rows = self._query(
+            "SELECT user_id FROM notification_schedule WHERE next_due <= ? ORDER BY next_due LIMIT ?",
+            (now, limit)
+        )
+        return [row["user_id"] for row in rows]
+
+    # Admins
+
+    @staticmethod
+    def _bump_auth_version(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE auth_version SET version = version + 1 WHERE id = 1")
+
+    def get_auth_version(self) -> int:
+        """Counter that changes whenever admins or restrictions change."""
+        rows = self._query("SELECT version FROM auth_version WHERE id = 1")
+        return rows[0]["version"] if rows else 0
+
+    def get_admins(self) -> List[Dict]:
+        rows = self._query("SELECT user_id, is_owner FROM admins ORDER BY is_owner DESC, rowid")
+        return [{"user_id": row["user_id"], "is_owner": bool(row["is_owner"])} for row in rows]
+
+    def add_admin(self, user_id: int, is_owner: bool = False) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO admins (user_id, is_owner) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET is_owner = MAX(is_owner, excluded.is_owner)",
+                (user_id, int(is_owner))
+            )
+            self._bump_auth_version(conn)
+
+    def remove_admin(self, user_id: int) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM admins WHERE user_id = ? AND is_owner = 0", (user_id,))
+            self._bump_auth_version(conn)
+
+    # Statistics
+
+    def get_statistics(self) -> Dict:
+        return {row["name"]: row["value"] for row in self._query("SELECT name, value FROM statistics")}
+
+    def init_statistics(self, defaults: Dict) -> None:
+        """Insert statistics that do not exist yet."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO statistics (name, value) VALUES (?, ?)",
+                list(defaults.items())
+            )
+
+    def set_statistic(self, name: str, value) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO statistics (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (name, value)
+            )
+
+    def add_statistics(self, deltas: Dict[str, int]) -> None:
+        """Add to several counters in one transaction."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO statistics (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(deltas.items())
+            )
+
+    # Users
+
+    @staticmethod
+    def _user_row(row: sqlite3.Row) -> Dict:
+        return {
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "first_seen": row["first_seen"],
+            "last_active": row["last_active"],
+            "total_actions": row["total_actions"],
+            "actions": {action: row[action] for action in USER_ACTIONS}
+        }
+
+    def get_usernames(self, user_ids: List[int]) -> Dict[int, str]:
+        """Usernames for the given ids, for labelling admin lists."""
+        names = {}
+        for user_id in user_ids:
+            rows = self._query("SELECT username FROM users WHERE user_id = ?", (user_id,))
+            if rows:
+                names[user_id] = rows[0]["username"]
+        return names
+
+    def apply_activity(self, records: List[Tuple]) -> None:
+        """Fold a batch of (seq, timestamp, user_id, username, action) records into the users table.
+
+        Action totals are counted live by StatCounters; only total_users,
+        which needs the users table to tell new users apart, is derived here.
+        """
+        if not records:
+            return
+        per_user: Dict[int, Dict] = {}
+        for _, timestamp, user_id, username, action in records:
+            if user_id is None:
+                continue
+            user = per_user.setdefault(user_id, {"username": username, "first": timestamp, "last": timestamp,
+                                                 "total": 0, "actions": dict.fromkeys(USER_ACTIONS, 0)})
+            user["username"] = username or user["username"]
+            user["last"] = max(user["last"], timestamp)
+            user["total"] += 1
+            if action in USER_ACTIONS:
+                user["actions"][action] += 1
+
+        with self.transaction() as conn:
+            new_users = 0
+            for user_id, user in per_user.items():
+                new_users += conn.execute(
+                    "INSERT OR IGNORE INTO users (user_id, username, first_seen, last_active) VALUES (?, ?, ?, ?)",
+                    (user_id, user["username"], user["first"], user["last"])
+                ).rowcount
+                conn.execute(
+                    "UPDATE users SET username = COALESCE(?, username), last_active = MAX(last_active, ?), "
+                    "total_actions = total_actions + ?, searches = searches + ?, "
+                    "downloads = downloads + ?, summaries = summaries + ? WHERE user_id = ?",
+                    (user["username"], user["last"], user["total"], user["actions"]["searches"],
+                     user["actions"]["downloads"], user["actions"]["summaries"], user_id)
+                )
+            if new_users:
+                conn.execute(
+                    "INSERT INTO statistics (name, value) VALUES ('total_users', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (new_users,)
+                )
+            conn.execute(
+                "INSERT INTO statistics (name, value) VALUES ('activity_log_seq', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (max(record[0] for record in records),)
+            )
+
+    def get_users(self, user_ids: List[int]) -> Dict[int, Dict]:
+        """User records for the given ids that exist."""
+        users = {}
+        for user_id in user_ids:
+            rows = self._query("SELECT * FROM users WHERE user_id = ?", (user_id,))
+            if rows:
+                users[user_id] = self._user_row(rows[0])
+        return users
+
+    def import_user(self, user_id: int, data: Dict) -> None:
+        """Insert or replace a user record as stored in the legacy users.json."""
+        actions = data.get("actions", {})
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (user_id, username, first_seen, last_active, total_actions, "
+                "searches, downloads, summaries) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, data.get("username"), data.get("first_seen", _now()),
+                 data.get("last_active", _now()), data.get("total_actions", 0),
+                 actions.get("searches", 0), actions.get("downloads", 0), actions.get("summaries", 0))
+            )
+
+    def count_users(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM users")[0]["n"]
+
+    def user_ids_active_since(self, timestamp: str) -> List[int]:
+        rows = self._query("SELECT user_id FROM users WHERE last_active >= ?", (timestamp,))
+        return [row["user_id"] for row in rows]
+
+    def page_users(self, sort_by: str, after: Optional[Tuple] = None, limit: int = 10) -> List[Dict]:
+        """Users in descending sort_by order, starting after a (value, user_id) cursor.
+
+        The cursor is the sort value and id of the last user on the previous
+        page, so each page is one index range scan whatever the page number.
+        """
+        if sort_by not in USER_SORT_KEYS:
+            raise ValueError(f"Cannot sort users by {sort_by}")
+        if after is None:
+            rows = self._query(f"SELECT * FROM users ORDER BY {sort_by} DESC, user_id DESC LIMIT ?", (limit,))
+        else:
+            rows = self._query(
+                f"SELECT * FROM users WHERE ({sort_by}, user_id) < (?, ?) "
+                f"ORDER BY {sort_by} DESC, user_id DESC LIMIT ?",
+                (after[0], after[1], limit)
+            )
+        return [self._user_row(row) for row in rows]
+
+    def find_users_by_username(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Users whose username starts with prefix, case-insensitively."""
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = self._query(
+            "SELECT * FROM users WHERE username LIKE ? ESCAPE '\\' ORDER BY username COLLATE NOCASE LIMIT ?",
+            (pattern, limit)
+        )
+        return [self._user_row(row) for row in rows]
+
+    # Active-user sketches
+
+    def get_active_user_sketches(self, since_day: str) -> Dict[str, bytes]:
+        """Stored per-day sketches from since_day (YYYY-MM-DD) on."""
+        rows = self._query("SELECT day, registers FROM active_user_sketches WHERE day >= ?", (since_day,))
+        return {row["day"]: row["registers"] for row in rows}
+
+    def save_active_user_sketches(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO active_user_sketches (day, registers) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET registers = excluded.registers",
+                list(items)
+            )
+
+    # Time series
+
+    def get_timeseries_slots(self, resolution: str, first_slot: int) -> List[Tuple[str, int, int, float, float]]:
+        """(metric, slot, count, total, peak) for slots from first_slot on."""
+        rows = self._query(
+            "SELECT metric, slot, count, total, peak FROM timeseries_slots WHERE resolution = ? AND slot >= ?",
+            (resolution, first_slot)
+        )
+        return [(row["metric"], row["slot"], row["count"], row["total"], row["peak"]) for row in rows]
+
+    def save_timeseries_slots(self, resolution: str, rows: Iterable[Tuple[str, int, int, float, float]],
+                              first_slot: int) -> None:
+        """Replace the given slots and drop those before first_slot."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO timeseries_slots (resolution, metric, slot, count, total, peak) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(resolution, slot, metric) DO UPDATE SET count = excluded.count, "
+                "total = excluded.total, peak = excluded.peak",
+                [(resolution,) + tuple(row) for row in rows]
+            )
+            conn.execute("DELETE FROM timeseries_slots WHERE resolution = ? AND slot < ?", (resolution, first_slot))
+
+    # Paper canonical ids
+
+    def get_paper_canonical_id(self, base_id: str) -> Optional[str]:
+        rows = self._query("SELECT canonical_id FROM paper_canonical_ids WHERE base_id = ?", (base_id,))
+        return rows[0]["canonical_id"] if rows else None
+
+    def recent_paper_canonical_ids(self, limit: int) -> List[Tuple[str, str, Optional[bytes]]]:
+        """(base_id, canonical_id, signature) for the last `limit` papers registered, oldest first."""
+        rows = self._query(
+            "SELECT base_id, canonical_id, signature FROM paper_canonical_ids ORDER BY rowid DESC LIMIT ?",
+            (limit,)
+        )
+        return [(row["base_id"], row["canonical_id"], row["signature"]) for row in reversed(rows)]
+
+    def save_paper_canonical_ids(self, items: Iterable[Tuple[str, str, Optional[bytes]]]) -> None:
+        """Record papers' canonical ids; an id keeps the canonical it was first given."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO paper_canonical_ids (base_id, canonical_id, signature) VALUES (?, ?, ?)",
+                list(items)
+            )
+
+    # Restrictions
+
+    def get_restriction(self, user_id: int) -> Optional[Dict]:
+        rows = self._query(
+            "SELECT kind, end_time, restricted_by, reason FROM restrictions WHERE user_id = ?", (user_id,)
+        )
+        return dict(rows[0]) if rows else None
+
+    def list_restrictions(self, now: str) -> List[Dict]:
+        """Blocked users, then restrictions that have not expired, with usernames."""
+        rows = self._query(
+            "SELECT r.user_id, r.kind, r.end_time, r.restricted_by, r.reason, u.username "
+            "FROM restrictions r LEFT JOIN users u ON u.user_id = r.user_id "
+            "WHERE r.kind = 'blocked' OR r.end_time > ? "
+            "ORDER BY r.kind, r.end_time",
+            (now,)
+        )
+        return [dict(row) for row in rows]
+
+    def block_user(self, user_id: int, blocked_by: Optional[int] = None, reason: Optional[str] = None) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO restrictions (user_id, kind, end_time, restricted_by, reason) "
+                "VALUES (?, 'blocked', NULL, ?, ?)",
+                (user_id, blocked_by, reason)
+            )
+            self._bump_auth_version(conn)
+
+    def restrict_user(self, user_id: int, end_time: str, restricted_by: int, reason: str) -> None:
+        with self.transaction() as conn:
+            # A temporary restriction never downgrades a permanent block
+            conn.execute(
+                "INSERT INTO restrictions (user_id, kind, end_time, restricted_by, reason) "
+                "VALUES (?, 'restricted', ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET end_time = excluded.end_time, "
+                "restricted_by = excluded.restricted_by, reason = excluded.reason "
+                "WHERE kind = 'restricted'",
+                (user_id, end_time, restricted_by, reason)
+            )
+            self._bump_auth_version(conn)
+
+    def remove_restriction(self, user_id: int) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM restrictions WHERE user_id = ?", (user_id,))
+            self._bump_auth_version(conn)
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """Shared storage instance; BOT_DB_PATH overrides the database location."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = Storage(os.getenv("BOT_DB_PATH", DEFAULT_DB_PATH))
+    return _storage
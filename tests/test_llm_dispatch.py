@@ -0,0 +1,110 @@
+import threading
+import time
+from queue import Queue
+
+import pytest
+
+pytest.importorskip("telegram.ext")
+
+from telegram import Bot, CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler, Dispatcher
+
+from llm_scheduler import LLMScheduler, SchedulerBusyError
+
+TOKEN = "123456:TEST-token"
+
+
+class OfflineBot(Bot):
+    """Bot that answers getMe locally; the dispatcher asks for it when starting workers."""
+
+    def get_me(self, *args, **kwargs) -> User:
+        return User(123456, "PaperPilot", True, username="paperpilot_test_bot")
+
+
+def callback_update(update_id: int, data: str, bot: Bot) -> Update:
+    user = User(update_id, f"user{update_id}", False)
+    query = CallbackQuery(str(update_id), user, "chat", data=data, bot=bot)
+    return Update(update_id, callback_query=query)
+
+
+class SlowModel:
+    """Records how many calls overlap."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+        return prompt
+
+
+def start_dispatcher(dp: Dispatcher) -> threading.Thread:
+    """Run the dispatcher loop in a thread, as Updater does."""
+    ready = threading.Event()
+    thread = threading.Thread(target=dp.start, kwargs={"ready": ready}, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    return thread
+
+
+def test_async_handlers_contend_in_the_scheduler():
+    bot = OfflineBot(TOKEN)
+    dp = Dispatcher(bot, Queue(), workers=8)
+    scheduler = LLMScheduler(max_concurrent=2, max_queue_depth=2, max_wait_seconds=10)
+    model = SlowModel(0.3)
+    busy = []
+    done = threading.Semaphore(0)
+
+    def summarize(update, context):
+        try:
+            scheduler.generate(model, "summary", user_id=update.effective_user.id)
+        except SchedulerBusyError:
+            busy.append(update.update_id)
+        finally:
+            done.release()
+
+    dp.add_handler(CallbackQueryHandler(summarize, pattern="^summarize_", run_async=True))
+    thread = start_dispatcher(dp)
+    try:
+        for update_id in range(8):
+            dp.update_queue.put(callback_update(update_id, f"summarize_{update_id}", bot))
+        for _ in range(8):
+            assert done.acquire(timeout=10)
+    finally:
+        dp.stop()
+        thread.join(5)
+
+    stats = scheduler.get_stats()
+    assert model.peak == 2
+    assert stats["completed"] == 4
+    assert stats["rejected"] == len(busy) == 4
+
+
+def test_llm_handlers_run_async(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("BOT_DB_PATH", str(tmp_path / "bot.db"))
+    monkeypatch.setenv("FAKE_LLM", "1")
+    monkeypatch.setenv("TELEGRAM_TOKEN", TOKEN)
+    arxiv_bot = pytest.importorskip("arXiv")
+
+    dp = Dispatcher(OfflineBot(TOKEN), Queue(), workers=1)
+    try:
+        arxiv_bot.add_llm_handlers(dp)
+        handlers = [handler for group in dp.handlers.values() for handler in group]
+    finally:
+        dp.stop()
+
+    callbacks = {handler.callback for handler in handlers}
+    for callback in (arxiv_bot.summarize_paper, arxiv_bot.generate_comparison, arxiv_bot.survey_command,
+                     arxiv_bot.handle_chat_message):
+        assert callback in callbacks
+    assert len(handlers) == 5
+    assert all(handler.run_async for handler in handlers)
@@ -0,0 +1,32 @@
+from qa_cache import QuestionAnswerCache
+
+
+def test_reworded_question_shares_answer():
+    cache = QuestionAnswerCache()
+    cache.set("2401.00001", "What datasets are used?", "ImageNet")
+    assert cache.get("2401.00001", "what dataset is used") == "ImageNet"
+    assert cache.near_hits == 1
+
+
+def test_swapped_cause_and_effect_misses():
+    cache = QuestionAnswerCache()
+    cache.set("2401.00001", "How does dropout cause underfitting?", "answer")
+    assert cache.get("2401.00001", "How does underfitting cause dropout?") is None
+
+
+def test_swapped_comparison_misses():
+    cache = QuestionAnswerCache()
+    cache.set("2401.00001", "Is it better than BERT?", "answer")
+    assert cache.get("2401.00001", "Is BERT better than it?") is None
+
+
+def test_negation_misses():
+    cache = QuestionAnswerCache()
+    cache.set("2401.00001", "Does the model use attention?", "yes")
+    assert cache.get("2401.00001", "Doesn't the model use attention?") is None
+
+
+def test_other_paper_misses():
+    cache = QuestionAnswerCache()
+    cache.set("2401.00001", "What datasets are used?", "ImageNet")
+    assert cache.get("2401.00002", "What datasets are used?") is None
@@ -0,0 +1,60 @@
+import random
+import threading
+
+import pytest
+
+import user_preferences
+from storage import Storage
+
+THREADS = 8
+USERS_PER_THREAD = 40
+UPDATES_PER_THREAD = 3000
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = Storage(str(tmp_path / "bot.db"))
+    monkeypatch.setattr(user_preferences, "get_storage", lambda: storage)
+    return storage
+
+
+def test_round_trip(storage):
+    prefs = user_preferences.UserPreferences(flush_interval_seconds=60)
+    prefs.update_preference(1, "max_results", 25)
+    prefs.close()
+
+    assert storage.get_user_preferences(1)["max_results"] == 25
+    assert user_preferences.UserPreferences().get_max_results(1) == 25
+
+
+def test_no_lost_updates_under_eviction_and_flush(storage):
+    """Each thread owns its users and counts its updates; any lost write shows up as a short count."""
+    # A cache far smaller than the working set forces evictions racing the flusher
+    prefs = user_preferences.UserPreferences(max_cached_users=16, flush_interval_seconds=0.001)
+    expected = {}
+    errors = []
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        users = [index * USERS_PER_THREAD + offset for offset in range(USERS_PER_THREAD)]
+        counts = dict.fromkeys(users, 0)
+        try:
+            for _ in range(UPDATES_PER_THREAD):
+                user_id = rng.choice(users)
+                current = prefs.get_preferences(user_id)
+                prefs.update_preference(user_id, "counter", current.get("counter", 0) + 1)
+                counts[user_id] += 1
+        except Exception as e:
+            errors.append(e)
+        expected.update(counts)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    prefs.close()
+
+    assert not errors
+    stored = {user_id: (storage.get_user_preferences(user_id) or {}).get("counter", 0) for user_id in expected}
+    assert stored == expected
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]+")
+
+ENGLISH_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of',
+    'with', 'by', 'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'this', 'that', 'these', 'those', 'it', 'its', 'we', 'our', 'they', 'their',
+    'which', 'who', 'what', 'when', 'where', 'how', 'can', 'could', 'may', 'might',
+    'will', 'would', 'should', 'has', 'have', 'had', 'do', 'does', 'did', 'not',
+    'no', 'such', 'than', 'then', 'also', 'into', 'over', 'under', 'between',
+    'both', 'each', 'more', 'most', 'other', 'some', 'only', 'all', 'any', 'via',
+    'here', 'there', 'while', 'however', 'thus', 'using', 'used', 'based', 'show',
+    'shows', 'paper', 'propose', 'proposed', 'present', 'approach', 'method', 'new'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text into word tokens without stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if t not in ENGLISH_STOPWORDS]
+
+
+class TfidfSimilarityEngine:
+    """Hashing TF-IDF vectors with cosine similarity computed as one matmul.
+
+    Term counts are hashed into a large feature space and cached per document
+    key, so repeated comparisons only re-tokenize unseen papers. For a set of
+    documents the hashed features are compacted to the columns actually used,
+    IDF is computed over the set and the full pairwise cosine matrix is
+    X @ X.T on the L2-normalized TF-IDF rows.
+    """
+
+    def __init__(self, n_features: int = 2 ** 20, max_cached: int = 4096):
+        self.n_features = n_features
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _hash_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashed feature indices and raw counts for a text."""
+        counts = Counter(zlib.crc32(t.encode()) % self.n_features for t in tokenize(text))
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return indices, values
+
+    def term_counts(self, text: str, key: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, counts) for a text, cached by key when given."""
+        if key is None:
+            return self._hash_counts(text)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        vector = self._hash_counts(text)
+        with self._lock:
+            self._cache[key] = vector
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return vector
+
+    def tfidf_matrix(self, texts: Sequence[str], keys: Optional[Sequence[str]] = None) -> np.ndarray:
+        """L2-normalized TF-IDF rows over the columns used by these texts."""
+        keys = keys if keys is not None else [None] * len(texts)
+        vectors = [self.term_counts(text, key) for text, key in zip(texts, keys)]
+
+        n_docs = len(vectors)
+        lengths = [len(indices) for indices, _ in vectors]
+        if n_docs == 0 or sum(lengths) == 0:
+            return np.zeros((n_docs, 0), dtype=np.float32)
+
+        all_indices = np.concatenate([indices for indices, _ in vectors])
+        all_counts = np.concatenate([counts for _, counts in vectors])
+        rows = np.repeat(np.arange(n_docs), lengths)
+        columns, cols = np.unique(all_indices, return_inverse=True)
+
+        matrix = np.zeros((n_docs, len(columns)), dtype=np.float32)
+        matrix[rows, cols] = 1.0 + np.log(all_counts)  # sublinear tf
+
+        df = np.count_nonzero(matrix, axis=0)
+        idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        matrix *= idf.astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+    def similarity_matrix(self, texts: Sequence[str], keys: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Pairwise cosine similarity of all texts."""
+        matrix = self.tfidf_matrix(texts, keys)
+        if matrix.shape[1] == 0:
+            return np.zeros((len(texts), len(texts)), dtype=np.float32)
+        return np.clip(matrix @ matrix.T, 0.0, 1.0)
+
+    def similarity(self, text1: str, text2: str) -> float:
+        """Cosine similarity between two texts."""
+        return float(self.similarity_matrix([text1, text2])[0, 1])
+
+
+# Global engine instance
+similarity_engine = TfidfSimilarityEngine()
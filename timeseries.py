@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from periodic_flusher import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+# (name, seconds per slot, slots kept)
+RESOLUTIONS = (
+    ("minute", 60, 180),    # last 3 hours
+    ("hour", 3600, 168),    # last 7 days
+    ("day", 86400, 90),     # last 90 days
+)
+
+# Resolution whose slots are saved to the database and survive restarts
+PERSISTED_RESOLUTION = "day"
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingSeries:
+    """Fixed-size ring of time slots holding count, sum and max of recorded values.
+
+    A slot is reused when time wraps around to it; its slot number tells
+    whether the stored values are current or left over from an earlier lap.
+    """
+
+    def __init__(self, step_seconds: int, slots: int):
+        self.step = step_seconds
+        self.slots = slots
+        self._slot_ids = array('q', [-1]) * slots
+        self._counts = array('q', [0]) * slots
+        self._sums = array('d', [0.0]) * slots
+        self._maxes = array('d', [0.0]) * slots
+
+    def add(self, timestamp: float, value: float) -> int:
+        """Record value in its slot; return the slot number."""
+        slot_id = int(timestamp // self.step)
+        self.merge(slot_id, 1, value, value)
+        return slot_id
+
+    def merge(self, slot_id: int, count: int, total: float, peak: float) -> None:
+        """Fold count values summing to total with maximum peak into a slot."""
+        i = slot_id % self.slots
+        if self._slot_ids[i] != slot_id:
+            if self._slot_ids[i] > slot_id:
+                return  # older than the ring holds
+            self._slot_ids[i] = slot_id
+            self._counts[i] = 0
+            self._sums[i] = 0.0
+            self._maxes[i] = peak
+        self._counts[i] += count
+        self._sums[i] += total
+        if peak > self._maxes[i]:
+            self._maxes[i] = peak
+
+    def slot(self, slot_id: int) -> Optional[Tuple[int, float, float]]:
+        """(count, sum, max) of a slot still in the ring."""
+        i = slot_id % self.slots
+        if self._slot_ids[i] != slot_id:
+            return None
+        return self._counts[i], self._sums[i], self._maxes[i]
+
+    def window(self, timestamp: float, points: int) -> List[Tuple[int, float, float]]:
+        """(count, sum, max) for the last `points` slots up to timestamp, oldest first."""
+        last = int(timestamp // self.step)
+        result = []
+        for slot_id in range(last - min(points, self.slots) + 1, last + 1):
+            i = slot_id % self.slots
+            if self._slot_ids[i] == slot_id:
+                result.append((self._counts[i], self._sums[i], self._maxes[i]))
+            else:
+                result.append((0, 0.0, 0.0))
+        return result
+
+
+class TimeSeriesStore:
+    """Per-metric history at minute, hour and day resolution.
+
+    Recording a value updates one slot in each resolution's ring, so it is
+    O(1) and memory stays fixed per metric however long the bot runs.
+    Counters record 1 per event; measurements such as latency record the
+    measured value and are read back as per-slot averages and maxima.
+
+    The minute and hour rings are in memory only. Once attached to storage,
+    day slots changed since the last flush are written every
+    flush_interval seconds and at shutdown, and the stored days are loaded
+    back on attach, so the day view survives restarts.
+    """
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.resolutions = {name: (step, slots) for name, step, slots in resolutions}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, RingSeries]] = {}
+        self._dirty: Set[Tuple[str, int]] = set()
+        self._storage = None
+        self._flusher: Optional[PeriodicFlusher] = None
+
+    def _rings(self, metric: str) -> Dict[str, RingSeries]:
+        """The metric's rings, created on first use. Caller holds the lock."""
+        rings = self._metrics.get(metric)
+        if rings is None:
+            rings = self._metrics[metric] = {
+                name: RingSeries(step, slots) for name, (step, slots) in self.resolutions.items()
+            }
+        return rings
+
+    def record(self, metric: str, value: float = 1.0, timestamp: Optional[float] = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for name, ring in self._rings(metric).items():
+                slot_id = ring.add(timestamp, value)
+                if name == PERSISTED_RESOLUTION:
+                    self._dirty.add((metric, slot_id))
+
+    def window(self, metric: str, resolution: str, points: int,
+               timestamp: Optional[float] = None) -> List[Tuple[int, float, float]]:
+        """(count, sum, max) per slot for the last `points` slots, oldest first."""
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution {resolution}")
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            rings = self._metrics.get(metric)
+            if rings is None:
+                return [(0, 0.0, 0.0)] * min(points, self.resolutions[resolution][1])
+            return rings[resolution].window(timestamp, points)
+
+    def counts(self, metric: str, resolution: str, points: int) -> List[int]:
+        return [count for count, _, _ in self.window(metric, resolution, points)]
+
+    def attach(self, storage, flush_interval_seconds: float = 60.0) -> None:
+        """Load stored day slots and start writing changed ones to storage."""
+        step, slots = self.resolutions[PERSISTED_RESOLUTION]
+        first_slot = int(time.time() // step) - slots + 1
+        try:
+            rows = storage.get_timeseries_slots(PERSISTED_RESOLUTION, first_slot)
+        except Exception as e:
+            logger.error(f"Error loading time series: {str(e)}")
+            rows = []
+        with self._lock:
+            self._storage = storage
+            # Values recorded before attaching are added to the stored ones
+            for metric, slot_id, count, total, peak in rows:
+                self._rings(metric)[PERSISTED_RESOLUTION].merge(slot_id, count, total, peak)
+        self.flush_interval = flush_interval_seconds
+        self._flusher = PeriodicFlusher(self.flush, flush_interval_seconds, "timeseries")
+
+    def flush(self) -> None:
+        """Write day slots changed since the last flush."""
+        with self._flush_lock:
+            with self._lock:
+                if self._storage is None or not self._dirty:
+                    return
+                dirty, self._dirty = self._dirty, set()
+                rows = []
+                for metric, slot_id in dirty:
+                    values = self._metrics[metric][PERSISTED_RESOLUTION].slot(slot_id)
+                    if values is not None:
+                        rows.append((metric, slot_id) + tuple(values))
+            step, slots = self.resolutions[PERSISTED_RESOLUTION]
+            try:
+                self._storage.save_timeseries_slots(
+                    PERSISTED_RESOLUTION, rows, int(time.time() // step) - slots + 1
+                )
+            except Exception as e:
+                logger.error(f"Error saving time series: {str(e)}")
+                with self._lock:
+                    self._dirty |= dirty
+
+    def close(self) -> None:
+        """Stop the flusher and write what is pending."""
+        if self._flusher is not None:
+            self._flusher.close()
+            self._flusher = None
+
+
+def sparkline(values: List[float]) -> str:
+    """Render values as a row of block characters scaled to their maximum."""
+    peak = max(values, default=0)
+    if peak <= 0:
+        return SPARK_CHARS[0] * len(values)
+    top = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[min(top, int(round(value / peak * top)))] for value in values)
+
+
+# Global store fed by the admin statistics and the LLM scheduler
+timeseries = TimeSeriesStore()
@@ -0,0 +1,207 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from topic_seeds import ACADEMIC_SEEDS, CASUAL_SEEDS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Function words carry no topical signal as unigrams
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of',
+    'is', 'are', 'was', 'were', 'be', 'it', 'this', 'that', 'what', 'how',
+    'why', 'who', 'do', 'does', 'can', 'me', 'my', 'i', 'you', 'your', 'with'
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class TopicClassifier:
+    """Hashed bag-of-words logistic regression for academic-topic detection.
+
+    Unigram and bigram features are hashed into a fixed-size weight vector,
+    so prediction is a handful of array lookups. The model is seeded from the
+    chat handler's allowed topics and the labelled queries in topic_seeds,
+    with both classes weighted equally, and keeps learning from the
+    decisions the LLM makes on low-confidence queries. There is no bias
+    term: text with no known features scores 0.5 and goes to the LLM rather
+    than leaning towards either class. The last max_logged_decisions
+    decisions are kept on disk as hashed feature indices, never as the
+    query text, and replayed on startup.
+    """
+
+    def __init__(self, allowed_topics: Dict[str, List[str]], n_features: int = 2 ** 16,
+                 learning_rate: float = 0.5, high_confidence: float = 0.85,
+                 low_confidence: float = 0.15,
+                 decisions_file: str = os.path.join("bot_data", "topic_decisions.jsonl"),
+                 seed_epochs: int = 30, max_logged_decisions: int = 5000):
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.high_confidence = high_confidence
+        self.low_confidence = low_confidence
+        self.decisions_file = decisions_file
+        self.max_logged_decisions = max_logged_decisions
+
+        self.weights = array('f', bytes(4 * n_features))
+        self._lock = threading.Lock()
+        self._logged = 0
+
+        self.local_decisions = 0
+        self.llm_decisions = 0
+
+        self._seed(allowed_topics, seed_epochs)
+        self._replay_decisions()
+
+    def _features(self, text: str) -> List[int]:
+        """Hash unigrams and bigrams of the text into feature indices."""
+        tokens = tokenize(text)
+        grams = [t for t in tokens if t not in STOPWORDS]
+        grams += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(g.encode()) % self.n_features for g in grams]
+
+    def _score(self, features: List[int]) -> float:
+        # Grams the model has never seen are no evidence either way, so they do
+        # not dilute the ones it has; scale so long queries are not pushed to
+        # extremes by length alone
+        weights = self.weights
+        known = [weights[f] for f in features if weights[f] != 0.0]
+        if not known:
+            return 0.0
+        return sum(known) / math.sqrt(len(known))
+
+    def _update(self, features: List[int], label: bool, weight: float = 1.0) -> None:
+        if not features:
+            return
+        score = max(-30.0, min(30.0, self._score(features)))
+        p = 1.0 / (1.0 + math.exp(-score))
+        gradient = (1.0 if label else 0.0) - p
+        scaled = self.learning_rate * weight * gradient / math.sqrt(len(features))
+        for f in features:
+            self.weights[f] += scaled
+
+    def _seed(self, allowed_topics: Dict[str, List[str]], epochs: int) -> None:
+        """Train the initial model from topic keywords and the labelled seed queries."""
+        examples = []
+        for topic, keywords in allowed_topics.items():
+            examples.append((topic.replace('_', ' '), True))
+            examples.extend((keyword, True) for keyword in keywords)
+        examples.extend((text, True) for text in ACADEMIC_SEEDS)
+        examples.extend((text, False) for text in CASUAL_SEEDS)
+
+        # Weight the classes equally whatever their sizes
+        positives = sum(1 for _, label in examples if label)
+        negatives = len(examples) - positives
+        class_weight = {True: len(examples) / (2.0 * positives), False: len(examples) / (2.0 * negatives)}
+        hashed = [(self._features(text), label) for text, label in examples]
+        for _ in range(epochs):
+            for features, label in hashed:
+                self._update(features, label, class_weight[label])
+
+    def _record(self, features: List[int], relevant: bool) -> str:
+        """Decision log line; feature order is dropped along with the text."""
+        return json.dumps({"features": sorted(features), "relevant": relevant}) + "\n"
+
+    def _replay_decisions(self) -> None:
+        """Re-learn from the most recent decisions logged in previous runs.
+
+        Logs written before decisions were hashed hold query text; they are
+        rewritten with feature indices only.
+        """
+        try:
+            with open(self.decisions_file, 'r') as f:
+                lines = deque(f, maxlen=self.max_logged_decisions)
+            records = []
+            has_text = False
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                    if 'query' in record:
+                        has_text = True
+                        features = self._features(record['query'])
+                    else:
+                        features = [f for f in record['features'] if 0 <= f < self.n_features]
+                    records.append((features, bool(record['relevant'])))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+            for features, relevant in records:
+                self._update(features, relevant)
+            self._logged = len(lines)
+            if has_text:
+                self._rewrite_log([self._record(features, relevant) for features, relevant in records])
+            logger.info(f"Topic classifier replayed {len(records)} logged decisions")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error replaying topic decisions: {str(e)}")
+
+    def predict_proba(self, text: str) -> float:
+        """Probability that the text is an academic/research query."""
+        score = self._score(self._features(text))
+        score = max(-30.0, min(30.0, score))
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def classify(self, text: str) -> Optional[bool]:
+        """Return True/False when confident, or None if the LLM should decide."""
+        p = self.predict_proba(text)
+        verdict = None
+        if p >= self.high_confidence:
+            verdict = True
+        elif p <= self.low_confidence:
+            verdict = False
+        with self._lock:
+            if verdict is None:
+                self.llm_decisions += 1
+            else:
+                self.local_decisions += 1
+        return verdict
+
+    def learn(self, text: str, relevant: bool, log: bool = True) -> None:
+        """Update the model with a labelled query and optionally log its features."""
+        features = self._features(text)
+        with self._lock:
+            self._update(features, relevant)
+            if not log or not features:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.decisions_file) or ".", exist_ok=True)
+                with open(self.decisions_file, 'a') as f:
+                    f.write(self._record(features, relevant))
+                self._logged += 1
+                # Let the log reach twice the replayed size, then keep the newest half
+                if self._logged >= 2 * self.max_logged_decisions:
+                    self._truncate_log()
+            except Exception as e:
+                logger.error(f"Error logging topic decision: {str(e)}")
+
+    def _truncate_log(self) -> None:
+        """Rewrite the decision log with only the newest entries. Caller holds the lock."""
+        with open(self.decisions_file, 'r') as f:
+            lines = deque(f, maxlen=self.max_logged_decisions)
+        self._rewrite_log(lines)
+
+    def _rewrite_log(self, lines) -> None:
+        temp_file = self.decisions_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            f.writelines(lines)
+        os.replace(temp_file, self.decisions_file)
+        self._logged = len(lines)
+
+    def get_stats(self) -> Dict:
+        """Counts of queries decided locally and sent to the LLM."""
+        total = self.local_decisions + self.llm_decisions
+        return {
+            "local": self.local_decisions,
+            "llm": self.llm_decisions,
+            "local_share": self.local_decisions / total if total else 0.0
+        }
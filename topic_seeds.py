@@ -0,0 +1,116 @@
+# Seed data for the topic classifier. The labelled query lists mix bare
+# topics with the question shapes users actually send, so that phrasing
+# alone ("how do", "what is the") carries no weight either way.
+
+# Topics the chat handler allows and their related keywords
+ALLOWED_TOPICS = {
+    "physics": ["quantum", "relativity", "mechanics", "particles", "energy", "force", "waves", "matter"],
+    "mathematics": ["algebra", "calculus", "geometry", "statistics", "probability", "theorem", "equation"],
+    "computer_science": ["algorithm", "programming", "machine learning", "AI", "data structure", "computation"],
+    "biology": ["genetics", "cells", "evolution", "organism", "molecular", "biology", "neuroscience"],
+    "chemistry": ["molecule", "reaction", "compound", "element", "bond", "atomic", "chemical"],
+    "astronomy": ["cosmos", "galaxy", "planet", "star", "universe", "space", "celestial", "astronomical"],
+    "research": ["paper", "study", "experiment", "theory", "hypothesis", "methodology", "analysis"],
+    "education": ["learning", "teaching", "academic", "study", "knowledge", "education", "research"]
+}
+
+# Academic and research questions across the fields the bot covers
+ACADEMIC_SEEDS = [
+    "explain the concept of entropy", "what is the theory behind superconductivity",
+    "how does the algorithm work", "summarize this research paper", "literature review on transformers",
+    "how does peer review work", "are the experimental results statistically significant",
+    "what is a p value", "explain the scientific method", "derive the equation of motion",
+    "proof of the fundamental theorem of calculus", "how do neural networks learn",
+    "what is backpropagation", "explain gradient descent", "what is overfitting in machine learning",
+    "how do transformers use attention", "difference between supervised and unsupervised learning",
+    "what is reinforcement learning", "how does a convolutional network classify images",
+    "what is a large language model", "explain quantum entanglement", "what is quantum tunneling",
+    "how does general relativity explain gravity", "what is dark matter made of",
+    "how do black holes form", "what is the cosmic microwave background",
+    "how are exoplanets detected", "how do stars produce energy", "what is a neutron star",
+    "explain the big bang theory", "how does dna replication work", "what does mrna do",
+    "how do vaccines train the immune system", "how does the immune system fight viruses",
+    "how does natural selection drive evolution", "what is crispr gene editing",
+    "how do neurons communicate", "what causes alzheimers disease",
+    "how does photosynthesis work", "what is protein folding", "how do enzymes catalyze reactions",
+    "what is a covalent bond", "balance this chemical equation", "how do catalysts lower activation energy",
+    "what is the periodic table organized by", "explain oxidation and reduction",
+    "what is thermodynamic equilibrium", "explain the second law of thermodynamics",
+    "how does climate change affect ocean currents", "what drives plate tectonics",
+    "how do greenhouse gases trap heat", "solve this differential equation",
+    "what is an eigenvalue", "explain linear algebra basics", "what is a hilbert space",
+    "prove that there are infinitely many primes", "what is the riemann hypothesis",
+    "explain bayes theorem", "what is a markov chain", "how does monte carlo simulation work",
+    "what is graph theory used for", "explain big o notation", "how does a hash table work",
+    "what is the halting problem", "p versus np problem", "how does public key cryptography work",
+    "how do compilers optimize code", "what is a distributed consensus algorithm",
+    "explain the standard model of particle physics", "what is the higgs boson",
+    "how does a particle accelerator work", "what is wave particle duality",
+    "explain the double slit experiment", "how do lasers work", "what is string theory",
+    "how does nuclear fusion work", "what is a semiconductor band gap",
+    "research methodology for a thesis", "how to design a controlled experiment",
+    "what is a randomized controlled trial", "how to write a literature survey",
+    "recent papers on graph neural networks", "state of the art in image segmentation",
+    "find papers about protein structure prediction", "what is the main contribution of this study",
+    "how was the dataset collected", "what are the limitations of this method",
+    "compare these two approaches", "what hypothesis does the experiment test",
+    "how is the model evaluated", "what statistical test should i use",
+    "explain regression analysis", "what is principal component analysis",
+    "how do epidemiologists model disease spread", "what is the placebo effect",
+    "how does the brain form memories", "what is cognitive load theory",
+    "explain game theory and nash equilibrium", "what is econometrics",
+    "how do telescopes resolve distant galaxies", "what is spectroscopy used for",
+    "how is the age of the universe measured", "what is a topological insulator",
+    "explain fourier transforms", "what is signal processing", "how does error correcting code work",
+    "what is a quantum computer", "how do qubits differ from bits",
+    "can you tell me about black holes", "i want to learn about genetics", "tell me about the history of calculus",
+    "i am curious about quantum physics", "help me understand this proof", "lets talk about evolution",
+    "i need help with my statistics homework", "recommend a textbook on linear algebra",
+    "recommend papers on reinforcement learning", "who discovered penicillin", "who proposed the theory of relativity",
+]
+
+# Casual chat, everyday requests and other non-academic messages
+CASUAL_SEEDS = [
+    "hi", "hello there", "hey", "how are you", "whats up", "good morning", "good night",
+    "lol", "haha that is funny", "thanks", "thank you so much", "ok cool", "bye",
+    "tell me a joke", "what is your name", "i am bored", "are you a robot", "who made you",
+    "what is the weather today", "will it rain tomorrow", "weather forecast for the weekend",
+    "who won the game last night", "football match score", "when is the next world cup",
+    "best basketball player ever", "recommend a movie to watch", "good tv shows on netflix",
+    "netflix series to binge", "what should i eat for dinner", "best pizza recipe",
+    "how to cook pasta", "easy breakfast ideas", "is coffee bad for me",
+    "how do i lose weight fast", "best workout routine for abs", "song lyrics",
+    "recommend some music", "who sings this song", "which phone should i buy",
+    "best laptop under 500 dollars", "is the new iphone worth it", "celebrity gossip",
+    "who is dating who", "can you be my girlfriend", "do you love me", "dating advice",
+    "how to get a boyfriend", "play a game with me", "lets play truth or dare",
+    "what time is it", "what day is it today", "write me a love poem",
+    "write a birthday message for my mom", "how to make money online", "get rich quick",
+    "funny meme", "send me a funny video", "what is your favorite color",
+    "do you like cats or dogs", "instagram followers", "how to go viral on tiktok",
+    "cheap flights to paris", "hotels in london", "things to do in new york",
+    "best beaches in thailand", "how far is tokyo from here", "crypto price prediction",
+    "should i buy bitcoin now", "stock tips for tomorrow", "video game cheats",
+    "best fortnite skins", "minecraft building ideas", "how to fix my wifi",
+    "my phone battery drains fast", "how to reset my password", "where is the nearest pharmacy",
+    "order a pizza for me", "book a table for two", "what is on tv tonight",
+    "happy birthday", "merry christmas", "i feel sad today", "i cant sleep",
+    "talk to me", "you are stupid", "are you smarter than siri", "sing me a song",
+    "what car should i buy", "how to remove a stain from a shirt", "fashion tips for summer",
+    "best shoes for running", "how to tie a tie", "gift ideas for my girlfriend",
+    "what should i name my dog", "my cat is ignoring me", "how to train a puppy",
+    "horoscope for today", "what is my zodiac sign", "lottery numbers for tonight",
+    "who will win the election", "latest news headlines", "what happened in the news today",
+    "how to get more likes", "youtube video ideas", "translate hello into spanish",
+    "how to apply for a passport", "cheap car insurance", "how much is rent in london",
+    "how does netflix pick what to show me", "how does uber pricing work", "what is the best pizza place",
+    "how do i get to the train station", "what is a good name for my cat", "how does this app work",
+    "what is the capital of france", "how do i cancel my subscription", "what is the best time to visit rome",
+    "how do you make pancakes", "what is trending on twitter", "how does my horoscope look",
+    "what is a good gift for a friend", "how do i unlock my phone", "what is the score of the match",
+    "how do i look more attractive", "what is the price of gold today", "how do i talk to my crush",
+    "what is your opinion on taylor swift", "how do i bake a cake", "what is the traffic like now",
+    "how is the weather in paris", "what is the temperature outside", "is it sunny tomorrow",
+    "i want a burger", "lets talk", "good evening", "good afternoon", "how was your day",
+    "recommend a good restaurant", "where can i eat tonight", "who is the best football player",
+]
@@ -1,8 +1,16 @@
-from typing import Dict, List, Optional
-import json
-import os
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import copy
+import itertools
+import logging
+import threading
 from datetime import datetime
 
+from periodic_flusher import PeriodicFlusher
+from storage import get_storage
+
+logger = logging.getLogger(__name__)
+
 class UserPreferences:
 
     ARXIV_CATEGORIES = {
@@ -38,35 +46,172 @@ class UserPreferences:
     }
 
 
-    def __init__(self):
-        self.preferences_dir = "user_preferences"
-        os.makedirs(self.preferences_dir, exist_ok=True)
+    def __init__(self, max_cached_users: int = 10000, flush_interval_seconds: float = 5.0):
+        self.storage = get_storage()
+
+        # Write-back cache: reads come from memory, dirty entries are written by the flusher
+        self.max_cached_users = max_cached_users
+        self.flush_interval = flush_interval_seconds
+        self._cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._dirty = set()
+        # Every stored change gets a new version; a write is skipped if a newer
+        # version of the same user has already been written
+        self._versions: Dict[int, int] = {}
+        self._version_seq = itertools.count(1)
+        self._written: Dict[int, int] = {}
+        self._evicted: Dict[int, Tuple[int, Dict]] = {}  # dirty entries dropped from the cache, not yet written
+        self._writers = 0  # eviction writes waiting for the flush lock
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = PeriodicFlusher(self.flush, flush_interval_seconds, "preferences-flusher")
+
+    def _store(self, user_id: int, preferences: Dict) -> List[Tuple[int, int, Dict]]:
+        """Put preferences in the cache and mark them for the next flush. Caller holds the lock.
+
+        Returns the evicted entries the caller must pass to _write_evicted
+        once it has released the lock.
+        """
+        self._cache[user_id] = preferences
+        self._cache.move_to_end(user_id)
+        self._versions[user_id] = next(self._version_seq)
+        self._dirty.add(user_id)
+        return self._evict()
+
+    def _evict(self) -> List[Tuple[int, int, Dict]]:
+        """Drop least recently used entries beyond the cache size. Caller holds the lock.
+
+        Entries whose version has not been written are kept in _evicted,
+        where reads still find them, and returned as (user_id, version,
+        preferences) to be written.
+        """
+        evicted = []
+        while len(self._cache) > self.max_cached_users:
+            oldest, oldest_prefs = self._cache.popitem(last=False)
+            version = self._versions.pop(oldest)
+            # A flush may have taken the entry off _dirty without having written it yet
+            if oldest in self._dirty or self._written.get(oldest, 0) < version:
+                self._dirty.discard(oldest)
+                self._evicted[oldest] = (version, oldest_prefs)
+                evicted.append((oldest, version, oldest_prefs))
+        if evicted:
+            self._writers += 1
+        return evicted
+
+    def _write_evicted(self, evicted: List[Tuple[int, int, Dict]]) -> None:
+        """Write entries returned by _evict. Called without the lock held."""
+        if not evicted:
+            return
+        try:
+            with self._flush_lock:
+                self._write(evicted)
+        finally:
+            with self._lock:
+                self._writers -= 1
+
+    def _write(self, rows: List[Tuple[int, int, Dict]]) -> None:
+        """Save (user_id, version, preferences) rows not superseded by a newer write.
 
-    def _get_user_file_path(self, user_id: int) -> str:
-        return os.path.join(self.preferences_dir, f"user_{user_id}.json")
+        Caller holds the flush lock, so writes happen one at a time and the
+        version check sees every earlier one.
+        """
+        with self._lock:
+            rows = [row for row in rows if row[1] > self._written.get(row[0], 0)]
+        if not rows:
+            return
+        try:
+            self.storage.save_user_preferences([(user_id, prefs) for user_id, _, prefs in rows])
+        except Exception as e:
+            logger.error(f"Error saving preferences for {len(rows)} users: {str(e)}")
+            with self._lock:
+                for user_id, version, prefs in rows:
+                    if self._versions.get(user_id) == version:
+                        self._dirty.add(user_id)
+                    elif user_id not in self._cache and user_id not in self._evicted:
+                        self._evicted[user_id] = (version, prefs)
+            return
+        with self._lock:
+            for user_id, version, _ in rows:
+                self._written[user_id] = version
+                if self._evicted.get(user_id, (0,))[0] <= version:
+                    self._evicted.pop(user_id, None)
 
     def get_preferences(self, user_id: int) -> Dict:
         """Get user preferences, creating default if none exist."""
-        try:
-            with open(self._get_user_file_path(user_id), 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            default_prefs = {
-                'max_results': 10,
-                'specific_journals': [],
-                'preferred_categories': [],
-                'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-                'auto_download': False,
-                'preferred_categories': []
-            }
-            self.save_preferences(user_id, default_prefs)
-            return default_prefs
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                self._cache.move_to_end(user_id)
+                return copy.deepcopy(cached)
+            written = self._written.get(user_id)
+
+        while True:
+            try:
+                prefs = self.storage.get_user_preferences(user_id)
+            except Exception as e:
+                logger.error(f"Error loading preferences for user {user_id}: {str(e)}")
+                prefs = None
+            with self._lock:
+                if self._written.get(user_id) == written:
+                    break
+                # An evicted copy was written while we read; read again
+                written = self._written.get(user_id)
+
+        with self._lock:
+            # Another thread may have loaded or saved this user meanwhile
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                return copy.deepcopy(cached)
+            if user_id in self._evicted:
+                # Evicted before its write landed; the database copy may be older
+                version, prefs = self._evicted.pop(user_id)
+                self._cache[user_id] = prefs
+                self._versions[user_id] = version
+                self._dirty.add(user_id)
+                evicted = self._evict()
+            elif prefs is None:
+                prefs = {
+                    'max_results': 10,
+                    'specific_journals': [],
+                    'preferred_categories': [],
+                    'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                    'auto_download': False,
+                    'preferred_categories': []
+                }
+                evicted = self._store(user_id, prefs)
+            else:
+                self._cache[user_id] = prefs
+                self._versions[user_id] = self._written[user_id] = next(self._version_seq)
+                evicted = self._evict()
+            result = copy.deepcopy(prefs)
+        self._write_evicted(evicted)
+        return result
 
     def save_preferences(self, user_id: int, preferences: Dict) -> None:
-        """Save user preferences to file."""
+        """Save user preferences; the next flush writes them to SQLite."""
         preferences['last_updated'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        with open(self._get_user_file_path(user_id), 'w') as f:
-            json.dump(preferences, f, indent=2)
+        with self._lock:
+            evicted = self._store(user_id, copy.deepcopy(preferences))
+        self._write_evicted(evicted)
+
+    def flush(self) -> None:
+        """Write all dirty preferences in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                pending = [(user_id, self._versions[user_id], copy.deepcopy(self._cache[user_id]))
+                           for user_id in self._dirty if user_id in self._cache]
+                self._dirty.clear()
+                # Evicted entries whose own write failed are retried here
+                pending.extend((user_id, version, prefs) for user_id, (version, prefs) in self._evicted.items())
+            self._write(pending)
+            with self._lock:
+                if not self._writers:
+                    # Only cached users can have a write still to come
+                    self._written = {user_id: version for user_id, version in self._written.items()
+                                     if user_id in self._cache or user_id in self._evicted}
+
+    def close(self) -> None:
+        """Stop the background flusher and write pending changes."""
+        self._flusher.close()
 
     def update_preference(self, user_id: int, key: str, value: any) -> Dict:
         """Update a single preference and return all preferences."""